@@ -5,7 +5,6 @@ Handles the different functionality of the package.
 
 import sys
 from argparse import ArgumentParser
-from port_risk.main import main as p_main
 
 
 def main() -> None:
@@ -46,7 +45,40 @@ def main() -> None:
             action="store_true",
             help="Run the models with no validation",
         )
+        parser.add_argument(
+            "-p",
+            "--profile",
+            action="store_true",
+            help="Record the time, memory and outputs of each stage in a run report",
+        )
+        parser.add_argument(
+            "--cprofile",
+            action="store_true",
+            help="With --profile, also dump a cProfile of each stage",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Do not read or write the network cache and the fitted models store",
+        )
+        parser.add_argument(
+            "--serve",
+            action="store_true",
+            help="Compute the risks once and serve risk queries over HTTP",
+        )
+        parser.add_argument(
+            "--host", help="With --serve, address to listen on (default 127.0.0.1)"
+        )
+        parser.add_argument(
+            "--port", type=int, help="With --serve, port to listen on (default 8765)"
+        )
+        parser.add_argument(
+            "--socket", help="With --serve, listen on this Unix socket instead"
+        )
         args = parser.parse_args()
+        # Imported after parsing so that --help does not load the data science stack.
+        from port_risk.main import main as p_main
+
         p_main(args, sys.argv)
     except KeyboardInterrupt:
         print("\nScript Interrupted by user. Exiting...")
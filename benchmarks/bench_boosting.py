@@ -0,0 +1,57 @@
+"""
+Benchmark of the boosting models of the registry: fit time and test accuracy of GradientBoost
+against HistGradientBoost as the number of rows grows, on synthetic regression data with the
+shape of the machine learning dataset.
+
+Usage:
+    python -m benchmarks.bench_boosting [n_rows ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from port_risk.models.models import GradientBoost, HistGradientBoost
+
+N_FEATURES = 14
+
+
+def make_regression_data(n_rows: int, seed: int = 0) -> tuple:
+    """
+    Makes a non-linear regression problem with heavy tailed features.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.lognormal(0, 1, size=(n_rows, N_FEATURES))
+    y = (
+        np.log1p(x[:, 0]) * x[:, 1]
+        + np.sin(x[:, 2])
+        + 0.5 * (x[:, 3] > 1) * x[:, 4]
+        + 0.1 * rng.normal(size=n_rows)
+    )
+    return train_test_split(x, y, test_size=0.33, random_state=42)
+
+
+def main() -> None:
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 30_000, 100_000]
+    print(f"{'rows':>8} {'model':<20} {'fit (s)':>9} {'r2':>7} {'rmse':>8}")
+    for n_rows in sizes:
+        x_train, x_test, y_train, y_test = make_regression_data(n_rows)
+        for name, model in (
+            ("gradient_boost", GradientBoost),
+            ("hist_gradient_boost", HistGradientBoost),
+        ):
+            run = model(x_train, y_train, x_test, y_test, name)
+            start = time.perf_counter()
+            run.fit_and_predict()
+            elapsed = time.perf_counter() - start
+            run.compute_metrics()
+            print(
+                f"{n_rows:>8} {name:<20} {elapsed:9.2f} "
+                f"{run.metrics['r2']:7.4f} {run.metrics['rmse']:8.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark of the machine learning design matrix: peak traced memory and wall time of
+ml_preprocessing + get_data_model_ready against build_design_matrix, on the risk frames of a
+synthetic network. Both paths compute and save the correlation matrix plot (to a temporary
+folder), and their training and testing sets are checked to be equal.
+
+Usage:
+    python -m benchmarks.bench_design_matrix [n_rows]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+import port_risk
+from port_risk.io.synthetic import make_risks, make_synthetic_data
+from port_risk.models.risk import create_risk_dataframe
+from port_risk.preprocessing.machine_learning import (
+    build_design_matrix,
+    get_data_model_ready,
+    ml_preprocessing,
+)
+from port_risk.preprocessing.merge import merge_network_industries, merge_ports_risk
+from port_risk.preprocessing.trade import create_trade_dataframe
+
+
+def legacy(frames: list) -> tuple:
+    """
+    Builds the training and testing sets with ml_preprocessing and get_data_model_ready.
+    """
+    data = ml_preprocessing(pd.concat(frames, axis=0), "trade")
+    return get_data_model_ready(data, "downtime_q_weighted")
+
+
+def compact(frames: list) -> tuple:
+    """
+    Builds the training and testing sets with build_design_matrix.
+    """
+    return build_design_matrix(frames, "trade").split()
+
+
+def traced(func, *args) -> tuple:
+    """
+    Returns the wall time, peak traced memory (MB) and result of a call.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2, result
+
+
+def main() -> None:
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    port_risk.data_path["plots"] = tempfile.mkdtemp(prefix="port_risk_plots_") + "/"
+
+    network, ports, industries = make_synthetic_data(n_rows=n_rows)
+    ports_risk = merge_ports_risk(make_risks(ports, np.random.default_rng(1)), ports)
+    # Scale the downtimes so that most rows pass the downtime_q_weighted < 1e-4 filter.
+    ports_risk["downtime_total"] /= 1000
+    trade = create_trade_dataframe(merge_network_industries(network, industries), ports)
+    risk = create_risk_dataframe(trade, ports_risk, ["downtime_total"])
+    frames = [risk["downtime_total"]["import"], risk["downtime_total"]["export"]]
+
+    legacy_time, legacy_peak, legacy_sets = traced(legacy, frames)
+    compact_time, compact_peak, compact_sets = traced(compact, frames)
+    # Both paths give the same training and testing sets, up to the float32 cast of X.
+    for expected, result in zip(legacy_sets, compact_sets):
+        np.testing.assert_array_equal(np.asarray(expected, dtype=result.dtype), result)
+    x_train, x_train_compact = legacy_sets[0], compact_sets[0]
+
+    print(f"Risk frames: {sum(len(frame) for frame in frames)} rows")
+    print(f"Training matrix: {x_train_compact.shape}")
+    print(
+        f"ml_preprocessing + get_data_model_ready: {legacy_time:7.2f} s  "
+        f"peak {legacy_peak:8.1f} MB  X_train {x_train.dtype}"
+    )
+    print(
+        f"build_design_matrix                   : {compact_time:7.2f} s  "
+        f"peak {compact_peak:8.1f} MB  X_train {x_train_compact.dtype}"
+    )
+    print(f"peak memory reduction: {legacy_peak / compact_peak:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
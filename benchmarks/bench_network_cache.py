@@ -0,0 +1,83 @@
+"""
+Benchmark of the maritime network loader: cold (csv parse + cache write) against warm (cache read)
+loads. Each load runs in a fresh interpreter so that peak RSS is measured in isolation.
+
+Usage:
+    python -m benchmarks.bench_network_cache [path/to/port_trade_network.csv]
+"""
+
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = """
+import json, resource, sys, time
+import port_risk
+port_risk.data_path["network"] = sys.argv[1]
+port_risk.data_path["cache"] = sys.argv[2]
+from port_risk.io.data import load_maritime_network
+start = time.perf_counter()
+df = load_maritime_network()
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak, "rows": len(df)}))
+"""
+
+
+def run_load(network: Path, cache: Path) -> dict:
+    """
+    Loads the network in a child interpreter.
+
+    Parameters:
+        network: Path
+            The csv file to load.
+        cache: Path
+            The cache directory to use.
+
+    Return:
+        result: dict
+            Wall time, peak RSS and number of rows of the load.
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(network), f"{cache}/"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    network = (
+        Path(sys.argv[1])
+        if len(sys.argv) > 1
+        else ROOT / "port_risk/data/port_trade_network.csv"
+    )
+    with open(network, "rb") as f:
+        if f.read(7) == b"version":
+            print(f"{network} is a Git LFS pointer, fetch the data first.")
+            sys.exit(1)
+
+    cache = Path(tempfile.mkdtemp(prefix="port_risk_cache_"))
+    try:
+        cold = run_load(network, cache)
+        warm = run_load(network, cache)
+    finally:
+        shutil.rmtree(cache)
+
+    print(f"Network: {network} ({cold['rows']} rows)")
+    for name, result in (("cold", cold), ("warm", warm)):
+        print(
+            f"{name:>5}: {result['seconds']:8.2f} s  peak RSS {result['peak_rss_mb']:8.1f} MB"
+        )
+    print(f"speed-up: {cold['seconds'] / warm['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
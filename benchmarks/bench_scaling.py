@@ -0,0 +1,91 @@
+"""
+Scaling benchmark of the trade and risk pipeline: wall time and peak traced memory of
+merge_ports_risk, preprocess_trade, compute_trade_risk and merge_risk on synthetic data at
+growing scale factors of the 1x sizes of port_risk.io.synthetic, with the exponent of the time
+growth relative to the smallest scale. Identifiers are coded with a CodeBook, as load_coded_data
+does.
+
+Usage:
+    python -m benchmarks.bench_scaling [scale ...]
+"""
+
+import math
+import sys
+import time
+import tracemalloc
+
+from port_risk.io.codes import CodeBook
+from port_risk.io.synthetic import make_scaled_data, scaled_sizes
+from port_risk.models.risk import compute_trade_risk, merge_risk
+from port_risk.preprocessing.merge import merge_network_industries, merge_ports_risk
+from port_risk.preprocessing.trade import preprocess_trade
+
+
+def measure(func, *args, **kwargs) -> tuple[float, float, object]:
+    """
+    Returns the wall time and peak traced memory (MB) of a call, and its result. The time is
+    measured on a first call without tracing, the memory on a second traced call.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2, result
+
+
+def run_pipeline(scale: float) -> dict[str, tuple[float, float]]:
+    """
+    Runs the benchmarked functions on the synthetic data at a scale factor.
+    """
+    network, ports, industries, risks = make_scaled_data(scale)
+    codes = CodeBook.from_frames(ports, industries, network)
+    ports, industries, network = (
+        codes.encode(df) for df in (ports, industries, network)
+    )
+    network = merge_network_industries(network, industries)
+
+    results = {}
+    *results["merge_ports_risk"], ports_risk = measure(merge_ports_risk, risks, ports)
+    *results["preprocess_trade"], import_trade = measure(
+        preprocess_trade, network, ports, "iso3_D"
+    )
+    *results["preprocess_trade_sector"], _ = measure(
+        preprocess_trade, network, ports, "iso3_D", True
+    )
+    export_trade = preprocess_trade(network, ports, "iso3_O")
+    *results["compute_trade_risk"], import_risk = measure(
+        compute_trade_risk, import_trade, ports_risk
+    )
+    export_risk = compute_trade_risk(export_trade, ports_risk)
+    *results["merge_risk"], _ = measure(merge_risk, import_risk, export_risk)
+    return results
+
+
+def main() -> None:
+    scales = [float(scale) for scale in sys.argv[1:]] or [1, 10, 100]
+    print(
+        f"{'scale':>6} {'rows':>10} {'function':<24} {'time (s)':>9} {'peak (MB)':>10} "
+        f"{'exponent':>9}"
+    )
+    base = None
+    for scale in scales:
+        n_rows = scaled_sizes(scale)["n_rows"]
+        results = run_pipeline(scale)
+        base = base or (scale, results)
+        for name, (elapsed, peak) in results.items():
+            exponent = ""
+            if scale != base[0]:
+                growth = math.log(elapsed / base[1][name][0]) / math.log(
+                    scale / base[0]
+                )
+                exponent = f"{growth:9.2f}"
+            print(
+                f"{scale:>6g} {n_rows:>10} {name:<24} {elapsed:9.3f} {peak:10.1f} {exponent:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark of the Monte Carlo scenario engine on synthetic data: wall time of run_scenarios for all
+hazards over all ports, with one process and with the process pool.
+
+Usage:
+    python -m benchmarks.bench_scenarios [n_scenarios]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from port_risk.io.synthetic import make_risks, make_synthetic_data
+from port_risk.models.exposure import build_exposure
+from port_risk.models.scenarios import run_scenarios
+from port_risk.preprocessing.merge import merge_network_industries, merge_ports_risk
+from port_risk.preprocessing.trade import build_trade_frames
+
+
+def main() -> None:
+    n_scenarios = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    network, ports, industries = make_synthetic_data(n_rows=1_000_000)
+    network = merge_network_industries(network, industries)
+    ports_risk = merge_ports_risk(make_risks(ports, np.random.default_rng(1)), ports)
+    exposure = build_exposure(build_trade_frames(network, ports), ports_risk)
+
+    print(
+        f"Exposure: {len(exposure.countries)} countries x {len(exposure.ports)} ports, "
+        f"{n_scenarios} scenarios"
+    )
+    for processes in sorted({1, os.cpu_count()}):
+        start = time.perf_counter()
+        results = run_scenarios(exposure, ports_risk, n_scenarios, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(f"{processes:>3} process(es): {elapsed:8.2f} s")
+    print(results["downtime_total"].describe().T.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of the risk query server: time to build the in-memory indexes, and client side latency
+percentiles of a mix of risk, sectors and top_ports queries over one keep-alive connection, on
+synthetic data.
+
+Usage:
+    python -m benchmarks.bench_server [n_queries] [scale]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from port_risk.io.synthetic import make_scaled_data
+from port_risk.models.exposure import build_exposure
+from port_risk.models.risk import create_risk_dataframe
+from port_risk.preprocessing.merge import merge_network_industries, merge_ports_risk
+from port_risk.preprocessing.trade import create_trade_dataframe
+from port_risk.server import RiskClient, RiskIndex, running_server
+
+ENDPOINTS = ("risk", "sectors", "top_ports")
+
+
+def main() -> None:
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    network, ports, industries, risks = make_scaled_data(scale)
+    network = merge_network_industries(network, industries)
+    ports_risk = merge_ports_risk(risks, ports)
+    trade = create_trade_dataframe(network, ports)
+    hazards = [col for col in ports_risk.columns if col.startswith("downtime_")]
+    risk = create_risk_dataframe(trade, ports_risk, hazards)
+    exposure = build_exposure(trade, ports_risk)
+
+    start = time.perf_counter()
+    index = RiskIndex(risk, exposure, ports_risk)
+    print(
+        f"Index of {len(index.countries)} countries built in {time.perf_counter() - start:.2f} s"
+    )
+
+    rng = np.random.default_rng(0)
+    with running_server(index) as (host, port):
+        client = RiskClient(host, port)
+        latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        for _ in range(n_queries):
+            endpoint = ENDPOINTS[rng.integers(len(ENDPOINTS))]
+            params = {
+                "iso3": index.countries[rng.integers(len(index.countries))],
+                "hazard": index.hazards[rng.integers(len(index.hazards))],
+                "metric": ("value", "quantity")[rng.integers(2)],
+            }
+            start = time.perf_counter()
+            client.get(endpoint, **params)
+            latencies[endpoint].append(time.perf_counter() - start)
+        stats = client.get("stats")
+        client.close()
+
+    print(f"{'endpoint':<10} {'queries':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for endpoint, times in latencies.items():
+        times = np.array(times) * 1e3
+        print(
+            f"{endpoint:<10} {len(times):>8} {np.percentile(times, 50):9.3f} "
+            f"{np.percentile(times, 99):9.3f}"
+        )
+    print(f"server side: p50 {stats['p50_ms']:.3f} ms, p99 {stats['p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the command line startup: wall time of `python port_risk --help` and cumulative import
+time (as reported by `python -X importtime`) of the package modules, checked against a budget so
+that heavy imports creeping back into the startup path are caught.
+
+Usage:
+    python -m benchmarks.bench_startup [--top N]
+
+Exits with status 1 when a measurement exceeds its budget.
+"""
+
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Budgets in seconds, a few times the measured values to absorb machine noise.
+BUDGETS = {
+    "help": 0.5,
+    "port_risk": 0.05,
+    "port_risk.main": 1.5,
+}
+
+
+def help_time(repeat: int = 3) -> float:
+    """
+    Returns the best wall time of `python port_risk --help` over repeat runs.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(ROOT / "__main__.py"), "--help"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(module: str) -> dict[str, float]:
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Parameters:
+        module: str
+            The module to import.
+
+    Return:
+        times: dict[str, float]
+            Cumulative import time in seconds of every module imported.
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Command line startup benchmark.")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of heaviest imports to list"
+    )
+    args = parser.parse_args()
+
+    results = {"help": help_time()}
+    breakdown = {}
+    for module in ("port_risk", "port_risk.main"):
+        breakdown[module] = min(
+            (import_times(module) for _ in range(3)), key=lambda t: t[module]
+        )
+        results[module] = breakdown[module][module]
+
+    top_level = {
+        name: seconds
+        for name, seconds in breakdown["port_risk.main"].items()
+        if "." not in name
+    }
+    print("Heaviest top-level imports of port_risk.main:")
+    for name, seconds in sorted(top_level.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"    {name:<24} {seconds:8.3f} s")
+
+    failed = False
+    for name, seconds in results.items():
+        status = "ok" if seconds <= BUDGETS[name] else "OVER BUDGET"
+        failed |= seconds > BUDGETS[name]
+        print(f"{name:<16} {seconds:8.3f} s  (budget {BUDGETS[name]:.2f} s)  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
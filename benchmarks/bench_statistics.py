@@ -0,0 +1,65 @@
+"""
+Benchmark of the goodness-of-fit tests: time of the exact fits and Kolmogorov-Smirnov tests of
+fit_distributions against approximate_fit_distributions on log-normal samples of growing size.
+The difference of the statistics is split into the part due to fitting a subsample, and the
+part due to testing on the quantile sketch, which stays within the reported error bound.
+
+Usage:
+    python -m benchmarks.bench_statistics [n_values ...]
+"""
+
+import sys
+import time
+import warnings
+
+import numpy as np
+import scipy.stats as stats
+
+from port_risk.preprocessing.statistics import (
+    approximate_fit_distributions,
+    fit_distributions,
+)
+
+TESTED_FUNCTIONS = {
+    "Exponential Distribution": stats.expon,
+    "Normal Distribution": stats.norm,
+    "Lognormal Distribution": stats.lognorm,
+    "Student-t Distribution": stats.t,
+}
+
+
+def main() -> None:
+    warnings.simplefilter("ignore", RuntimeWarning)
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000, 5_000_000]
+    print(
+        f"{'values':>9} {'exact (s)':>10} {'approx (s)':>11} "
+        f"{'fit |dD|':>9} {'sketch |dD|':>12} {'bound':>9}"
+    )
+    for n_values in sizes:
+        data = np.random.default_rng(0).lognormal(-9, 1, n_values)
+        start = time.perf_counter()
+        exact = fit_distributions(data, TESTED_FUNCTIONS, processes=1)
+        exact_time = time.perf_counter() - start
+        start = time.perf_counter()
+        approx, bounds = approximate_fit_distributions(
+            data, TESTED_FUNCTIONS, processes=1
+        )
+        approx_time = time.perf_counter() - start
+        fit_error = max(
+            abs(exact[name][1][0] - approx[name][1][0]) for name in TESTED_FUNCTIONS
+        )
+        sketch_error = max(
+            abs(
+                stats.ks_1samp(data, func(*approx[name][0]).cdf).statistic
+                - approx[name][1][0]
+            )
+            for name, func in TESTED_FUNCTIONS.items()
+        )
+        print(
+            f"{n_values:>9} {exact_time:10.2f} {approx_time:11.2f} "
+            f"{fit_error:9.2e} {sketch_error:12.2e} {max(bounds.values()):9.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
-from pkg_resources import resource_filename
+from pathlib import Path
+
+_data = Path(__file__).resolve().parent / "data"
 
 data_path = {
-    "climate_data": resource_filename("port_risk", "data/downtime_risk_present.csv"),
-    "network": resource_filename("port_risk", "data/port_trade_network.csv"),
-    "industries": resource_filename("port_risk", "data/sector_df.csv"),
-    "ports": resource_filename("port_risk", "data/nodes_maritime.gpkg"),
-    "countries": resource_filename("port_risk", "data/country_file.gpkg"),
-    "plots": resource_filename("port_risk", "data/plots/"),
-    "latex": resource_filename("port_risk", "data/latex/"),
+    "climate_data": str(_data / "downtime_risk_present.csv"),
+    "network": str(_data / "port_trade_network.csv"),
+    "industries": str(_data / "sector_df.csv"),
+    "ports": str(_data / "nodes_maritime.gpkg"),
+    "countries": str(_data / "country_file.gpkg"),
+    "plots": str(_data / "plots") + "/",
+    "latex": str(_data / "latex") + "/",
+    "cache": str(_data / "cache") + "/",
+    "profiles": str(_data / "profiles") + "/",
 }
@@ -0,0 +1,115 @@
+"""
+IO module coding the identifiers shared by the loaded data (countries, ports, port names,
+industries and sectors) to compact integers.
+
+Each identifier domain gets a single pandas CategoricalDtype built once at load time from every
+loaded table, so that all the columns of a domain (e.g. iso3_O, iso3_D, iso3 and port_iso3 for the
+countries) share the same categories. Merges, comparisons and groupbys on these columns then run
+on the integer codes, and the labels are only decoded at output.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Identifier domain of each coded column.
+COLUMN_DOMAINS = {
+    "iso3": "country",
+    "iso3_O": "country",
+    "iso3_D": "country",
+    "port_iso3": "country",
+    "id": "port",
+    "port_name": "port_name",
+    "Industries": "industry",
+    "sector": "sector",
+}
+
+
+class CodeBook:
+    """
+    Shared categorical dtype of each identifier domain.
+    """
+
+    def __init__(self, dtypes: dict[str, pd.CategoricalDtype]) -> None:
+        self.dtypes = dtypes
+
+    @classmethod
+    def from_frames(cls, *frames: pd.DataFrame) -> "CodeBook":
+        """
+        Builds the code book of the identifiers found in the frames. Categories are sorted so
+        that the codes follow the order of the labels.
+
+        Parameters:
+            frames: pd.DataFrame
+                The loaded tables.
+
+        Return:
+            codes: CodeBook
+                The code book.
+        """
+        labels = {domain: [] for domain in COLUMN_DOMAINS.values()}
+        for frame in frames:
+            for col, domain in COLUMN_DOMAINS.items():
+                if col not in frame.columns:
+                    continue
+                values = frame[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    labels[domain].append(values.cat.categories.to_numpy())
+                else:
+                    labels[domain].append(values.dropna().unique())
+        dtypes = {
+            domain: pd.CategoricalDtype(
+                np.unique(np.concatenate(values)) if values else []
+            )
+            for domain, values in labels.items()
+        }
+        return cls(dtypes)
+
+    def dtype(self, col: str) -> pd.CategoricalDtype:
+        """
+        Returns the categorical dtype of a coded column.
+        """
+        if col not in COLUMN_DOMAINS:
+            raise KeyError(f"{col} is not an identifier column.")
+        return self.dtypes[COLUMN_DOMAINS[col]]
+
+    def encode(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts the identifier columns of a frame to the shared categorical dtypes. Labels
+        missing from the code book become NaN.
+
+        Parameters:
+            frame: pd.DataFrame
+                The frame to encode.
+
+        Return:
+            frame: pd.DataFrame
+                The frame with coded identifier columns.
+        """
+        columns = [col for col in COLUMN_DOMAINS if col in frame.columns]
+        return frame.astype({col: self.dtype(col) for col in columns})
+
+
+def decode(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the coded identifier columns of a frame back to their labels, for output. Columns get
+    the dtype of their labels, object for strings and int64 for the industries.
+
+    Parameters:
+        frame: pd.DataFrame
+            The frame to decode.
+
+    Return:
+        frame: pd.DataFrame
+            The frame with uncoded identifier columns.
+    """
+    columns = [
+        col
+        for col in COLUMN_DOMAINS
+        if col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype)
+    ]
+    if not columns:
+        return frame
+    frame = frame.copy()
+    for col in columns:
+        frame[col] = frame[col].to_numpy()
+    return frame
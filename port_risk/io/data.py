@@ -2,10 +2,17 @@
 IO Module for loading the data
 """
 
+import hashlib
+import os
+import tempfile
 import pandas as pd
 import geopandas as gpd
 from pathlib import Path
 from port_risk import data_path
+from port_risk.io.codes import CodeBook
+
+NETWORK_CATEGORIES = ["iso3_O", "iso3_D", "id", "Industries", "flow"]
+NETWORK_FLOAT_DTYPE = "float32"
 
 
 def load_risk_data() -> pd.DataFrame:
@@ -65,23 +72,162 @@ def load_industries_data() -> pd.DataFrame:
     return df
 
 
-def load_maritime_network() -> pd.DataFrame:
+def file_digest(path: Path, chunk_size: int = 1 << 24) -> str:
     """
-    Loads the maritime trade network.
+    Computes a content hash of a file, read in chunks so that large files are never fully loaded.
 
     Parameters:
+        path: Path
+            The file to hash.
+        chunk_size: int default 16 MiB
+            Number of bytes read at a time.
+
+    Returns:
+        digest: str
+            The hexadecimal blake2b digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def apply_network_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applies the fixed schema of the maritime trade network: identifier columns are stored as
+    categoricals and float columns are narrowed.
+
+    Parameters:
+        df: pd.DataFrame
+            The maritime trade network as parsed from the csv file.
+
+    Returns:
+        df: pd.DataFrame
+            The network with the compact schema applied.
+    """
+    for col in NETWORK_CATEGORIES:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    float_cols = df.select_dtypes(include="float64").columns
+    df[float_cols] = df[float_cols].astype(NETWORK_FLOAT_DTYPE)
+    return df
+
+
+def atomic_write(cache_path: Path, write, stale_pattern: str = None) -> None:
+    """
+    Writes a cache file atomically: write fills a temporary file of the cache folder which then
+    replaces cache_path, so that an interrupted write never leaves a truncated cache. The other
+    files matching stale_pattern are removed once the new file is in place.
+
+    Parameters:
+        cache_path: Path
+            The cache file.
+        write: Callable
+            Function writing the cache content to the path it is given. The path has the suffix of
+            cache_path.
+        stale_pattern: str default None
+            Glob pattern of the cache files of previous versions of the source.
+
+    Returns:
         None
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(
+        dir=cache_path.parent,
+        prefix=f".{cache_path.stem}_",
+        suffix=f".tmp{cache_path.suffix}",
+    )
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, cache_path)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+    if stale_pattern is None:
+        return
+    for stale in cache_path.parent.glob(stale_pattern):
+        if stale != cache_path:
+            stale.unlink(missing_ok=True)
+
+
+def write_cache(df: pd.DataFrame, cache_path: Path, stale_pattern: str) -> None:
+    """
+    Writes a parquet cache file atomically with atomic_write.
+
+    Parameters:
+        df: pd.DataFrame
+            The frame to cache.
+        cache_path: Path
+            The cache file.
+        stale_pattern: str
+            Glob pattern of the cache files of previous versions of the source.
+
+    Returns:
+        None
+    """
+    atomic_write(cache_path, lambda tmp: df.to_parquet(tmp, index=False), stale_pattern)
+
+
+def load_maritime_network(cache: bool = True) -> pd.DataFrame:
+    """
+    Loads the maritime trade network. The first parse of the csv file is written to a parquet
+    cache keyed on the content hash of the source file, later loads read the cache instead.
+
+    Parameters:
+        cache: bool default True
+            Boolean flag set to False to always parse the csv file and skip the cache.
 
     Returns:
         df: pd.DataFrame
             The loaded data.
     """
     path = Path(data_path["network"])
-    df = pd.read_csv(path)
+    if not cache:
+        return apply_network_schema(pd.read_csv(path))
+
+    cache_path = Path(data_path["cache"], f"{path.stem}_{file_digest(path)}.parquet")
+    if cache_path.exists():
+        return apply_network_schema(pd.read_parquet(cache_path))
+
+    df = apply_network_schema(pd.read_csv(path))
+    try:
+        write_cache(df, cache_path, f"{path.stem}_*.parquet")
+    except ImportError:
+        print("No parquet engine available, the maritime network will not be cached.")
+    except OSError as e:
+        print(f"Could not write the maritime network cache ({e}).")
 
     return df
 
 
+def load_coded_data(cache: bool = True) -> tuple:
+    """
+    Loads the climate risk data, the ports, the industries and the maritime network and codes
+    their identifier columns with a single code book built from all of them, so that the
+    countries, ports, port names, industries and sectors share the same categorical dtypes across
+    tables. The code book needs every table (the countries of the network in particular), so it is
+    built here once the raw tables are loaded rather than by each loader.
+
+    Parameters:
+        cache: bool default True
+            Boolean flag set to False to always parse the maritime network csv file.
+
+    Returns:
+        risks, ports, industries, network, codes: tuple
+            The loaded data and the code book.
+    """
+    risks = load_risk_data()
+    ports = load_ports_data()
+    industries = load_industries_data()
+    network = load_maritime_network(cache=cache)
+    codes = CodeBook.from_frames(risks, ports, industries, network)
+    risks, ports, industries, network = (
+        codes.encode(df) for df in (risks, ports, industries, network)
+    )
+    return risks, ports, industries, network, codes
+
+
 def load_countries() -> gpd.GeoDataFrame:
     """
     Loads a geopandas dataframe with all countries studied for plotting.
@@ -2,15 +2,223 @@
 IO module used for plotting the results.
 """
 
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path as MplPath
 
 
 from pathlib import Path
 
 from port_risk import data_path
 
+RISK_COLUMNS = [
+    "domestic_import_risk",
+    "domestic_export_risk",
+    "foreign_import_risk",
+    "foreign_export_risk",
+]
+# Simplification tolerance of the map geometries in degrees, well below the size of a pixel of
+# the saved figures.
+SIMPLIFY_TOLERANCE = 0.05
+
+_simplified = {}
+
+
+def geometry_digest(gdf) -> str:
+    """
+    Computes a content hash of the geometries of a GeoDataFrame.
+    """
+    import shapely
+
+    digest = hashlib.blake2b(digest_size=16)
+    for wkb in shapely.to_wkb(gdf.geometry.values):
+        digest.update(wkb)
+    return digest.hexdigest()
+
+
+def simplify_geometries(gdf, tolerance: float = SIMPLIFY_TOLERANCE, cache: bool = True):
+    """
+    Simplifies the geometries of a GeoDataFrame for plotting. Simplified geometries are kept in
+    memory and in a parquet cache keyed on the content hash of the geometries, so that they are
+    computed once.
+
+    Parameters:
+        gdf: gpd.GeoDataFrame
+            The frame to simplify.
+        tolerance: float default SIMPLIFY_TOLERANCE
+            The simplification tolerance, in the units of the frame crs.
+        cache: bool default True
+            Boolean flag set to False to skip the parquet cache.
+
+    Return:
+        gdf: gpd.GeoDataFrame
+            A copy of the frame with simplified geometries.
+    """
+    import geopandas as gpd
+
+    key = f"{geometry_digest(gdf)}_{tolerance:g}"
+    if key not in _simplified:
+        cache_path = Path(data_path["cache"], f"geometry_{key}.parquet")
+        if cache and cache_path.exists():
+            geometry = gpd.read_parquet(cache_path).geometry.values
+        else:
+            geometry = gdf.geometry.simplify(tolerance).values
+            if cache:
+                try:
+                    cache_path.parent.mkdir(parents=True, exist_ok=True)
+                    gpd.GeoDataFrame(geometry=geometry).to_parquet(cache_path)
+                except ImportError:
+                    print("No parquet engine available, geometries will not be cached.")
+        _simplified[key] = geometry
+    gdf = gdf.copy()
+    gdf[gdf.geometry.name] = _simplified[key]
+    return gdf
+
+
+def polygon_collection(gdf) -> tuple:
+    """
+    Builds a matplotlib collection of the polygons of a GeoDataFrame, so that a choropleth only
+    has to set the values of the collection instead of plotting the frame again.
+
+    Parameters:
+        gdf: gpd.GeoDataFrame
+            The polygons to plot.
+
+    Return:
+        collection, index: tuple
+            The collection with one patch per polygon part, and the row of gdf of each patch.
+    """
+    import shapely
+
+    parts, index = shapely.get_parts(
+        shapely.normalize(gdf.geometry.values), return_index=True
+    )
+    is_polygon = shapely.get_type_id(parts) == 3
+    parts, index = parts[is_polygon], index[is_polygon]
+    patches = [
+        PathPatch(
+            MplPath.make_compound_path(
+                *[
+                    MplPath(np.asarray(ring.coords)[:, :2])
+                    for ring in [polygon.exterior, *polygon.interiors]
+                ]
+            )
+        )
+        for polygon in parts
+    ]
+    return PatchCollection(patches), index
+
+
+class RiskMap:
+    """
+    Figure of the downtime risk of each country on a world map. The base map (world background,
+    country polygons, colorbars and titles) is rendered once, each risk frame then only sets the
+    values of the country polygons.
+    """
+
+    colorbar = "magma_r"
+    vmin = 0
+    vmax = 6
+
+    def __init__(self, world, countries, simplify: bool = True) -> None:
+        if simplify:
+            world = simplify_geometries(world)
+            countries = simplify_geometries(countries)
+        self.world = world
+        self.countries = countries
+        self.fig = None
+        self.axes = None
+        self.layers = None
+        self.index = None
+
+    def render_base(self) -> None:
+        """
+        Renders the base map.
+        """
+        norm = colors.Normalize(vmin=self.vmin, vmax=self.vmax)
+        cbar = plt.cm.ScalarMappable(norm=norm, cmap=self.colorbar)
+        plt.rcParams["axes.spines.right"] = True
+        plt.rcParams["axes.spines.top"] = True
+        plt.rcParams["axes.spines.left"] = True
+        plt.rcParams["axes.spines.bottom"] = True
+        self.fig, axes = plt.subplots(2, 2, figsize=(18, 12))
+        self.axes = axes.flatten()
+        self.layers = []
+        for sub_ax, column in zip(self.axes, RISK_COLUMNS):
+            self.world.plot(color="grey", alpha=0.3, ax=sub_ax)
+            layer, self.index = polygon_collection(self.countries)
+            layer.set_cmap(self.colorbar)
+            layer.set_norm(norm)
+            sub_ax.add_collection(layer, autolim=False)
+            self.layers.append(layer)
+            # add colorbar
+            ax_cbar = self.fig.colorbar(
+                cbar,
+                fraction=0.012,
+                pad=-0.16,
+                ticks=[0, 2, 4, 6],
+                orientation="horizontal",
+                ax=sub_ax,
+            )
+            ax_cbar.ax.set_xticklabels(["0", "2", "4", "6"], fontsize=11)
+            ax_cbar.set_label("Downtime risk (days per year)", fontsize=11)
+            sub_ax.set_xlim(-180, 180)
+            sub_ax.set_ylim(-75, 80)
+            sub_ax.title.set_text(" ".join(column.split("_")))
+
+    def draw(
+        self,
+        risk_df: pd.DataFrame,
+        name: str,
+        hazard: str,
+        show: bool = False,
+        save: bool = False,
+    ) -> Path:
+        """
+        Draws the risk of risk_df on the base map, see plot_downtime_risk. Countries missing from
+        risk_df are left blank.
+
+        Return:
+            path: Path
+                The file the figure was saved to, None when it was not saved.
+        """
+        if self.fig is None:
+            self.render_base()
+        values = (
+            risk_df.set_index("iso3")[RISK_COLUMNS]
+            .reindex(self.countries["iso3"])
+            .to_numpy(dtype=float)[self.index]
+        )
+        for j, layer in enumerate(self.layers):
+            layer.set_array(np.ma.masked_invalid(values[:, j]))
+        self.fig.suptitle(f"Downtime risk {hazard.split('_')[1]} ({name})")
+        path = None
+        if show:
+            plt.show()
+        if save:
+            path = Path(data_path["plots"], f"risk_{name}_{hazard}")
+            self.fig.savefig(path)
+        return path
+
+    def close(self) -> None:
+        """
+        Closes the figure.
+        """
+        if self.fig is not None:
+            plt.close(self.fig)
+        self.fig = None
+        self.axes = None
+        self.layers = None
+
 
 def plot_downtime_risk(
     world,
@@ -43,54 +251,62 @@ def plot_downtime_risk(
     Return:
         None
     """
-    colorbar = "magma_r"
-    vmin = 0
-    vmax = 6
-    norm = colors.Normalize(vmin=vmin, vmax=vmax)
-    cbar = plt.cm.ScalarMappable(norm=norm, cmap=colorbar)
-    fig, axes = plt.subplots(2, 2, figsize=(18, 12))
-    columns = [
-        "domestic_import_risk",
-        "domestic_export_risk",
-        "foreign_import_risk",
-        "foreign_export_risk",
+    risk_map = RiskMap(world, countries)
+    risk_map.draw(risk_df, name, hazard, show=show, save=save)
+    risk_map.close()
+
+
+_worker_map = None
+
+
+def _init_worker(world, countries) -> None:
+    """
+    Initialises a plotting worker with a non-interactive backend and its own base map.
+    """
+    global _worker_map
+    matplotlib.use("Agg")
+    _worker_map = RiskMap(world, countries, simplify=False)
+
+
+def _draw_worker(risk_df: pd.DataFrame, name: str, hazard: str) -> Path:
+    return _worker_map.draw(risk_df, name, hazard, save=True)
+
+
+def plot_downtime_risks(world, countries, jobs: list, processes: int = None) -> list:
+    """
+    Plots and saves the downtime risk maps of many (risk_df, name, hazard) jobs, see
+    plot_downtime_risk. The geometries are simplified once, and the figures are rendered on a
+    process pool with a non-interactive backend, each worker reusing its base map.
+
+    Parameters:
+        world : gpd.GeoDataFrame,
+            Geopandas world map.
+        countries: gpd.GeoDataFrame,
+            Countries identification.
+        jobs: list
+            The (risk_df, name, hazard) arguments of each figure.
+        processes: int default None
+            Number of worker processes, defaults to the number of cores. Set to 1 to plot in the
+            current process.
+
+    Return:
+        paths: list
+            The file each figure was saved to.
+    """
+    world = simplify_geometries(world)
+    countries = simplify_geometries(countries)
+    jobs = [
+        (risk_df[["iso3"] + RISK_COLUMNS], name, hazard)
+        for risk_df, name, hazard in jobs
     ]
-    i = 0
-    for ax in axes:
-        for sub_ax in ax:
-            world.plot(color="grey", alpha=0.3, ax=sub_ax)
-            countries.merge(risk_df, on="iso3").plot(
-                column=columns[i],
-                vmin=vmin,
-                vmax=vmax,
-                cmap=colorbar,
-                ax=sub_ax,
-            )
-            # add colorbar
-            ax_cbar = fig.colorbar(
-                cbar,
-                fraction=0.012,
-                pad=-0.16,
-                ticks=[0, 2, 4, 6],
-                orientation="horizontal",
-                ax=sub_ax,
-            )
-            ax_cbar.ax.set_xticklabels(["0", "2", "4", "6"], fontsize=11)
-            ax_cbar.set_label("Downtime risk (days per year)", fontsize=11)
-            sub_ax.set_xlim(-180, 180)
-            sub_ax.set_ylim(-75, 80)
-            plt.rcParams["axes.spines.right"] = True
-            plt.rcParams["axes.spines.top"] = True
-            plt.rcParams["axes.spines.left"] = True
-            plt.rcParams["axes.spines.bottom"] = True
-            sub_ax.title.set_text(columns[i])
-
-            sub_ax.title.set_text(" ".join(columns[i].split("_")))
-            i += 1
-    fig.suptitle(f"Downtime risk {hazard.split('_')[1]} ({name})")
-    if show:
-        plt.show()
-    if save:
-        path = Path(data_path["plots"], f"risk_{name}_{hazard}")
-        plt.savefig(path)
-    plt.close()
+    processes = min(processes or os.cpu_count(), max(len(jobs), 1))
+    if processes == 1:
+        risk_map = RiskMap(world, countries, simplify=False)
+        paths = [risk_map.draw(*job, save=True) for job in jobs]
+        risk_map.close()
+        return paths
+
+    with ProcessPoolExecutor(
+        processes, initializer=_init_worker, initargs=(world, countries)
+    ) as pool:
+        return list(pool.map(_draw_worker, *zip(*jobs)))
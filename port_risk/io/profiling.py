@@ -0,0 +1,211 @@
+"""
+IO module recording the resources used by each stage of the pipeline and writing them to a run
+report.
+"""
+
+import cProfile
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from port_risk import data_path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the process so far in MB, or NaN when it is not
+    available.
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def describe_outputs(outputs: dict, prefix: str = "") -> list[dict]:
+    """
+    Describes the frames output by a stage, looking into nested dictionaries of frames.
+
+    Parameters:
+        outputs: dict
+            Mapping of output name to DataFrame, Series, array or dictionary of these.
+        prefix: str default ""
+            Prefix of the names, used for nested dictionaries.
+
+    Return:
+        frames: list[dict]
+            Name, rows, columns and memory (MB) of every frame.
+    """
+    frames = []
+    for name, value in outputs.items():
+        name = f"{prefix}{name}"
+        if isinstance(value, dict):
+            frames += describe_outputs(value, f"{name}/")
+        elif isinstance(value, pd.DataFrame):
+            frames.append(
+                {
+                    "name": name,
+                    "rows": value.shape[0],
+                    "columns": value.shape[1],
+                    "memory_mb": value.memory_usage(deep=True).sum() / 1024**2,
+                }
+            )
+        elif isinstance(value, pd.Series):
+            frames.append(
+                {
+                    "name": name,
+                    "rows": len(value),
+                    "columns": 1,
+                    "memory_mb": value.memory_usage(deep=True) / 1024**2,
+                }
+            )
+        elif isinstance(value, np.ndarray):
+            frames.append(
+                {
+                    "name": name,
+                    "rows": value.shape[0] if value.ndim else 1,
+                    "columns": value.shape[1] if value.ndim > 1 else 1,
+                    "memory_mb": value.nbytes / 1024**2,
+                }
+            )
+    return frames
+
+
+class StageProfiler:
+    """
+    Records the wall time, CPU time, peak RSS increase and output frames of the stages of a run.
+    When disabled, stages run without any instrumentation.
+    """
+
+    def __init__(
+        self, enabled: bool = True, cprofile: bool = False, folder: Path = None
+    ) -> None:
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.started = datetime.now(timezone.utc)
+        self.folder = Path(
+            folder
+            or Path(data_path["profiles"], self.started.strftime("run_%Y%m%dT%H%M%S"))
+        )
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager profiling the code run in its block as the stage name.
+
+        Parameters:
+            name: str
+                Name of the stage.
+        """
+        if not self.enabled:
+            yield
+            return
+        profile = cProfile.Profile() if self.cprofile else None
+        peak = peak_rss_mb()
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profile is not None:
+                profile.disable()
+            record = {
+                "stage": name,
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                "peak_rss_mb": peak_rss_mb(),
+                "peak_rss_delta_mb": peak_rss_mb() - peak,
+                "outputs": [],
+            }
+            if error is not None:
+                record["error"] = error
+            if profile is not None:
+                self.folder.mkdir(parents=True, exist_ok=True)
+                path = Path(self.folder, f"{len(self.stages):02d}_{name}.prof")
+                profile.dump_stats(path)
+                record["cprofile"] = str(path)
+            self.stages.append(record)
+
+    def outputs(self, **outputs) -> None:
+        """
+        Records the frames output by the last stage.
+
+        Parameters:
+            outputs:
+                Mapping of output name to DataFrame, Series, array or dictionary of these.
+
+        Return:
+            None
+        """
+        if self.enabled and self.stages:
+            self.stages[-1]["outputs"] += describe_outputs(outputs)
+
+    def report(self) -> dict:
+        """
+        Returns the run report: run metadata and the records of every stage.
+        """
+        return {
+            "started": self.started.isoformat(),
+            "argv": sys.argv,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "wall_s": sum(stage["wall_s"] for stage in self.stages),
+            "cpu_s": sum(stage["cpu_s"] for stage in self.stages),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the report as a flat table with one row per stage output (or per stage when it has
+        no recorded output).
+        """
+        rows = []
+        for stage in self.stages:
+            base = {key: value for key, value in stage.items() if key != "outputs"}
+            for output in stage["outputs"] or [{}]:
+                rows.append(
+                    {
+                        **base,
+                        **{f"output_{key}": value for key, value in output.items()},
+                    }
+                )
+        return pd.DataFrame(rows)
+
+    def save(self) -> Path:
+        """
+        Writes the run report as report.json and report.csv in the profiling folder.
+
+        Return:
+            folder: Path
+                The folder the report is written to.
+        """
+        if not self.enabled:
+            return self.folder
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with open(Path(self.folder, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        self.to_frame().to_csv(Path(self.folder, "report.csv"), index=False)
+        return self.folder
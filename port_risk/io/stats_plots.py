@@ -5,13 +5,14 @@ Module to plot statistical data
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-import statsmodels.api as sm
-import scipy.stats as stats
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from port_risk import data_path
 
+if TYPE_CHECKING:
+    import scipy.stats as stats
+
 
 def plot_histogram(data: pd.Series, show: bool = False, save: bool = False) -> None:
     """
@@ -42,7 +43,7 @@ def plot_histogram(data: pd.Series, show: bool = False, save: bool = False) -> N
 def plot_qq_plot(
     data: pd.Series,
     name: str,
-    func: stats.distributions,
+    func: "stats.distributions",
     show: bool = False,
     save: bool = False,
 ) -> None:
@@ -64,6 +65,8 @@ def plot_qq_plot(
     Return:
         None
     """
+    import statsmodels.api as sm
+
     sm.qqplot(data, dist=func, line="45")
     plt.title(name)
 
@@ -93,6 +96,8 @@ def plot_correlation_matrix(
     Return:
         None
     """
+    import seaborn as sns
+
     plt.figure(figsize=(10, 10))
     sns.heatmap(corr_matrix, annot=True)
     if show:
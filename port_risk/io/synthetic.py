@@ -0,0 +1,293 @@
+"""
+IO module generating synthetic inputs with the same schema as the loaded data, used for
+benchmarking when the real data is not available.
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from port_risk.io.data import NETWORK_FLOAT_DTYPE
+
+FLOWS = ["port_export", "port_import", "port_trans"]
+HAZARDS = ["TC", "coastal", "earthquake", "fluvial", "operational", "pluvial"]
+
+# Sizes of the 1x synthetic data, and the exponent each size grows with the scale factor: trade
+# flows and ports grow linearly while countries and industries grow more slowly.
+BASE_SIZES = {
+    "n_rows": 100_000,
+    "n_countries": 150,
+    "n_ports": 1_400,
+    "n_industries": 11,
+}
+SCALE_EXPONENTS = {
+    "n_rows": 1.0,
+    "n_countries": 0.5,
+    "n_ports": 1.0,
+    "n_industries": 0.5,
+}
+MAX_COUNTRIES = 26**3
+
+
+def make_countries(n_countries: int) -> np.ndarray:
+    """
+    Makes distinct three letters country codes.
+
+    Parameters:
+        n_countries: int
+            Number of countries.
+
+    Return:
+        countries: np.ndarray
+            The country codes.
+    """
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codes = np.arange(n_countries)
+    return np.char.add(
+        np.char.add(letters[codes // 676 % 26], letters[codes // 26 % 26]),
+        letters[codes % 26],
+    )
+
+
+def make_ports(
+    n_ports: int, countries: np.ndarray, rng: np.random.Generator
+) -> gpd.GeoDataFrame:
+    """
+    Makes a ports frame with the schema of load_ports_data.
+
+    Parameters:
+        n_ports: int
+            Number of ports.
+        countries: np.ndarray
+            Country codes the ports are located in.
+        rng: np.random.Generator
+            Random generator.
+
+    Return:
+        ports: gpd.GeoDataFrame
+            The synthetic ports.
+    """
+    iso3 = countries[rng.integers(0, len(countries), n_ports)]
+    ports = gpd.GeoDataFrame(
+        {
+            "id": np.char.add("port", np.arange(n_ports).astype(str)),
+            "port_name": np.char.add(
+                np.char.add("Port", np.arange(n_ports).astype(str)),
+                np.char.add("_", iso3),
+            ),
+            "iso3": iso3,
+        },
+        geometry=gpd.points_from_xy(
+            rng.uniform(-180, 180, n_ports), rng.uniform(-60, 75, n_ports)
+        ),
+        crs="EPSG:4326",
+    )
+    return ports
+
+
+def make_industries(n_industries: int) -> pd.DataFrame:
+    """
+    Makes an industry to sector mapping with the schema of load_industries_data.
+
+    Parameters:
+        n_industries: int
+            Number of industries, each mapped to its own sector.
+
+    Return:
+        industries: pd.DataFrame
+            The synthetic mapping.
+    """
+    codes = np.arange(1, n_industries + 1)
+    return pd.DataFrame(
+        {"Industries": codes, "sector": np.char.add("Sector", codes.astype(str))}
+    )
+
+
+def categorical(values: np.ndarray, index: np.ndarray) -> pd.Categorical:
+    """
+    Builds the categorical of values[index] without materialising it, with categories sorted as
+    astype("category") would sort them.
+
+    Parameters:
+        values: np.ndarray
+            The distinct values.
+        index: np.ndarray
+            The position in values of each element.
+
+    Return:
+        categorical: pd.Categorical
+            The categorical.
+    """
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(len(values))
+    return pd.Categorical.from_codes(rank[index], categories=values[order])
+
+
+def make_network(
+    n_rows: int,
+    countries: np.ndarray,
+    ports: gpd.GeoDataFrame,
+    industries: pd.DataFrame,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    """
+    Makes a maritime trade network with the schema of load_maritime_network, identifiers being
+    built directly as categoricals so that large networks never hold a string per row. Flows are
+    log-normal and ports are drawn with a skewed popularity so that a few hubs carry most of the
+    trade.
+
+    Parameters:
+        n_rows: int
+            Number of trade flows.
+        countries: np.ndarray
+            Country codes of origins and destinations.
+        ports: gpd.GeoDataFrame
+            The ports the flows transit through.
+        industries: pd.DataFrame
+            The industries of the flows.
+        rng: np.random.Generator
+            Random generator.
+
+    Return:
+        network: pd.DataFrame
+            The synthetic network.
+    """
+    popularity = rng.pareto(1.5, len(ports)) + 1
+    port_index = rng.choice(len(ports), n_rows, p=popularity / popularity.sum())
+    network = pd.DataFrame(
+        {
+            "iso3_O": categorical(countries, rng.integers(0, len(countries), n_rows)),
+            "iso3_D": categorical(countries, rng.integers(0, len(countries), n_rows)),
+            "id": categorical(ports["id"].to_numpy(), port_index),
+            "Industries": categorical(
+                industries["Industries"].to_numpy(),
+                rng.integers(0, len(industries), n_rows),
+            ),
+            "flow": categorical(np.array(FLOWS), rng.integers(0, len(FLOWS), n_rows)),
+            "q_sea_flow": rng.lognormal(3, 2, n_rows).astype(NETWORK_FLOAT_DTYPE),
+            "v_sea_flow": rng.lognormal(5, 2, n_rows).astype(NETWORK_FLOAT_DTYPE),
+        }
+    )
+    return network
+
+
+def make_risks(
+    ports: gpd.GeoDataFrame, rng: np.random.Generator, coverage: float = 0.9
+) -> pd.DataFrame:
+    """
+    Makes a climate risk frame with the schema of load_risk_data: the expected downtime (days per
+    year) of a share of the ports for every hazard.
+
+    Parameters:
+        ports: gpd.GeoDataFrame
+            The ports exposed to the hazards.
+        rng: np.random.Generator
+            Random generator.
+        coverage: float default 0.9
+            Share of the ports with downtime data.
+
+    Return:
+        risks: pd.DataFrame
+            The synthetic downtimes.
+    """
+    covered = ports["port_name"].to_numpy()[rng.random(len(ports)) < coverage]
+    risks = pd.DataFrame(
+        {
+            "port_name": np.repeat(covered, len(HAZARDS)),
+            "hazard": np.tile(HAZARDS, len(covered)),
+        }
+    )
+    risks["risk"] = rng.exponential(1.0, len(risks)) * (rng.random(len(risks)) < 0.7)
+    return risks
+
+
+def make_synthetic_data(
+    n_rows: int = 100_000,
+    n_countries: int = 150,
+    n_ports: int = 1_400,
+    n_industries: int = 11,
+    seed: int = 0,
+) -> tuple[pd.DataFrame, gpd.GeoDataFrame, pd.DataFrame]:
+    """
+    Makes a consistent set of synthetic network, ports and industries frames, those of
+    make_scaled_data with explicit sizes.
+
+    Parameters:
+        n_rows: int default 100_000
+            Number of trade flows of the network.
+        n_countries: int default 150
+            Number of countries.
+        n_ports: int default 1_400
+            Number of ports.
+        n_industries: int default 11
+            Number of industries.
+        seed: int default 0
+            Seed of the random generator.
+
+    Return:
+        network, ports, industries: tuple
+            The synthetic frames.
+    """
+    network, ports, industries, _ = make_scaled_data(
+        seed=seed,
+        n_rows=n_rows,
+        n_countries=n_countries,
+        n_ports=n_ports,
+        n_industries=n_industries,
+    )
+    return network, ports, industries
+
+
+def scaled_sizes(scale: float = 1.0, **sizes) -> dict:
+    """
+    Computes the sizes of the synthetic data at a scale factor of the 1x sizes.
+
+    Parameters:
+        scale: float default 1.0
+            The scale factor.
+        sizes:
+            Sizes overriding the scaled ones, e.g. n_countries=200.
+
+    Return:
+        sizes: dict
+            The n_rows, n_countries, n_ports and n_industries of make_synthetic_data.
+    """
+    scaled = {
+        name: max(1, round(base * scale ** SCALE_EXPONENTS[name]))
+        for name, base in BASE_SIZES.items()
+    }
+    scaled["n_countries"] = min(scaled["n_countries"], MAX_COUNTRIES)
+    scaled.update(sizes)
+    return scaled
+
+
+def make_scaled_data(
+    scale: float = 1.0, seed: int = 0, coverage: float = 0.9, **sizes
+) -> tuple[pd.DataFrame, gpd.GeoDataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Makes a consistent set of synthetic network, ports, industries and climate risk frames at a
+    scale factor of the 1x sizes, see scaled_sizes.
+
+    Parameters:
+        scale: float default 1.0
+            The scale factor.
+        seed: int default 0
+            Seed of the random generator.
+        coverage: float default 0.9
+            Share of the ports with downtime data.
+        sizes:
+            Sizes overriding the scaled ones, e.g. n_countries=200.
+
+    Return:
+        network, ports, industries, risks: tuple
+            The synthetic frames.
+    """
+    sizes = scaled_sizes(scale, **sizes)
+    rng = np.random.default_rng(seed)
+    countries = make_countries(sizes["n_countries"])
+    ports = make_ports(sizes["n_ports"], countries, rng)
+    industries = make_industries(sizes["n_industries"])
+    network = make_network(sizes["n_rows"], countries, ports, industries, rng)
+    risks = make_risks(ports, rng, coverage)
+    return network, ports, industries, risks
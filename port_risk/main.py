@@ -2,51 +2,50 @@
 Main module to be executed when the project is run.
 """
 
-from port_risk.io.latex import make_metrics_table, make_stats_table
-import scipy.stats as stats
-import pandas as pd
-from port_risk.models.machine_learning import run_all_models
-from port_risk.preprocessing.machine_learning import (
-    get_data_model_ready,
-    ml_preprocessing,
-    make_validation_data,
-)
-
-from port_risk.io.data import (
-    load_risk_data,
-    load_ports_data,
-    load_maritime_network,
-    load_industries_data,
-    load_countries,
-    load_world,
-)
-from port_risk.io.plots import plot_downtime_risk
-from port_risk.io.validation_plots import make_oob_error_plots, make_depth_plots
-
+from port_risk.io.data import load_coded_data, load_countries, load_world
 from port_risk.preprocessing.merge import merge_ports_risk, merge_network_industries
-from port_risk.preprocessing.statistics import compute_statistics
 from port_risk.preprocessing.trade import create_trade_dataframe
 from port_risk.models.risk import create_risk_dataframe
-from port_risk.models.machine_learning import find_optimal_params
-from port_risk.models.models import (
-    ExtraTrees,
-    RandomForest,
-    GradientBoost,
-    models,
-    optimal_depth_trees,
-    oob_erros_trees,
-)
+from port_risk.models.cube import load_risk_cube
+from port_risk.models.exposure import load_exposure
+from port_risk.io.profiling import StageProfiler
+
+# The plotting, statistics and machine learning stages import matplotlib, scipy.stats and sklearn
+# when they run, so that the risk computation does not pay for them.
 
 
 def main(args, argv) -> None:
     """
     Main function to be ran when the package is called.
     """
-    risks = load_risk_data()
-    ports = load_ports_data()
-    ports_risk = merge_ports_risk(risks, ports)
-    industries = load_industries_data()
-    network = load_maritime_network()
+    profiler = StageProfiler(
+        enabled=getattr(args, "profile", False),
+        cprofile=getattr(args, "cprofile", False),
+    )
+    # The report is saved even when a stage fails, it then holds the stages run so far.
+    try:
+        run_stages(args, profiler)
+    finally:
+        if profiler.enabled:
+            print(f"Profiling report written to {profiler.save()}")
+
+
+def run_stages(args, profiler: StageProfiler) -> None:
+    """
+    Runs the stages of the project, profiled by profiler.
+    """
+    no_cache = getattr(args, "no_cache", False)
+
+    with profiler.stage("load"):
+        risks, ports, industries, network, _ = load_coded_data(cache=not no_cache)
+        ports_risk = merge_ports_risk(risks, ports)
+    profiler.outputs(
+        risks=risks,
+        ports=ports,
+        ports_risk=ports_risk,
+        industries=industries,
+        network=network,
+    )
 
     print("Loaded All required data")
     print("========================")
@@ -54,7 +53,7 @@ def main(args, argv) -> None:
     # =============
     # Setting flags
     # =============
-    if not len(argv) > 1:
+    if not (args.validation or args.stats or args.models):
         validation_flag = True
         stats_flag = True
         running_flag = True
@@ -63,90 +62,173 @@ def main(args, argv) -> None:
         stats_flag = args.stats
         running_flag = args.models
 
-    network = merge_network_industries(network, industries)
-    trade = create_trade_dataframe(network, ports)
+    with profiler.stage("trade"):
+        network = merge_network_industries(network, industries)
+        trade = create_trade_dataframe(network, ports)
+    profiler.outputs(network=network, trade=trade)
 
     print("Create trade dataframes")
     print("=======================")
 
-    # hazards = list(
-    #     map(lambda x: f"downtime_{x}", risks["hazard"].drop_duplicates().values)
-    # )
-    # hazards += ["downtime_total"]
-    hazards = ["downtime_total"]
-    risk = create_risk_dataframe(trade, ports_risk, hazards)
+    with profiler.stage("risk"):
+        hazards = list(
+            map(lambda x: f"downtime_{x}", risks["hazard"].drop_duplicates().values)
+        )
+        hazards += ["downtime_total"]
+        risk = create_risk_dataframe(trade, ports_risk, hazards)
+    profiler.outputs(risk=risk)
     print("Create risk dataframes")
     print("======================")
 
+    with profiler.stage("cube"):
+        cube = load_risk_cube(risk, cache=not no_cache)
+
+    with profiler.stage("exposure"):
+        exposure = load_exposure(trade, ports_risk, cache=not no_cache)
+
+    if getattr(args, "serve", False):
+        from port_risk.server import HOST, PORT, RiskIndex, run_server
+
+        with profiler.stage("index"):
+            index = RiskIndex(risk, exposure, ports_risk, cube)
+        if profiler.enabled:
+            # Written before serving, the server only stops when interrupted.
+            print(f"Profiling report written to {profiler.save()}")
+        run_server(index, args.host or HOST, args.port or PORT, args.socket)
+        return
+
     # for k, v in risk.items():
     #     print(k)
     #     print(v.keys())
 
-    world = load_world()
-    countries = load_countries()
+    with profiler.stage("plots"):
+        from port_risk.io.codes import decode
+        from port_risk.io.plots import plot_downtime_risks
+
+        world = load_world()
+        countries = load_countries()
+
+        plot_downtime_risks(
+            world,
+            countries,
+            [
+                (decode(risk_df), name, hazard)
+                for hazard, risk_dict in risk.items()
+                for name, risk_df in risk_dict.items()
+                if name in ("value", "quantity")
+            ],
+        )
+
+    from port_risk.models.store import ModelStore
 
-    for hazard, risk_dict in risk.items():
-        for name, risk_df in risk_dict.items():
-            if name in ("value", "quantity"):
-                plot_downtime_risk(world, countries, risk_df, name, hazard, save=True)
+    store = None if no_cache else ModelStore()
 
     # ===================
     # Statistical testing
     # ===================
 
-    tested_functions = {
-        "Gamma Distribution": stats.gamma,
-        "Exponential Distribution": stats.expon,
-        "Normal Distribution": stats.norm,
-        "Levy Distribution": stats.levy,
-        "Lognormal Distribution": stats.lognorm,
-        "Chi2 Distribtuion": stats.ncx2,
-        "Student-t Distribution": stats.t,
-    }
     if stats_flag:
-        data = risk["downtime_total"]["value"]["total_risk"]
-        statistics = compute_statistics(data, tested_functions, "var")
-        make_stats_table(statistics, "var")
+        with profiler.stage("statistics"):
+            import scipy.stats as stats
+            from port_risk.io.latex import make_stats_table
+            from port_risk.preprocessing.statistics import (
+                fit_distributions,
+                plot_qq_plots,
+            )
+
+            tested_functions = {
+                "Gamma Distribution": stats.gamma,
+                "Exponential Distribution": stats.expon,
+                "Normal Distribution": stats.norm,
+                "Levy Distribution": stats.levy,
+                "Lognormal Distribution": stats.lognorm,
+                "Chi2 Distribtuion": stats.ncx2,
+                "Student-t Distribution": stats.t,
+            }
+            data = risk["downtime_total"]["value"]["total_risk"]
+            fits = fit_distributions(data, tested_functions, store=store)
+            make_stats_table({name: test for name, (_, test) in fits.items()}, "var")
+        with profiler.stage("qq_plots"):
+            plot_qq_plots(data, tested_functions, fits, "var")
 
     # ================
     # Machine learning
     # ================
-    ml_data = pd.concat(
-        [risk["downtime_total"]["import"], risk["downtime_total"]["export"]], axis=0
-    )
-    # print(ml_data.columns)
-    ml_data = ml_preprocessing(ml_data, "trade")
-    y = ml_data["downtime_q_weighted"]
-    if stats_flag:
-        statistics = compute_statistics(y, tested_functions, "risk")
-        make_stats_table(statistics, "risk")
+    with profiler.stage("ml_preprocessing"):
+        from port_risk.preprocessing.machine_learning import (
+            build_design_matrix,
+            make_validation_data,
+        )
 
-    X_train, X_test, Y_train, Y_test = get_data_model_ready(
-        ml_data, "downtime_q_weighted"
-    )
+        design = build_design_matrix(
+            [risk["downtime_total"]["import"], risk["downtime_total"]["export"]],
+            "trade",
+            target="downtime_q_weighted",
+        )
+        y = design.y
+        X_train, X_test, Y_train, Y_test = design.split()
+    profiler.outputs(X=design.x, y=design.y)
+
+    if stats_flag:
+        with profiler.stage("statistics_ml"):
+            fits = fit_distributions(y, tested_functions, store=store)
+            make_stats_table({name: test for name, (_, test) in fits.items()}, "risk")
+        with profiler.stage("qq_plots_ml"):
+            plot_qq_plots(y, tested_functions, fits, "risk")
 
     params = None
     if validation_flag:
-        models_to_test = {
-            "extra_trees": ExtraTrees,
-            "random_forest": RandomForest,
-            "gradient_boost": GradientBoost,
-        }
-        x_train, y_train, x_val, y_val = make_validation_data(X_train, Y_train)
-        optimal_depths = optimal_depth_trees(
-            x_train, y_train, x_val, y_val, models_to_test
-        )
-        oob_errors = oob_erros_trees(x_train, y_train, x_val, y_val, models_to_test)
-        make_depth_plots(optimal_depths, save=True)
-        make_oob_error_plots(oob_errors, save=True)
-
-        params = find_optimal_params(optimal_depths, oob_errors)
+        with profiler.stage("validation"):
+            from port_risk.io.validation_plots import (
+                make_oob_error_plots,
+                make_depth_plots,
+            )
+            from port_risk.models.machine_learning import find_optimal_params
+            from port_risk.models.models import (
+                ExtraTrees,
+                RandomForest,
+                GradientBoost,
+                HistGradientBoost,
+                optimal_depth_trees,
+                oob_erros_trees,
+                staged_boosting_curves,
+            )
+
+            models_to_test = {
+                "extra_trees": ExtraTrees,
+                "random_forest": RandomForest,
+            }
+            x_train, x_val, y_train, y_val = make_validation_data(X_train, Y_train)
+            optimal_depths = optimal_depth_trees(
+                x_train, x_val, y_train, y_val, models_to_test, store=store
+            )
+            oob_errors = oob_erros_trees(
+                x_train, x_val, y_train, y_val, models_to_test, store=store
+            )
+            # Boosting has no out-of-bag samples: its depth and estimators are tuned together
+            # from the staged predictions on the validation data.
+            boosting_models = {
+                "gradient_boost": GradientBoost,
+                "hist_gradient_boost": HistGradientBoost,
+            }
+            for name, model in boosting_models.items():
+                optimal_depths[name], oob_errors[name] = staged_boosting_curves(
+                    x_train, x_val, y_train, y_val, model, name, store=store
+                )
+            make_depth_plots(optimal_depths, save=True)
+            make_oob_error_plots(oob_errors, save=True)
+
+            params = find_optimal_params(optimal_depths, oob_errors)
 
     if running_flag:
-
-        ran_models = run_all_models(
-            models, X_train, X_test, Y_train, Y_test, params=params
-        )
-        make_metrics_table(ran_models)
+        with profiler.stage("models"):
+            from port_risk.io.latex import make_metrics_table
+            from port_risk.models.machine_learning import run_all_models
+            from port_risk.models.models import models
+
+            ran_models = run_all_models(
+                models, X_train, X_test, Y_train, Y_test, params=params, store=store
+            )
+            make_metrics_table(ran_models)
         for name, model in ran_models.items():
             model.print_metrics()
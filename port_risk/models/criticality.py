@@ -0,0 +1,89 @@
+"""
+Models submodule ranking ports by criticality, i.e. by how much country risks increase when a port
+goes fully offline.
+
+Country risks are linear in the downtime of the ports, so taking port p offline increases the
+total_risk of country c by W[c, p] * (offline - downtime[p]), with W the total_risk weights of the
+exposure. Scaling the columns of W by the downtime gaps gives the impact of every port on every
+country in a single sparse operation.
+"""
+
+import numpy as np
+import pandas as pd
+
+from port_risk.models.exposure import Exposure
+
+DAYS_OFFLINE = 365.0
+
+
+def port_criticality(
+    exposure: Exposure,
+    ports_risk: pd.DataFrame,
+    quantity: bool = False,
+    hazard: str = "downtime_total",
+    offline: float = DAYS_OFFLINE,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Computes the increase in total_risk of every country when each port goes fully offline, and
+    ranks the ports by the increase summed over countries.
+
+    Parameters:
+        exposure: Exposure
+            The exposure weights of each country to each port.
+        ports_risk: pd.DataFrame
+            The port_risk data, providing the baseline downtime of each port.
+        quantity: bool default False
+            Boolean flag set to true when the analysis should be performed on quantity of trade
+            flows.
+        hazard: str default "downtime_total"
+            The baseline downtime column.
+        offline: float default 365.0
+            Downtime (days per year) of a port that is fully offline.
+
+    Return:
+        ranking: pd.DataFrame
+            One row per port sorted by decreasing impact, with the port name and country, the
+            global increase in total_risk, the number of affected countries and the most affected
+            country.
+        breakdown: pd.DataFrame
+            The increase in total_risk of each affected (port, country) pair.
+    """
+    weights = exposure.total_weights("q" if quantity else "v")
+    gap = offline - exposure.downtime(ports_risk, hazard)
+    impact = weights.multiply(gap[None, :]).tocsc()
+    impact.eliminate_zeros()
+
+    n_countries = np.diff(impact.indptr)
+    top = np.full(len(exposure.ports), -1)
+    has_impact = n_countries > 0
+    top[has_impact] = impact[:, has_impact].argmax(axis=0).A1
+
+    ports = ports_risk.drop_duplicates("id").set_index("id").reindex(exposure.ports)
+    ranking = pd.DataFrame(
+        {
+            "id": exposure.ports,
+            "port_name": ports["port_name"].to_numpy(),
+            "port_iso3": ports["iso3"].to_numpy(),
+            "downtime": offline - gap,
+            "impact": impact.sum(axis=0).A1,
+            "n_countries": n_countries,
+            "top_country": np.where(
+                has_impact, exposure.countries.to_numpy()[top], None
+            ),
+        }
+    )
+    ranking = ranking.sort_values("impact", ascending=False, ignore_index=True)
+    ranking.insert(0, "rank", np.arange(1, len(ranking) + 1))
+
+    impact = impact.tocoo()
+    breakdown = pd.DataFrame(
+        {
+            "id": exposure.ports.to_numpy()[impact.col],
+            "iso3": exposure.countries.to_numpy()[impact.row],
+            "impact": impact.data,
+        }
+    )
+    breakdown = breakdown.sort_values(
+        ["id", "impact"], ascending=[True, False], ignore_index=True
+    )
+    return ranking, breakdown
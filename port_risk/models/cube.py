@@ -0,0 +1,324 @@
+"""
+Models submodule holding the sector risks of every hazard as a dense numpy cube.
+
+The sector level risks of create_risk_dataframe are one DataFrame per hazard and metric. A
+RiskCube stores them in a single float array with the named axes country x sector x hazard x
+metric x field, where metric is value or quantity and field is a column of merge_risk. Labels are
+coded to integers once, so a lookup is an array index, and slices and roll-ups are numpy
+reductions along an axis.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from port_risk import data_path
+from port_risk.io.data import atomic_write
+from port_risk.models.store import hash_frames
+
+DIMS = ("country", "sector", "hazard", "metric", "field")
+METRICS = ("value", "quantity")
+# Columns of merge_risk, in order, after the country and sector keys.
+FIELDS = (
+    "domestic_import_risk",
+    "foreign_export_risk",
+    "domestic_export_risk",
+    "foreign_import_risk",
+    "imports",
+    "exports",
+    "n_ports_import",
+    "n_ports_export",
+    "total_import_risk",
+    "total_export_risk",
+    "total_risk",
+)
+IMPORT_RISKS = ("domestic_import_risk", "foreign_import_risk", "total_import_risk")
+EXPORT_RISKS = ("domestic_export_risk", "foreign_export_risk", "total_export_risk")
+
+
+class RiskCube:
+    """
+    Dense array of risks with named axes. Missing cells (e.g. a sector a country does not trade)
+    are NaN.
+    """
+
+    def __init__(self, values: np.ndarray, coords: dict[str, pd.Index]) -> None:
+        self.values = values
+        self.coords = {dim: pd.Index(labels) for dim, labels in coords.items()}
+        self.dims = tuple(self.coords)
+        self._codes = {
+            dim: {label: i for i, label in enumerate(labels)}
+            for dim, labels in self.coords.items()
+        }
+
+    @classmethod
+    def from_risk(cls, risk: dict, metrics: tuple = METRICS) -> "RiskCube":
+        """
+        Builds the cube of the sector risks returned by create_risk_dataframe.
+
+        Parameters:
+            risk: dict
+                Dictionnary mapping each hazard to its risk dataframes, with the {metric}_sector
+                dataframes of merge_risk(..., industries=True).
+            metrics: tuple default ("value", "quantity")
+                The metrics to include.
+
+        Return:
+            cube: RiskCube
+                The cube.
+        """
+        hazards = list(risk)
+        frames = {
+            (hazard, metric): risk[hazard][f"{metric}_sector"]
+            for hazard in hazards
+            for metric in metrics
+        }
+        countries, sectors = (
+            pd.Index(sorted(set().union(*(f[key].unique() for f in frames.values()))))
+            for key in ("iso3", "sector")
+        )
+
+        values = np.full(
+            (len(countries), len(sectors), len(hazards), len(metrics), len(FIELDS)),
+            np.nan,
+        )
+        for (hazard, metric), frame in frames.items():
+            fields = frame[list(FIELDS)]
+            rows = countries.get_indexer(frame["iso3"])
+            cols = sectors.get_indexer(frame["sector"])
+            values[rows, cols, hazards.index(hazard), metrics.index(metric)] = (
+                fields.to_numpy(dtype=float)
+            )
+        coords = {
+            "country": countries,
+            "sector": sectors,
+            "hazard": pd.Index(hazards),
+            "metric": pd.Index(metrics),
+            "field": pd.Index(FIELDS),
+        }
+        return cls(values, coords)
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def axis(self, dim: str) -> int:
+        """
+        Returns the axis of a dimension.
+        """
+        if dim not in self.dims:
+            raise KeyError(f"Unknown dimension {dim}, expected one of {self.dims}.")
+        return self.dims.index(dim)
+
+    def code(self, dim: str, label) -> int:
+        """
+        Returns the integer code of a label along a dimension.
+        """
+        codes = self._codes[self.dims[self.axis(dim)]]
+        if label not in codes:
+            raise KeyError(f"Unknown {dim} {label}.")
+        return codes[label]
+
+    def get(self, **labels) -> float:
+        """
+        Returns a single cell, e.g. cube.get(country="FRA", sector="Food", hazard="downtime_TC",
+        metric="value", field="total_risk").
+        """
+        if set(labels) != set(self.dims):
+            raise KeyError(f"Expected one label for each of {self.dims}.")
+        return float(
+            self.values[tuple(self.code(dim, labels[dim]) for dim in self.dims)]
+        )
+
+    def sel(self, **labels):
+        """
+        Selects labels along dimensions. A single label drops the dimension, a list of labels
+        keeps it. Returns a float when every dimension is dropped.
+        """
+        values, coords = self.values, dict(self.coords)
+        for dim, label in labels.items():
+            axis = list(coords).index(self.dims[self.axis(dim)])
+            if isinstance(label, (list, tuple, np.ndarray, pd.Index)):
+                codes = [self.code(dim, item) for item in label]
+                values = np.take(values, codes, axis=axis)
+                coords[dim] = pd.Index(label)
+            else:
+                values = np.take(values, self.code(dim, label), axis=axis)
+                del coords[dim]
+        if not coords:
+            return float(values)
+        return RiskCube(values, coords)
+
+    def sum(self, dim: str) -> "RiskCube":
+        """
+        Sums along a dimension, ignoring missing cells.
+        """
+        axis = self.axis(dim)
+        coords = {d: labels for d, labels in self.coords.items() if d != dim}
+        return RiskCube(np.nansum(self.values, axis=axis), coords)
+
+    def rollup(self, dim: str = "sector") -> "RiskCube":
+        """
+        Aggregates the fields along a dimension as merge_risk would on the aggregated trade: the
+        imports and exports are summed, the import (export) risks are averaged weighted by the
+        imports (exports) and the total risk is recomputed. Port counts cannot be rolled up from
+        distinct counts and are set to NaN. Rolling up the sectors gives the country risks of
+        merge_risk(..., industries=False).
+
+        Parameters:
+            dim: str default "sector"
+                The dimension to aggregate.
+
+        Return:
+            cube: RiskCube
+                The cube without dim.
+        """
+        field_axis = self.axis("field")
+        # Axis of dim in the arrays of a single field.
+        axis = self.axis(dim) - (field_axis < self.axis(dim))
+        field = self.coords["field"]
+
+        def take(name: str) -> np.ndarray:
+            return np.take(self.values, field.get_loc(name), axis=field_axis)
+
+        imports = np.nan_to_num(take("imports"))
+        exports = np.nan_to_num(take("exports"))
+        rolled = {
+            "imports": imports.sum(axis=axis),
+            "exports": exports.sum(axis=axis),
+        }
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for names, weights, total in (
+                (IMPORT_RISKS, imports, rolled["imports"]),
+                (EXPORT_RISKS, exports, rolled["exports"]),
+            ):
+                for name in names:
+                    rolled[name] = (np.nan_to_num(take(name)) * weights).sum(
+                        axis=axis
+                    ) / total
+            flows = rolled["imports"] + rolled["exports"]
+            rolled["total_risk"] = (
+                rolled["total_import_risk"] * rolled["imports"]
+                + rolled["total_export_risk"] * rolled["exports"]
+            ) / flows
+        nan = np.full_like(rolled["imports"], np.nan)
+        field_axis -= field_axis > self.axis(dim)
+        values = np.stack([rolled.get(name, nan) for name in field], axis=field_axis)
+        coords = {d: labels for d, labels in self.coords.items() if d != dim}
+        return RiskCube(values, coords)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Converts the cube to a DataFrame with one column per field (or a single value column
+        without a field dimension) and one row per label of the other dimensions, dropping the
+        rows without data.
+        """
+        dims = [dim for dim in self.dims if dim != "field"]
+        values = self.values
+        if "field" in self.dims:
+            values = np.moveaxis(values, self.axis("field"), -1)
+            columns = self.coords["field"]
+        else:
+            values = values[..., np.newaxis]
+            columns = ["value"]
+        values = values.reshape(-1, len(columns))
+        if len(dims) == 1:
+            index = self.coords[dims[0]].rename(dims[0])
+        else:
+            index = pd.MultiIndex.from_product(
+                [self.coords[dim] for dim in dims], names=dims
+            )
+        frame = pd.DataFrame(values, index=index, columns=columns)
+        return frame.loc[~np.isnan(values).all(axis=1)]
+
+    def save(self, path: Path = None) -> None:
+        """
+        Saves the cube to a single npz file.
+
+        Parameters:
+            path: Path default None
+                File to save to, defaults to risk_cube.npz in the cache folder.
+
+        Return:
+            None
+        """
+        path = Path(path or Path(data_path["cache"], "risk_cube.npz"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {"values": self.values, "dims": np.array(self.dims)}
+        for dim, labels in self.coords.items():
+            arrays[f"coord_{dim}"] = labels.to_numpy(dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path = None) -> "RiskCube":
+        """
+        Loads a cube saved with save.
+
+        Parameters:
+            path: Path default None
+                File to load, defaults to risk_cube.npz in the cache folder.
+
+        Return:
+            cube: RiskCube
+                The loaded cube.
+        """
+        path = Path(path or Path(data_path["cache"], "risk_cube.npz"))
+        with np.load(path) as arrays:
+            coords = {
+                str(dim): pd.Index(arrays[f"coord_{dim}"]) for dim in arrays["dims"]
+            }
+            return cls(arrays["values"], coords)
+
+
+def load_risk_cube(
+    risk: dict, metrics: tuple = METRICS, cache: bool = True
+) -> RiskCube:
+    """
+    Builds the cube of the sector risks, or loads it from the cache folder when it was saved for
+    the same risks. The cache file is keyed on a hash of the hazards, metrics and the sector
+    columns from_risk reads.
+
+    Parameters:
+        risk: dict
+            Dictionnary mapping each hazard to its risk dataframes, as returned by
+            create_risk_dataframe.
+        metrics: tuple default ("value", "quantity")
+            The metrics to include.
+        cache: bool default True
+            Boolean flag set to False to always build the cube and skip the cache.
+
+    Return:
+        cube: RiskCube
+            The cube.
+    """
+    if not cache:
+        return RiskCube.from_risk(risk, metrics)
+
+    columns = ["iso3", "sector", *FIELDS]
+    digest = hashlib.blake2b(
+        json.dumps([list(risk), list(metrics)]).encode(), digest_size=16
+    )
+    hash_frames(
+        *(
+            risk[hazard][f"{metric}_sector"][columns]
+            for hazard in risk
+            for metric in metrics
+        ),
+        digest=digest,
+    )
+    path = Path(data_path["cache"], f"risk_cube_{digest.hexdigest()}.npz")
+    if path.exists():
+        try:
+            return RiskCube.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read the risk cube cache ({e}), rebuilding it.")
+
+    cube = RiskCube.from_risk(risk, metrics)
+    try:
+        atomic_write(path, cube.save, "risk_cube_*.npz")
+    except OSError as e:
+        print(f"Could not write the risk cube cache ({e}).")
+    return cube
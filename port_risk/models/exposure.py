@@ -0,0 +1,365 @@
+"""
+Models submodule holding the country x port exposure weights as sparse matrices.
+
+Every risk computed by compute_trade_risk and merge_risk is a weighted sum of port downtimes, with
+weights q_sea_flow / q_sea_flow_total (or v_sea_flow / v_sea_flow_total) for each (country, port)
+pair. Building these weights once turns the country risk of any downtime vector into sparse
+matrix-vector products.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from port_risk import data_path
+from port_risk.io.data import atomic_write
+from port_risk.models.store import hash_frames
+
+DIRECTIONS = ("import", "export")
+METRICS = ("q", "v")
+SPLITS = ("domestic", "foreign")
+
+
+class Exposure:
+    """
+    Sparse exposure weights of each country to each port, one (countries x ports) matrix per
+    direction (import/export), metric (q for quantity, v for value) and domestic/foreign split,
+    together with the trade totals and port counts of each country.
+    """
+
+    def __init__(
+        self,
+        countries: pd.Index,
+        ports: pd.Index,
+        weights: dict[tuple[str, str, str], sparse.csr_matrix],
+        totals: dict[tuple[str, str], np.ndarray],
+        n_ports: dict[str, np.ndarray],
+    ) -> None:
+        self.countries = countries
+        self.ports = ports
+        self.weights = weights
+        self.totals = totals
+        self.n_ports = n_ports
+
+    def combined(self, direction: str, metric: str) -> sparse.csr_matrix:
+        """
+        Returns the domestic + foreign weights of a direction and metric.
+
+        Parameters:
+            direction: str
+                Possible values are: {"import", "export"}.
+            metric: str
+                Possible values are: {"q", "v"}.
+
+        Return:
+            weights: sparse.csr_matrix
+                The (countries x ports) weights.
+        """
+        return (
+            self.weights[(direction, metric, "domestic")]
+            + self.weights[(direction, metric, "foreign")]
+        )
+
+    def total_weights(self, metric: str) -> sparse.csr_matrix:
+        """
+        Returns the weights of the compounded total_risk, i.e. the import and export weights
+        averaged by the share of imports and exports of each country.
+
+        Parameters:
+            metric: str
+                Possible values are: {"q", "v"}.
+
+        Return:
+            weights: sparse.csr_matrix
+                The (countries x ports) weights such that total_risk = weights @ downtime.
+        """
+        imports = self.totals[("import", metric)]
+        exports = self.totals[("export", metric)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            import_share = imports / (imports + exports)
+            export_share = exports / (imports + exports)
+        return (
+            sparse.diags(import_share) @ self.combined("import", metric)
+            + sparse.diags(export_share) @ self.combined("export", metric)
+        ).tocsr()
+
+    def downtime(self, ports_risk: pd.DataFrame, hazard: str) -> np.ndarray:
+        """
+        Aligns the downtime of a hazard to the port axis of the exposure.
+
+        Parameters:
+            ports_risk: pd.DataFrame
+                The port_risk data.
+            hazard: str
+                The hazard column to use.
+
+        Return:
+            downtime: np.ndarray
+                The downtime of each port of the exposure.
+        """
+        return (
+            ports_risk.set_index("id")[hazard]
+            .reindex(self.ports)
+            .fillna(0.0)
+            .to_numpy()
+        )
+
+    def evaluate(self, downtime: np.ndarray, quantity: bool = False) -> dict:
+        """
+        Computes the domestic/foreign import/export risks and the compounded total risk of each
+        country for one or several downtime vectors.
+
+        Parameters:
+            downtime: np.ndarray
+                Downtime of each port, of shape (ports,) or (ports, n) to evaluate n downtime
+                vectors at once.
+            quantity: bool default False
+                Boolean flag set to true when the analysis should be performed on quantity of trade
+                flows.
+
+        Return:
+            risks: dict
+                Mapping of each risk column of merge_risk to an array of shape (countries,) or
+                (countries, n).
+        """
+        metric = "q" if quantity else "v"
+        risks = {}
+        for direction in DIRECTIONS:
+            for split in SPLITS:
+                risks[f"{split}_{direction}_risk"] = (
+                    self.weights[(direction, metric, split)] @ downtime
+                )
+            risks[f"total_{direction}_risk"] = (
+                risks[f"domestic_{direction}_risk"] + risks[f"foreign_{direction}_risk"]
+            )
+
+        imports = self.totals[("import", metric)]
+        exports = self.totals[("export", metric)]
+        if np.ndim(downtime) == 2:
+            imports, exports = imports[:, None], exports[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risks["total_risk"] = (
+                risks["total_import_risk"] * imports
+                + risks["total_export_risk"] * exports
+            ) / (imports + exports)
+        return risks
+
+    def country_risk(
+        self, downtime: np.ndarray, quantity: bool = False
+    ) -> pd.DataFrame:
+        """
+        Computes the global risk dataframe of a downtime vector, with the columns of merge_risk.
+
+        Parameters:
+            downtime: np.ndarray
+                Downtime of each port, of shape (ports,).
+            quantity: bool default False
+                Boolean flag set to true when the analysis should be performed on quantity of trade
+                flows.
+
+        Return:
+            global_risk: pd.DataFrame
+                A DataFrame object containing the compounded annual domestic, foreign and global
+                import/export risk for each country.
+        """
+        return self.risk_frame(self.evaluate(downtime, quantity), quantity)
+
+    def risk_frame(self, risks: dict, quantity: bool = False) -> pd.DataFrame:
+        """
+        Arranges risks returned by evaluate into the global risk dataframe, with the columns of
+        merge_risk.
+
+        Parameters:
+            risks: dict
+                Mapping of each risk column to an array of shape (countries,).
+            quantity: bool default False
+                Boolean flag set to true when the analysis should be performed on quantity of trade
+                flows.
+
+        Return:
+            global_risk: pd.DataFrame
+                A DataFrame object containing the compounded annual domestic, foreign and global
+                import/export risk for each country.
+        """
+        metric = "q" if quantity else "v"
+        global_risk = pd.DataFrame({"iso3": self.countries})
+        # In the column order of merge_risk.
+        for column in (
+            "domestic_import_risk",
+            "foreign_export_risk",
+            "domestic_export_risk",
+            "foreign_import_risk",
+        ):
+            global_risk[column] = risks[column]
+        global_risk["imports"] = self.totals[("import", metric)]
+        global_risk["exports"] = self.totals[("export", metric)]
+        global_risk["n_ports_import"] = self.n_ports["import"]
+        global_risk["n_ports_export"] = self.n_ports["export"]
+        for column in ("total_import_risk", "total_export_risk", "total_risk"):
+            global_risk[column] = risks[column]
+        return global_risk
+
+    def save(self, path: Path = None) -> None:
+        """
+        Saves the exposure to a single npz file.
+
+        Parameters:
+            path: Path default None
+                File to save to, defaults to exposure.npz in the cache folder.
+
+        Return:
+            None
+        """
+        path = Path(path or Path(data_path["cache"], "exposure.npz"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "countries": self.countries.to_numpy(dtype=str),
+            "ports": self.ports.to_numpy(dtype=str),
+        }
+        for (direction, metric, split), matrix in self.weights.items():
+            name = f"weights_{direction}_{metric}_{split}"
+            arrays[f"{name}_data"] = matrix.data
+            arrays[f"{name}_indices"] = matrix.indices
+            arrays[f"{name}_indptr"] = matrix.indptr
+        for (direction, metric), total in self.totals.items():
+            arrays[f"totals_{direction}_{metric}"] = total
+        for direction, count in self.n_ports.items():
+            arrays[f"n_ports_{direction}"] = count
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path = None) -> "Exposure":
+        """
+        Loads an exposure saved with save.
+
+        Parameters:
+            path: Path default None
+                File to load, defaults to exposure.npz in the cache folder.
+
+        Return:
+            exposure: Exposure
+                The loaded exposure.
+        """
+        path = Path(path or Path(data_path["cache"], "exposure.npz"))
+        with np.load(path) as arrays:
+            countries = pd.Index(arrays["countries"], name="iso3")
+            ports = pd.Index(arrays["ports"], name="id")
+            shape = (len(countries), len(ports))
+            weights, totals, n_ports = {}, {}, {}
+            for direction in DIRECTIONS:
+                n_ports[direction] = arrays[f"n_ports_{direction}"]
+                for metric in METRICS:
+                    totals[(direction, metric)] = arrays[f"totals_{direction}_{metric}"]
+                    for split in SPLITS:
+                        name = f"weights_{direction}_{metric}_{split}"
+                        weights[(direction, metric, split)] = sparse.csr_matrix(
+                            (
+                                arrays[f"{name}_data"],
+                                arrays[f"{name}_indices"],
+                                arrays[f"{name}_indptr"],
+                            ),
+                            shape=shape,
+                        )
+        return cls(countries, ports, weights, totals, n_ports)
+
+
+def build_exposure(
+    trade: dict[str, pd.DataFrame], ports_risk: pd.DataFrame
+) -> Exposure:
+    """
+    Builds the sparse exposure weights from the trade dataframes. Only the ports with downtime
+    data are kept, as compute_trade_risk does when merging the trade with the port risks.
+
+    Parameters:
+        trade: dict[str, pd.DataFrame]
+            Dictionnary mapping trade type to the associated trade dataframe, as returned by
+            create_trade_dataframe.
+        ports_risk: pd.DataFrame
+            The port_risk data.
+
+    Return:
+        exposure: Exposure
+            The exposure weights of each country to each port.
+    """
+    ports = pd.Index(ports_risk["id"].drop_duplicates(), name="id")
+    frames = {}
+    for direction in DIRECTIONS:
+        frame = trade[f"{direction}_trade"]
+        frames[direction] = frame.loc[frame["id"].isin(ports)]
+    countries = pd.Index(
+        np.union1d(*[frame["iso3"].astype(str).unique() for frame in frames.values()]),
+        name="iso3",
+    )
+    shape = (len(countries), len(ports))
+
+    weights, totals, n_ports = {}, {}, {}
+    for direction, frame in frames.items():
+        rows = countries.get_indexer(frame["iso3"].astype(str))
+        cols = ports.get_indexer(frame["id"])
+        domestic = (frame["iso3"] == frame["port_iso3"]).to_numpy()
+
+        pairs = np.unique(rows.astype(np.int64) * len(ports) + cols)
+        n_ports[direction] = np.bincount(pairs // len(ports), minlength=len(countries))
+
+        for metric in METRICS:
+            share = (
+                frame[f"{metric}_sea_flow"] / frame[f"{metric}_sea_flow_total"]
+            ).to_numpy()
+            total = np.zeros(len(countries))
+            total[rows] = frame[f"{metric}_sea_flow_total"].to_numpy()
+            totals[(direction, metric)] = total
+
+            for split, mask in (("domestic", domestic), ("foreign", ~domestic)):
+                weights[(direction, metric, split)] = sparse.csr_matrix(
+                    (share[mask], (rows[mask], cols[mask])), shape=shape
+                )
+
+    return Exposure(countries, ports, weights, totals, n_ports)
+
+
+def load_exposure(
+    trade: dict[str, pd.DataFrame], ports_risk: pd.DataFrame, cache: bool = True
+) -> Exposure:
+    """
+    Builds the exposure weights of the trade dataframes, or loads them from the cache folder when
+    they were saved for the same trade flows and ports. The cache file is keyed on a hash of the
+    columns build_exposure reads.
+
+    Parameters:
+        trade: dict[str, pd.DataFrame]
+            Dictionnary mapping trade type to the associated trade dataframe, as returned by
+            create_trade_dataframe.
+        ports_risk: pd.DataFrame
+            The port_risk data.
+        cache: bool default True
+            Boolean flag set to False to always build the exposure and skip the cache.
+
+    Return:
+        exposure: Exposure
+            The exposure weights of each country to each port.
+    """
+    if not cache:
+        return build_exposure(trade, ports_risk)
+
+    columns = ["iso3", "id", "port_iso3"] + [
+        f"{metric}_sea_flow{total}" for metric in METRICS for total in ("", "_total")
+    ]
+    digest = hash_frames(
+        *(trade[f"{direction}_trade"][columns] for direction in DIRECTIONS),
+        ports_risk["id"],
+    )
+    path = Path(data_path["cache"], f"exposure_{digest.hexdigest()}.npz")
+    if path.exists():
+        try:
+            return Exposure.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read the exposure cache ({e}), rebuilding it.")
+
+    exposure = build_exposure(trade, ports_risk)
+    try:
+        atomic_write(path, exposure.save, "exposure_*.npz")
+    except OSError as e:
+        print(f"Could not write the exposure cache ({e}).")
+    return exposure
@@ -4,6 +4,8 @@ Machine learning models.
 
 import numpy as np
 
+from port_risk.models.store import ModelStore
+
 
 def find_optimal_params(optimal_depths: dict, oob_errors: dict) -> dict:
     """
@@ -22,19 +24,72 @@ def find_optimal_params(optimal_depths: dict, oob_errors: dict) -> dict:
 
     """
     params = {}
-    for (name, opt_depths), (
-        _,
-        (
-            (_, _),
-            (optimal_estimator, _),
-        ),
-    ) in zip(optimal_depths.items(), oob_errors.items()):
-        params[name] = {}
+    for name, opt_depths in optimal_depths.items():
+        if name not in oob_errors:
+            continue
+        (_, _), (optimal_estimator, _) = oob_errors[name]
         optimal_depth = opt_depths["mse"][0][0]
         params[name] = (optimal_depth, optimal_estimator)
     return params
 
 
+def run_model(
+    model,
+    name: str,
+    x_train: np.array,
+    x_test: np.array,
+    y_train: np.array,
+    y_test: np.array,
+    store: ModelStore = None,
+    **params,
+):
+    """
+    Instantiates and runs a model, reading the fitted estimator, predictions and metrics from the
+    store when the same model was already run on the same data.
+
+    Parameters:
+        model: Model
+            The model class.
+        name: str
+            The model name.
+        x_train: np.array
+            Training feature data.
+        x_test: np.array
+            Testing feature data.
+        y_train: np.array
+            Training prediction data
+        y_test: np.array
+            Testing prediciton data
+        store: ModelStore default None
+            The model store, None to always fit.
+        params:
+            Parameters to pass to the model.
+
+    Return:
+        model: Model
+            The model object that has been ran.
+    """
+    print(f"Running {name}")
+    _model = model(x_train, y_train, x_test, y_test, name, **params)
+    if store is None:
+        _model.run_model()
+        return _model
+
+    def fit() -> tuple:
+        _model.run_model()
+        return _model.model, _model.y_pred, _model.metrics
+
+    # Keyed on the parameters of the built estimator, which include the defaults of the wrapper.
+    key = store.key(
+        "run_model",
+        (x_train, y_train, x_test, y_test),
+        {name: model},
+        _model.model.get_params(deep=True),
+    )
+    _model.model, _model.y_pred, _model.metrics = store.fetch(key, fit)
+    return _model
+
+
 def run_all_models(
     models: dict,
     x_train: np.array,
@@ -42,6 +97,7 @@ def run_all_models(
     y_train: np.array,
     y_test: np.array,
     params=None,
+    store: ModelStore = None,
 ) -> dict:
     """
     Runs all the models in the input model dictionnary.
@@ -61,6 +117,8 @@ def run_all_models(
             Dictionnary of model name and model class to use.
         params: bool default None
             Parameters to pass to the model.
+        store: ModelStore default None
+            The model store, None to always fit.
 
     Return:
         ran_models: dict
@@ -69,30 +127,11 @@ def run_all_models(
 
     ran_models = {}
     for name, model in models.items():
-        if params is not None:
-            try:
-                p = params[name]
-                print(params)
-                print(f"Running {name}")
-                _model = model(
-                    x_train,
-                    y_train,
-                    x_test,
-                    y_test,
-                    name,
-                    depth=p[0],
-                    n_estimators=p[1],
-                )
-                _model.run_model()
-                ran_models[name] = _model
-            except KeyError:
-                print(f"Running {name}")
-                _model = model(x_train, y_train, x_test, y_test, name)
-                _model.run_model()
-                ran_models[name] = _model
-        else:
-            print(f"Running {name}")
-            _model = model(x_train, y_train, x_test, y_test, name)
-            _model.run_model()
-            ran_models[name] = _model
+        model_params = {}
+        if params is not None and name in params:
+            print(params)
+            model_params = {"depth": params[name][0], "n_estimators": params[name][1]}
+        ran_models[name] = run_model(
+            model, name, x_train, x_test, y_train, y_test, store, **model_params
+        )
     return ran_models
@@ -5,6 +5,7 @@ Module for models.
 from sklearn.ensemble import (
     ExtraTreesRegressor,
     GradientBoostingRegressor,
+    HistGradientBoostingRegressor,
     RandomForestRegressor,
 )
 from sklearn.linear_model import LinearRegression
@@ -16,8 +17,14 @@ from sklearn.metrics import (
     r2_score,
 )
 from sklearn.tree import DecisionTreeRegressor
+import inspect
+import os
+import tempfile
+import joblib
 import numpy as np
 
+from port_risk.models.store import ModelStore
+
 
 class Model:
     def __init__(self, x_train, y_train, x_test, y_test, name) -> None:
@@ -85,6 +92,7 @@ class ExtraTrees(Model):
         oob_score=False,
         n_estimators=68,
         bootstrap=False,
+        n_jobs=None,
     ) -> None:
         super().__init__(x_train, y_train, x_test, y_test, name)
         self.depth = depth
@@ -93,6 +101,7 @@ class ExtraTrees(Model):
             oob_score=oob_score,
             n_estimators=n_estimators,
             bootstrap=bootstrap,
+            n_jobs=n_jobs,
         )
 
 
@@ -108,6 +117,7 @@ class RandomForest(Model):
         oob_score=False,
         n_estimators=80,
         bootstrap=False,
+        n_jobs=None,
     ) -> None:
         super().__init__(x_train, y_train, x_test, y_test, name)
         self.depth = depth
@@ -116,6 +126,7 @@ class RandomForest(Model):
             oob_score=oob_score,
             n_estimators=n_estimators,
             bootstrap=bootstrap,
+            n_jobs=n_jobs,
         )
 
 
@@ -129,10 +140,36 @@ class GradientBoost(Model):
         name,
         depth=18,
         n_estimators=50,
+        random_state=42,
     ) -> None:
         super().__init__(x_train, y_train, x_test, y_test, name)
+        # Fixed seed: the splitter permutes the features at random and breaks ties by that order,
+        # so the staged curves are only those of a refit with the same seed.
         self.model = GradientBoostingRegressor(
-            max_depth=depth, n_estimators=n_estimators
+            max_depth=depth, n_estimators=n_estimators, random_state=random_state
+        )
+
+
+class HistGradientBoost(Model):
+    def __init__(
+        self,
+        x_train,
+        y_train,
+        x_test,
+        y_test,
+        name,
+        depth=None,
+        n_estimators=500,
+        early_stopping=True,
+        random_state=42,
+    ) -> None:
+        super().__init__(x_train, y_train, x_test, y_test, name)
+        # Fixed seed: early stopping draws its validation split from it.
+        self.model = HistGradientBoostingRegressor(
+            max_depth=depth,
+            max_iter=n_estimators,
+            early_stopping=early_stopping,
+            random_state=random_state,
         )
 
 
@@ -142,13 +179,95 @@ models.update(
         "decison_tree": SimpleDecisionTree,
         "extra_trees": ExtraTrees,
         "random_forest": RandomForest,
-        "gradient_boos": GradientBoost,
+        "gradient_boost": GradientBoost,
+        "hist_gradient_boost": HistGradientBoost,
     }
 )
 
 # ----------------------------------------------------------------
 
 
+def core_budget(n_jobs: int, n_tasks: int) -> tuple:
+    """
+    Splits a budget of cores between parallel tasks and the estimators they fit, so that the
+    number of busy cores never exceeds the budget.
+
+    Parameters:
+        n_jobs: int
+            Total number of cores to use, None or -1 for all the cores.
+        n_tasks: int
+            Number of tasks to run.
+
+    Return:
+        outer, inner: tuple
+            Number of tasks run in parallel and n_jobs of each estimator.
+    """
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count()
+    outer = max(1, min(n_jobs, n_tasks))
+    inner = max(1, n_jobs // outer)
+    return outer, inner
+
+
+def share_arrays(folder: str, **arrays) -> dict:
+    """
+    Dumps arrays to folder and loads them back as read-only memory maps, so that parallel workers
+    read the same pages instead of each receiving a pickled copy.
+
+    Parameters:
+        folder: str
+            Folder where to write the arrays.
+        arrays:
+            Mapping of name to array.
+
+    Return:
+        shared: dict
+            Mapping of name to memory mapped array.
+    """
+    shared = {}
+    for name, array in arrays.items():
+        path = os.path.join(folder, f"{name}.joblib")
+        joblib.dump(np.ascontiguousarray(array), path)
+        shared[name] = joblib.load(path, mmap_mode="r")
+    return shared
+
+
+def run_depth(model, name: str, depth: int, arrays: dict, n_jobs: int = None) -> dict:
+    """
+    Fits a model of the given depth and returns its test metrics.
+
+    Parameters:
+        model: Model
+            The model class.
+        name: str
+            The model name.
+        depth: int
+            The maximum depth of the trees.
+        arrays: dict
+            The x_train, y_train, x_test and y_test arrays.
+        n_jobs: int default None
+            Number of cores of the estimator, when the model accepts it.
+
+    Return:
+        metrics: dict
+            The metrics of the fitted model.
+    """
+    kwargs = {}
+    if "n_jobs" in inspect.signature(model).parameters:
+        kwargs["n_jobs"] = n_jobs
+    tree_model = model(
+        arrays["x_train"],
+        arrays["y_train"],
+        arrays["x_test"],
+        arrays["y_test"],
+        name,
+        depth,
+        **kwargs,
+    )
+    tree_model.run_model()
+    return tree_model.metrics
+
+
 def optimal_depth_trees(
     x_train: np.array,
     x_test: np.array,
@@ -156,9 +275,12 @@ def optimal_depth_trees(
     y_test: np.array,
     models_to_test: dict,
     max_depth_tested: int = 26,
+    n_jobs: int = None,
+    store: ModelStore = None,
 ) -> dict:
     """
-    Find the optimal depth for tree models.
+    Find the optimal depth for tree models. The (model, depth) fits are spread over a pool of
+    processes sharing memory mapped copies of the arrays.
 
     Parameters:
         x_train: np.array
@@ -171,25 +293,61 @@ def optimal_depth_trees(
             Testing prediciton data
         max_depth_tested: int default 26
             Limit on the max depth that will be tested.
+        n_jobs: int default None
+            Total number of cores used by the pool and the estimators, defaults to all the cores.
+        store: ModelStore default None
+            The model store, None to always fit.
 
     Return:
         optimal_depths: dict
             Dictionnary mapping each model to the optimal parameters.
     """
+    if store is not None:
+        key = store.key(
+            "optimal_depth_trees",
+            (x_train, y_train, x_test, y_test),
+            models_to_test,
+            {"max_depth_tested": max_depth_tested},
+        )
+        return store.fetch(
+            key,
+            lambda: optimal_depth_trees(
+                x_train,
+                x_test,
+                y_train,
+                y_test,
+                models_to_test,
+                max_depth_tested,
+                n_jobs,
+            ),
+        )
+
     optimal_depths = {}
-    depth_models = models_to_test.copy()
-
-    for name, model in depth_models.items():
-        print(f"Computing metrics for {name}")
-        metrics = {}
-        for depth in range(1, max_depth_tested):
-            print(f"Depth = {depth}", end=" ")
-            tree_model = model(x_train, y_train, x_test, y_test, name, depth)
-            tree_model.run_model()
-            metrics[depth] = tree_model.metrics
-            optimal_depths[name] = {}
-        print(f"Finished computing metrics for {name}")
-        print("=====================================")
+    depths = range(1, max_depth_tested)
+    tasks = [
+        (name, model, depth)
+        for name, model in models_to_test.items()
+        for depth in depths
+    ]
+    outer, inner = core_budget(n_jobs, len(tasks))
+    print(f"Computing metrics for {len(tasks)} models on {outer} process(es)")
+
+    with tempfile.TemporaryDirectory(prefix="port_risk_") as folder:
+        arrays = share_arrays(
+            folder, x_train=x_train, y_train=y_train, x_test=x_test, y_test=y_test
+        )
+        results = joblib.Parallel(n_jobs=outer)(
+            joblib.delayed(run_depth)(model, name, depth, arrays, inner)
+            for name, model, depth in tasks
+        )
+        del arrays
+
+    all_metrics = {}
+    for (name, _, depth), metrics in zip(tasks, results):
+        all_metrics.setdefault(name, {})[depth] = metrics
+
+    for name, metrics in all_metrics.items():
+        optimal_depths[name] = {}
         metrics_scores = {}
 
         for key, sub_dict in metrics.items():
@@ -222,6 +380,46 @@ def optimal_depth_trees(
     return optimal_depths
 
 
+def forest_oob_errors(forest, x_train: np.array, y_train: np.array, sizes) -> list:
+    """
+    Computes the out-of-bag error of the first n trees of a fitted bootstrapped forest for every
+    n in sizes, accumulating the out-of-bag predictions tree by tree. The first n trees of a forest
+    are a forest of n trees, so this matches refitting a forest of each size.
+
+    Parameters:
+        forest: RandomForestRegressor | ExtraTreesRegressor
+            A forest fitted with bootstrap=True.
+        x_train: np.array
+            Training feature data the forest was fitted on.
+        y_train: np.array
+            Training prediction data the forest was fitted on.
+        sizes: range
+            Numbers of trees at which to compute the error.
+
+    Return:
+        errors: list
+            The out-of-bag error, 1 - R2 as for oob_score_, at each size.
+    """
+    x = np.asarray(x_train, dtype=np.float32)
+    y = np.asarray(y_train, dtype=np.float64)
+    n_samples = len(y)
+    oob_sum = np.zeros(n_samples)
+    oob_count = np.zeros(n_samples, dtype=np.int64)
+    sizes = set(sizes)
+    errors = []
+    for n_trees, (tree, sample) in enumerate(
+        zip(forest.estimators_, forest.estimators_samples_), start=1
+    ):
+        unsampled = np.bincount(sample, minlength=n_samples) == 0
+        oob_sum[unsampled] += tree.predict(x[unsampled], check_input=False)
+        oob_count[unsampled] += 1
+        if n_trees in sizes:
+            # Samples without out-of-bag prediction count as 0, as in scikit-learn.
+            prediction = oob_sum / np.maximum(oob_count, 1)
+            errors.append(1 - r2_score(y, prediction))
+    return errors
+
+
 def oob_erros_trees(
     x_train: np.array,
     x_test: np.array,
@@ -229,9 +427,11 @@ def oob_erros_trees(
     y_test: np.array,
     models_to_test: dict,
     max_estimators: int = 101,
+    store: ModelStore = None,
 ):
     """
-    Compute out-of-bag error.
+    Compute out-of-bag error. A single bootstrapped forest of max_estimators - 1 trees is fitted
+    per model and the error of every smaller ensemble is read from its first trees.
 
     Parameters:
         x_train: np.array
@@ -242,43 +442,156 @@ def oob_erros_trees(
             Training prediction data
         y_test: np.array
             Testing prediciton data
-        max_estimators: int default 100
+        max_estimators: int default 101
             Limit on the max estimators that will be tested.
+        store: ModelStore default None
+            The model store, None to always fit.
 
     Return:
         optimal_depths: dict
             Dictionnary mapping each model to the computed errors and optimal parameters.
     """
+    if store is not None:
+        key = store.key(
+            "oob_erros_trees",
+            (x_train, y_train, x_test, y_test),
+            models_to_test,
+            {"max_estimators": max_estimators},
+        )
+        return store.fetch(
+            key,
+            lambda: oob_erros_trees(
+                x_train, x_test, y_train, y_test, models_to_test, max_estimators
+            ),
+        )
+
     oob_errors = {}
+    sizes = range(18, max_estimators)
     for name, model in models_to_test.items():
         if name == "gradient_boost":
             continue
-        oob_errors[name] = ()
-        errors = []
         print(f"Computing oob error for {name}")
-        for n_estimators in range(18, max_estimators):
-            print(f"Estimators = {n_estimators}", end="")
-            tree_model = model(
-                x_train,
-                y_train,
-                x_test,
-                y_test,
-                name,
-                oob_score=True,
-                n_estimators=n_estimators,
-                bootstrap=True,
-            )
-            tree_model.fit()
-            oob_error = 1 - tree_model.model.oob_score_
-            errors.append(oob_error)
+        tree_model = model(
+            x_train,
+            y_train,
+            x_test,
+            y_test,
+            name,
+            n_estimators=sizes[-1],
+            bootstrap=True,
+        )
+        tree_model.fit()
+        errors = forest_oob_errors(tree_model.model, x_train, y_train, sizes)
         optimal_estimator = np.argmin(np.array(errors))
-        print(optimal_estimator)
-        print(len(errors))
         optimal_value = errors[optimal_estimator]
-        print(optimal_value)
-        oob_errors[name] = (range(18, max_estimators), errors), (
-            optimal_estimator + 18,
+        print(f"Optimal estimator: {sizes[optimal_estimator]} ({optimal_value})")
+        oob_errors[name] = (sizes, errors), (
+            sizes[optimal_estimator],
             optimal_value,
         )
         print("Computed all oob errors sucessfully!")
     return oob_errors
+
+
+def staged_boosting_curves(
+    x_train: np.array,
+    x_test: np.array,
+    y_train: np.array,
+    y_test: np.array,
+    model,
+    name: str,
+    max_depth_tested: int = 26,
+    max_estimators: int = 101,
+    store: ModelStore = None,
+) -> tuple:
+    """
+    Tunes the depth and number of estimators of a boosting model with one fit per depth. The
+    staged predictions of each fit give the test error of every number of estimators, so each
+    depth is scored at its best number of estimators and the error curve over estimators of the
+    optimal depth is read from the same fit.
+
+    Parameters:
+        x_train: np.array
+            Training feature data.
+        x_test: np.array
+            Testing feature data.
+        y_train: np.array
+            Training prediction data
+        y_test: np.array
+            Testing prediciton data
+        model: Model
+            The boosting model class, its estimator must implement staged_predict.
+        name: str
+            The model name.
+        max_depth_tested: int default 26
+            Limit on the max depth that will be tested.
+        max_estimators: int default 101
+            Limit on the max estimators that will be tested.
+        store: ModelStore default None
+            The model store, None to always fit.
+
+    Return:
+        optimal_depths, oob_errors: tuple
+            The entries of the model in the optimal_depth_trees and oob_erros_trees dictionnaries,
+            with 1 - R2 on the test data in place of the out-of-bag error.
+    """
+    if store is not None:
+        key = store.key(
+            "staged_boosting_curves",
+            (x_train, y_train, x_test, y_test),
+            {name: model},
+            {"max_depth_tested": max_depth_tested, "max_estimators": max_estimators},
+        )
+        return store.fetch(
+            key,
+            lambda: staged_boosting_curves(
+                x_train,
+                x_test,
+                y_train,
+                y_test,
+                model,
+                name,
+                max_depth_tested,
+                max_estimators,
+            ),
+        )
+
+    sizes = range(1, max_estimators)
+    metrics = {}
+    curves = {}
+    print(f"Computing staged metrics for {name}")
+    for depth in range(1, max_depth_tested):
+        boost_model = model(
+            x_train, y_train, x_test, y_test, name, depth, n_estimators=sizes[-1]
+        )
+        boost_model.fit()
+        errors = []
+        for y_pred in boost_model.model.staged_predict(x_test):
+            errors.append(1 - r2_score(y_test, y_pred))
+            if errors[-1] < min(errors[:-1], default=np.inf):
+                boost_model.y_pred = y_pred
+        boost_model.compute_metrics()
+        metrics[depth] = boost_model.metrics
+        curves[depth] = errors
+
+    optimal_depths = {}
+    for metric in metrics[1]:
+        depths = list(metrics.keys())
+        values = [metrics[depth][metric] for depth in depths]
+        # For R2, we seek the maximum, for others, the minimum
+        if metric == "r2":
+            optimal_index = np.argmax(values)
+        else:
+            optimal_index = np.argmin(values)
+        optimal_depths[metric] = (depths[optimal_index], values[optimal_index]), (
+            depths,
+            values,
+        )
+
+    errors = curves[optimal_depths["mse"][0][0]]
+    # Early stopping may fit fewer estimators than requested.
+    sizes = range(1, len(errors) + 1)
+    optimal_estimator = int(np.argmin(errors))
+    oob_errors = (sizes, errors), (sizes[optimal_estimator], errors[optimal_estimator])
+    print(f"Finished computing staged metrics for {name}")
+    return optimal_depths, oob_errors
@@ -35,35 +35,71 @@ def compute_trade_risk(
             risk associated to each trade flow.
 
     """
-    trade_risk = trade.merge(risk[["id", hazard]], on="id")
-    trade_risk["q_flow_at_risk"] = (trade_risk["q_sea_flow"] / 365) * trade_risk[hazard]
-    trade_risk["v_flow_at_risk"] = (trade_risk["v_sea_flow"] / 365) * trade_risk[hazard]
+    return compute_hazards_trade_risk(trade, risk, [hazard], industries)[hazard]
 
-    trade_risk["downtime_q_weighted"] = (
-        trade_risk["q_sea_flow"] / trade_risk["q_sea_flow_total"]
-    ) * trade_risk[hazard]
-    trade_risk["downtime_v_weighted"] = (
-        trade_risk["v_sea_flow"] / trade_risk["v_sea_flow_total"]
-    ) * trade_risk[hazard]
+
+def compute_hazards_trade_risk(
+    trade: pd.DataFrame,
+    risk: pd.DataFrame,
+    hazards: list[str],
+    industries: bool = False,
+) -> dict[str, pd.DataFrame]:
+    """
+    Computes the trade risk of several hazards at once. Hazards are treated as an extra axis: the
+    downtimes of all hazards are merged to the trade flows in a single merge, the flows at risk
+    and weighted downtimes are computed as (flows x hazards) arrays and the network downtimes of
+    all hazards come from a single groupby. Same output as calling compute_trade_risk for each
+    hazard.
+
+    Parameters:
+        trade: pd.DataFrame
+            The trade dataframe.
+        risk:
+            The port_risk data.
+        hazards: list[str]
+            The hazards to consider.
+        industries: bool default False
+            Boolean flag set to true if process should be done on each sector seperatly.
+
+    Return:
+        trade_risks: dict[str, pd.DataFrame]
+            Dictionnary mapping each hazard to the trade network with the additional columns
+            containing the risk associated to each trade flow.
+    """
+    trade_risk = trade.merge(risk[["id"] + hazards], on="id")
+    downtime = trade_risk[hazards].to_numpy()
+
+    flows_at_risk, weighted = {}, {}
+    for metric in ("q", "v"):
+        sea_flow = trade_risk[f"{metric}_sea_flow"].to_numpy()
+        sea_flow_total = trade_risk[f"{metric}_sea_flow_total"].to_numpy()
+        flows_at_risk[metric] = (sea_flow / 365)[:, None] * downtime
+        weighted[metric] = (sea_flow / sea_flow_total)[:, None] * downtime
 
     groupby_list = ["iso3"]
     if industries:
         groupby_list += ["sector", "Industries"]
 
-    network_trade_risk = (
-        trade_risk.groupby(groupby_list)[["downtime_q_weighted", "downtime_v_weighted"]]
-        .sum()
-        .reset_index()
-    )
-    network_trade_risk = network_trade_risk.rename(
-        columns={
-            "downtime_q_weighted": "downtime_q_network",
-            "downtime_v_weighted": "downtime_v_network",
-        }
+    network = (
+        pd.DataFrame(np.hstack([weighted["q"], weighted["v"]]), index=trade_risk.index)
+        .groupby([trade_risk[key] for key in groupby_list], observed=True)
+        .transform("sum")
+        .to_numpy()
     )
-    trade_risk = trade_risk.merge(network_trade_risk, on=groupby_list)
 
-    return trade_risk
+    trade_columns = trade_risk.columns.drop(hazards)
+    trade_risks = {}
+    for i, hazard in enumerate(hazards):
+        hazard_risk = trade_risk[trade_columns.append(pd.Index([hazard]))].copy()
+        hazard_risk["q_flow_at_risk"] = flows_at_risk["q"][:, i]
+        hazard_risk["v_flow_at_risk"] = flows_at_risk["v"][:, i]
+        hazard_risk["downtime_q_weighted"] = weighted["q"][:, i]
+        hazard_risk["downtime_v_weighted"] = weighted["v"][:, i]
+        hazard_risk["downtime_q_network"] = network[:, i]
+        hazard_risk["downtime_v_network"] = network[:, len(hazards) + i]
+        trade_risks[hazard] = hazard_risk
+
+    return trade_risks
 
 
 def merge_risk(
@@ -93,73 +129,116 @@ def merge_risk(
             A DataFrame object containing the compounded annual domestic, foreign and global
             import/export risk for each country.
     """
+    return merge_hazards_risk(
+        {"risk": import_risk}, {"risk": export_risk}, quantity, industries
+    )["risk"]
 
-    col_name = f"downtime_{'q' if quantity else 'v'}_weighted"
-    sea_flow_total = f"{'q' if quantity else 'v'}_sea_flow_total"
-
-    iso3 = "iso3"
-    if industries:
-        import_risk["iso3_sector"] = import_risk["iso3"] + "_" + import_risk["sector"]
-        export_risk["iso3_sector"] = export_risk["iso3"] + "_" + export_risk["sector"]
-        iso3 = "iso3_sector"
-
-    domestic_import_risk = (
-        import_risk.loc[import_risk["iso3"] == import_risk["port_iso3"]]
-        .groupby(iso3)[col_name]
-        .sum()
-    )
-    domestic_import_risk = domestic_import_risk.rename("domestic_import_risk")
-    foreign_import_risk = (
-        import_risk.loc[import_risk["iso3"] != import_risk["port_iso3"]]
-        .groupby(iso3)[col_name]
-        .sum()
-    )
-    foreign_import_risk = foreign_import_risk.rename("foreign_import_risk")
 
-    domestic_export_risk = (
-        export_risk.loc[export_risk["iso3"] == export_risk["port_iso3"]]
-        .groupby(iso3)[col_name]
-        .sum()
-    )
-    domestic_export_risk = domestic_export_risk.rename("domestic_export_risk")
-    foreign_export_risk = (
-        export_risk.loc[export_risk["iso3"] != export_risk["port_iso3"]]
-        .groupby(iso3)[col_name]
-        .sum()
-    )
-    foreign_export_risk = foreign_export_risk.rename("foreign_export_risk")
+def aggregate_trade_risk(
+    trade_risks: dict[str, pd.DataFrame],
+    col_name: str,
+    iso3: list[str],
+    sea_flow_total: str,
+) -> tuple:
+    """
+    Aggregates the trade risks of one direction in a single groupby keyed on the country (or
+    country and sector) and on whether the port is domestic: the weighted downtimes of every
+    hazard are summed and the flow total and number of ports are gathered in the same pass.
 
-    global_risk = pd.concat(
-        [
-            domestic_import_risk,
-            foreign_export_risk,
-            domestic_export_risk,
-            foreign_import_risk,
-        ],
-        axis=1,
-    )
+    Parameters:
+        trade_risks: dict[str, pd.DataFrame]
+            Dictionnary mapping each hazard to its DataFrame of trade risks.
+        col_name: str
+            The weighted downtime column, "downtime_q_weighted" or "downtime_v_weighted".
+        iso3: list[str]
+            The country key, ["iso3"] or ["iso3", "sector"].
+        sea_flow_total: str
+            The total flow column, "q_sea_flow_total" or "v_sea_flow_total".
 
-    total_import = (
-        import_risk[[iso3, sea_flow_total]]
-        .drop_duplicates()
-        .rename(columns={sea_flow_total: "imports"})
-        .set_index(iso3)
+    Return:
+        domestic, foreign, total, n_ports: tuple
+            The domestic and foreign risks (one column per hazard), the total flow and the
+            number of ports, indexed by the country key.
+    """
+    hazards = list(trade_risks)
+    trade_risk = trade_risks[hazards[0]]
+    domestic = (trade_risk["iso3"] == trade_risk["port_iso3"]).rename("domestic")
+    data = pd.DataFrame(
+        np.column_stack([trade_risks[hazard][col_name] for hazard in hazards]),
+        index=trade_risk.index,
+        columns=hazards,
     )
-    total_exports = (
-        export_risk[[iso3, sea_flow_total]]
-        .drop_duplicates()
-        .rename(columns={sea_flow_total: "exports"})
-        .set_index(iso3)
+    data[sea_flow_total] = trade_risk[sea_flow_total]
+    # Ports are counted on their integer codes rather than on the id strings.
+    data["id"] = pd.factorize(trade_risk["id"])[0]
+
+    # The groups are computed once and shared by the three reductions.
+    keys = [trade_risk[key] for key in iso3] + [domestic]
+    groups = data.groupby(keys, observed=True)
+    grouped = groups[hazards].sum()
+    grouped[sea_flow_total] = groups[sea_flow_total].first()
+    grouped["id"] = groups["id"].nunique()
+    is_domestic = grouped.index.get_level_values("domestic").to_numpy(dtype=bool)
+    # A port is either domestic or foreign to a country, so the port counts of both add up.
+    by_country = grouped[[sea_flow_total, "id"]].groupby(level=iso3, observed=True)
+    return (
+        grouped.loc[is_domestic, hazards].droplevel("domestic"),
+        grouped.loc[~is_domestic, hazards].droplevel("domestic"),
+        by_country[sea_flow_total].first(),
+        by_country["id"].sum(),
     )
 
-    global_risk = pd.concat([global_risk, total_import, total_exports], axis=1)
 
-    ports_import = import_risk.groupby(iso3)["id"].nunique().rename("n_ports_import")
-    ports_export = export_risk.groupby(iso3)["id"].nunique().rename("n_ports_import")
+def assemble_global_risk(
+    risks: list[pd.Series],
+    totals: list[pd.Series],
+    n_ports: list[pd.Series],
+) -> pd.DataFrame:
+    """
+    Assembles the domestic/foreign import/export risks, the trade totals and the port counts of
+    each country into the global risk dataframe and computes the compounded risks. All inputs
+    share the same index.
 
-    global_risk = pd.concat([global_risk, ports_import, ports_export], axis=1)
+    Parameters:
+        risks: list[pd.Series]
+            The domestic import, foreign export, domestic export and foreign import risks.
+        totals: list[pd.Series]
+            The total imports and exports.
+        n_ports: list[pd.Series]
+            The number of ports used for imports and exports.
 
-    global_risk = global_risk.replace(np.nan, 0.0).reset_index()
+    Return:
+        global_risk: pd.DataFrame
+            A DataFrame object containing the compounded annual domestic, foreign and global
+            import/export risk for each country.
+    """
+    names = [
+        "domestic_import_risk",
+        "foreign_export_risk",
+        "domestic_export_risk",
+        "foreign_import_risk",
+        "imports",
+        "exports",
+        "n_ports_import",
+        "n_ports_export",
+    ]
+    global_risk = pd.concat(
+        [series.rename(name) for series, name in zip(risks + totals + n_ports, names)],
+        axis=1,
+    )
+    keys = list(global_risk.index.names)
+    if keys == ["iso3", "sector"]:
+        # Sector risks keep the layout of merge_risk: the iso3_sector key first, iso3 and sector
+        # last.
+        iso3_sector = (
+            global_risk.index.get_level_values("iso3").astype(str)
+            + "_"
+            + global_risk.index.get_level_values("sector").astype(str)
+        )
+        global_risk = global_risk.reset_index()
+        global_risk.insert(0, "iso3_sector", iso3_sector)
+    else:
+        global_risk = global_risk.reset_index()
 
     global_risk["total_import_risk"] = (
         global_risk["domestic_import_risk"] + global_risk["foreign_import_risk"]
@@ -167,30 +246,100 @@ def merge_risk(
     global_risk["total_export_risk"] = (
         global_risk["domestic_export_risk"] + global_risk["foreign_export_risk"]
     )
+    flows = global_risk[["imports", "exports"]].sum(axis=1)
     global_risk["total_risk"] = (
         global_risk["total_import_risk"] * global_risk["imports"]
-    ) / global_risk[["imports", "exports"]].sum(axis=1)
+    ) / flows
     global_risk["total_risk"] += (
         global_risk["total_export_risk"] * global_risk["exports"]
-    ) / global_risk[["imports", "exports"]].sum(axis=1)
-
-    if industries:
-        global_risk["iso3"] = global_risk["iso3_sector"].apply(
-            lambda x: x.split("_")[0]
-        )
-        global_risk["sector"] = global_risk["iso3_sector"].apply(
-            lambda x: x.split("_")[1]
-        )
+    ) / flows
 
+    if keys == ["iso3", "sector"]:
+        global_risk = global_risk[
+            [col for col in global_risk.columns if col not in keys] + keys
+        ]
     return global_risk
 
 
+def merge_hazards_risk(
+    import_risks: dict[str, pd.DataFrame],
+    export_risks: dict[str, pd.DataFrame],
+    quantity: bool = False,
+    industries: bool = False,
+) -> dict[str, pd.DataFrame]:
+    """
+    Merges the import and export risks of several hazards, as returned by
+    compute_hazards_trade_risk. Each direction is aggregated by a single groupby over all hazards
+    by aggregate_trade_risk. Same output as calling merge_risk for each hazard.
+
+    Parameters:
+        import_risks: dict[str, pd.DataFrame]
+            Dictionnary mapping each hazard to its DataFrame of import risks.
+        export_risks: dict[str, pd.DataFrame]
+            Dictionnary mapping each hazard to its DataFrame of export risks.
+        quantity: bool default False
+            Boolean flag set to true when the analysis should be performed on quantity of trade
+            flows.
+        industries: bool default False
+            Boolean flag set to true if process should be done on each sector seperatly.
+
+    Return:
+        global_risks: dict[str, pd.DataFrame]
+            Dictionnary mapping each hazard to the compounded annual domestic, foreign and global
+            import/export risk for each country.
+    """
+    col_name = f"downtime_{'q' if quantity else 'v'}_weighted"
+    sea_flow_total = f"{'q' if quantity else 'v'}_sea_flow_total"
+    iso3 = ["iso3", "sector"] if industries else ["iso3"]
+
+    domestic_import, foreign_import, total_import, ports_import = aggregate_trade_risk(
+        import_risks, col_name, iso3, sea_flow_total
+    )
+    domestic_export, foreign_export, total_exports, ports_export = aggregate_trade_risk(
+        export_risks, col_name, iso3, sea_flow_total
+    )
+
+    # Countries in order of first appearance in the risks, as the outer join of the risks has
+    # always listed them.
+    index = domestic_import.index.append(
+        [foreign_export.index, domestic_export.index, foreign_import.index]
+    )
+    index = index[~index.duplicated()]
+    domestic_import, foreign_export, domestic_export, foreign_import = (
+        risk.reindex(index, fill_value=0.0)
+        for risk in (domestic_import, foreign_export, domestic_export, foreign_import)
+    )
+    # Filled after the reindex, as merge_risk always filled the gaps of its outer join: the totals
+    # and port counts of a country missing from a direction become float 0.
+    totals = [
+        total.reindex(index).fillna(0.0) for total in (total_import, total_exports)
+    ]
+    n_ports = [
+        count.reindex(index).fillna(0.0) for count in (ports_import, ports_export)
+    ]
+
+    return {
+        hazard: assemble_global_risk(
+            [
+                domestic_import[hazard],
+                foreign_export[hazard],
+                domestic_export[hazard],
+                foreign_import[hazard],
+            ],
+            totals,
+            n_ports,
+        )
+        for hazard in import_risks
+    }
+
+
 def create_risk_dataframe(
     trade: dict[str, pd.DataFrame], ports_risk: pd.DataFrame, hazards: list[str]
 ) -> dict:
     """
     Creates trade risk dataframe by computing trade risk for all hazards in input list.
-    Computes import/export risk and merges them together.
+    Computes import/export risk and merges them together. All hazards are computed in one pass
+    by compute_hazards_trade_risk and merge_hazards_risk.
 
     Parameters:
         trade: dict[str, pd.DataFrame]
@@ -205,33 +354,31 @@ def create_risk_dataframe(
         risk: dict
             Dictionnary mapping name of dataset to the computed risk.
     """
-    risk = {}
-    for hazard in hazards:
-        risk[hazard] = {}
-
-        for i in range(0, len(trade), 2):
-            k1 = list(trade.keys())[i]
-            k2 = list(trade.keys())[i + 1]
-            v1, v2 = trade[k1], trade[k2]
-
-            industries = "sector" in k1 and "sector" in k2
-
-            export_trade_risk = compute_trade_risk(
-                v1, ports_risk, hazard=hazard, industries=industries
-            )
-            import_trade_risk = compute_trade_risk(
-                v2, ports_risk, hazard=hazard, industries=industries
-            )
-            risk[hazard][f"import{'_sector' if industries else ''}"] = import_trade_risk
-            risk[hazard][f"export{'_sector' if industries else ''}"] = export_trade_risk
-
-            risk[hazard][f"value{'_sector' if industries else ''}"] = merge_risk(
-                import_trade_risk, export_trade_risk, industries=industries
-            )
-            risk[hazard][f"quantity{'_sector' if industries else ''}"] = merge_risk(
-                import_trade_risk,
-                export_trade_risk,
-                industries=industries,
-                quantity=True,
-            )
+    risk = {hazard: {} for hazard in hazards}
+    for i in range(0, len(trade), 2):
+        k1 = list(trade.keys())[i]
+        k2 = list(trade.keys())[i + 1]
+        v1, v2 = trade[k1], trade[k2]
+
+        industries = "sector" in k1 and "sector" in k2
+        suffix = "_sector" if industries else ""
+
+        export_trade_risks = compute_hazards_trade_risk(
+            v1, ports_risk, hazards, industries=industries
+        )
+        import_trade_risks = compute_hazards_trade_risk(
+            v2, ports_risk, hazards, industries=industries
+        )
+        value_risks = merge_hazards_risk(
+            import_trade_risks, export_trade_risks, industries=industries
+        )
+        quantity_risks = merge_hazards_risk(
+            import_trade_risks, export_trade_risks, industries=industries, quantity=True
+        )
+
+        for hazard in hazards:
+            risk[hazard][f"import{suffix}"] = import_trade_risks[hazard]
+            risk[hazard][f"export{suffix}"] = export_trade_risks[hazard]
+            risk[hazard][f"value{suffix}"] = value_risks[hazard]
+            risk[hazard][f"quantity{suffix}"] = quantity_risks[hazard]
     return risk
@@ -0,0 +1,259 @@
+"""
+Models submodule running Monte Carlo scenarios of port downtime.
+
+For each hazard, N downtime vectors are sampled from per-port distributions centred on the
+expected downtime of downtime_risk_present.csv. Scenarios are evaluated in batches as (ports x
+batch) matrices through the exposure weights, which apply the compute_trade_risk / merge_risk
+weighting, and batches are sharded across a process pool. Each batch draws from its own child of a
+single SeedSequence, so results do not depend on the number of processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from port_risk.models.exposure import Exposure
+
+Sampler = Callable[[np.random.Generator, np.ndarray, int], np.ndarray]
+
+
+def _sample_gamma(
+    rng: np.random.Generator, mean: np.ndarray, n: int, cv: float | np.ndarray
+) -> np.ndarray:
+    cv = np.broadcast_to(cv, mean.shape)[:, None]
+    return rng.gamma(1 / cv**2, mean[:, None] * cv**2, size=(len(mean), n))
+
+
+def _sample_lognormal(
+    rng: np.random.Generator, mean: np.ndarray, n: int, sigma: float | np.ndarray
+) -> np.ndarray:
+    sigma = np.broadcast_to(sigma, mean.shape)[:, None]
+    with np.errstate(divide="ignore"):
+        mu = np.log(mean)[:, None] - sigma**2 / 2
+    return np.where(
+        mean[:, None] > 0, rng.lognormal(mu, sigma, size=(len(mean), n)), 0.0
+    )
+
+
+def _sample_exponential(
+    rng: np.random.Generator, mean: np.ndarray, n: int
+) -> np.ndarray:
+    return rng.exponential(mean[:, None], size=(len(mean), n))
+
+
+def gamma_sampler(cv: float | np.ndarray = 1.0) -> Sampler:
+    """
+    Makes a sampler drawing gamma distributed downtimes with the expected downtime of each port as
+    mean.
+
+    Parameters:
+        cv: float | np.ndarray default 1.0
+            Coefficient of variation, a single value or one value per port.
+
+    Return:
+        sampler: Sampler
+            Function (rng, mean, n) -> (ports x n) downtimes.
+    """
+    return partial(_sample_gamma, cv=cv)
+
+
+def lognormal_sampler(sigma: float | np.ndarray = 1.0) -> Sampler:
+    """
+    Makes a sampler drawing log-normal downtimes with the expected downtime of each port as mean.
+
+    Parameters:
+        sigma: float | np.ndarray default 1.0
+            Standard deviation of the log downtime, a single value or one value per port.
+
+    Return:
+        sampler: Sampler
+            Function (rng, mean, n) -> (ports x n) downtimes.
+    """
+    return partial(_sample_lognormal, sigma=sigma)
+
+
+def exponential_sampler() -> Sampler:
+    """
+    Makes a sampler drawing exponential downtimes with the expected downtime of each port as mean.
+
+    Return:
+        sampler: Sampler
+            Function (rng, mean, n) -> (ports x n) downtimes.
+    """
+    return _sample_exponential
+
+
+# State shared by the batches of a worker, set once by _init_worker.
+_worker = {}
+
+
+def _init_worker(
+    weights, means: dict[str, np.ndarray], samplers: dict[str, Sampler]
+) -> None:
+    _worker["weights"] = weights
+    _worker["means"] = means
+    _worker["samplers"] = samplers
+
+
+def _evaluate_batch(seed: np.random.SeedSequence, size: int) -> dict[str, np.ndarray]:
+    """
+    Samples and evaluates one batch of scenarios.
+
+    Parameters:
+        seed: np.random.SeedSequence
+            Seed of the batch.
+        size: int
+            Number of scenarios of the batch.
+
+    Return:
+        batch: dict[str, np.ndarray]
+            Mapping of each hazard (and downtime_total) to the (countries x size) total risks.
+    """
+    rng = np.random.default_rng(seed)
+    weights = _worker["weights"]
+    batch = {}
+    total = None
+    for hazard, mean in _worker["means"].items():
+        downtime = _worker["samplers"][hazard](rng, mean, size)
+        batch[hazard] = (weights @ downtime).astype(np.float32)
+        total = downtime if total is None else total + downtime
+    batch["downtime_total"] = (weights @ total).astype(np.float32)
+    return batch
+
+
+def risk_summary(
+    samples: np.ndarray,
+    countries: pd.Index,
+    quantiles: tuple[float, ...] = (0.05, 0.5, 0.95),
+    alpha: float = 0.95,
+) -> pd.DataFrame:
+    """
+    Summarises the scenarios of total_risk of each country.
+
+    Parameters:
+        samples: np.ndarray
+            The (countries x scenarios) total risks.
+        countries: pd.Index
+            The countries of the rows.
+        quantiles: tuple[float, ...] default (0.05, 0.5, 0.95)
+            The quantiles to report.
+        alpha: float default 0.95
+            Confidence level of the value at risk and conditional value at risk.
+
+    Return:
+        summary: pd.DataFrame
+            Mean, quantiles, VaR and CVaR of the total_risk of each country.
+    """
+    summary = pd.DataFrame(index=countries)
+    summary["mean"] = samples.mean(axis=1)
+    summary["std"] = samples.std(axis=1)
+    for q, values in zip(quantiles, np.quantile(samples, quantiles, axis=1)):
+        summary[f"q{q:g}"] = values
+    var = np.quantile(samples, alpha, axis=1)
+    tail = samples >= var[:, None]
+    summary[f"var_{alpha:g}"] = var
+    summary[f"cvar_{alpha:g}"] = (samples * tail).sum(axis=1) / tail.sum(axis=1)
+    return summary
+
+
+def run_scenarios(
+    exposure: Exposure,
+    ports_risk: pd.DataFrame,
+    n_scenarios: int = 10_000,
+    hazards: list[str] = None,
+    distributions: dict[str, Sampler] = None,
+    quantity: bool = False,
+    batch_size: int = 1_000,
+    processes: int = None,
+    seed: int = 0,
+    quantiles: tuple[float, ...] = (0.05, 0.5, 0.95),
+    alpha: float = 0.95,
+    return_samples: bool = False,
+) -> dict:
+    """
+    Runs Monte Carlo scenarios of port downtime and summarises the resulting distribution of the
+    total_risk of each country. Downtimes of each hazard are sampled independently and
+    downtime_total is the sum of the sampled hazards, as in merge_ports_risk.
+
+    Parameters:
+        exposure: Exposure
+            The exposure weights of each country to each port.
+        ports_risk: pd.DataFrame
+            The port_risk data, providing the expected downtime of each port.
+        n_scenarios: int default 10_000
+            Number of scenarios.
+        hazards: list[str] default None
+            The hazards to sample, defaults to all hazards of ports_risk except downtime_total.
+        distributions: dict[str, Sampler] default None
+            Mapping of hazard to sampler, hazards without an entry use gamma_sampler().
+        quantity: bool default False
+            Boolean flag set to true when the analysis should be performed on quantity of trade
+            flows.
+        batch_size: int default 1_000
+            Number of scenarios evaluated at once.
+        processes: int default None
+            Number of worker processes, defaults to the number of cores. Set to 1 to run in the
+            current process.
+        seed: int default 0
+            Seed of the scenarios.
+        quantiles: tuple[float, ...] default (0.05, 0.5, 0.95)
+            The quantiles to report.
+        alpha: float default 0.95
+            Confidence level of the value at risk and conditional value at risk.
+        return_samples: bool default False
+            Boolean flag set to true to also return the (countries x scenarios) samples.
+
+    Return:
+        results: dict
+            Mapping of each hazard (and downtime_total) to the summary of the total_risk of each
+            country. When return_samples is set, maps each hazard to (summary, samples).
+    """
+    if hazards is None:
+        hazards = [
+            col
+            for col in ports_risk.columns
+            if col.startswith("downtime_") and col != "downtime_total"
+        ]
+    distributions = distributions or {}
+    weights = exposure.total_weights("q" if quantity else "v")
+    means = {hazard: exposure.downtime(ports_risk, hazard) for hazard in hazards}
+    samplers = {
+        hazard: distributions.get(hazard, gamma_sampler()) for hazard in hazards
+    }
+
+    sizes = [batch_size] * (n_scenarios // batch_size)
+    if n_scenarios % batch_size:
+        sizes.append(n_scenarios % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    samples = {
+        hazard: np.empty((len(exposure.countries), n_scenarios), dtype=np.float32)
+        for hazard in hazards + ["downtime_total"]
+    }
+
+    def store(i: int, batch: dict[str, np.ndarray]) -> None:
+        for hazard, values in batch.items():
+            samples[hazard][:, offsets[i] : offsets[i + 1]] = values
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        _init_worker(weights, means, samplers)
+        for i, (batch_seed, size) in enumerate(zip(seeds, sizes)):
+            store(i, _evaluate_batch(batch_seed, size))
+    else:
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(weights, means, samplers)
+        ) as pool:
+            for i, batch in enumerate(pool.map(_evaluate_batch, seeds, sizes)):
+                store(i, batch)
+
+    results = {}
+    for hazard, values in samples.items():
+        summary = risk_summary(values, exposure.countries, quantiles, alpha)
+        results[hazard] = (summary, values) if return_samples else summary
+    return results
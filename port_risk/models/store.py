@@ -0,0 +1,212 @@
+"""
+Models submodule persisting fitted models and validation results on disk.
+
+Entries are content addressed: the key hashes the training arrays, the model classes and their
+parameters, so a rerun on the same data with the same hyperparameters reads the stored result
+instead of fitting again, and any change of data or parameters misses the store. The store is
+bounded in size and evicts the least recently used entries.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from importlib.metadata import version
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from port_risk import data_path
+
+_MISSING = object()
+
+
+def hash_arrays(*arrays, digest: "hashlib._Hash" = None) -> "hashlib._Hash":
+    """
+    Updates a digest with the dtype, shape and content of arrays.
+
+    Parameters:
+        arrays:
+            The arrays (or objects convertible to arrays, e.g. Series) to hash.
+        digest: hashlib._Hash default None
+            The digest to update, defaults to a new blake2b digest.
+
+    Return:
+        digest: hashlib._Hash
+            The updated digest.
+    """
+    digest = digest or hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.view(np.uint8).reshape(-1) if array.size else b"")
+    return digest
+
+
+def hash_frames(*frames, digest: "hashlib._Hash" = None) -> "hashlib._Hash":
+    """
+    Updates a digest with the column names and values of frames. Values are hashed on their
+    labels, so a categorical column hashes as the column of its labels.
+
+    Parameters:
+        frames:
+            The DataFrames (or Series) to hash.
+        digest: hashlib._Hash default None
+            The digest to update, defaults to a new blake2b digest.
+
+    Return:
+        digest: hashlib._Hash
+            The updated digest.
+    """
+    digest = digest or hashlib.blake2b(digest_size=16)
+    for frame in frames:
+        frame = frame.to_frame() if isinstance(frame, pd.Series) else frame
+        digest.update(json.dumps([str(col) for col in frame.columns]).encode())
+        hash_arrays(pd.util.hash_pandas_object(frame, index=False), digest=digest)
+    return digest
+
+
+class ModelStore:
+    """
+    On-disk store of fitted models and validation results, keyed on the content of their inputs
+    and evicting the least recently used entries beyond max_bytes.
+    """
+
+    def __init__(self, folder: Path = None, max_bytes: int = 2 * 1024**3) -> None:
+        self.folder = Path(folder or Path(data_path["cache"], "models"))
+        self.max_bytes = max_bytes
+
+    def key(
+        self, name: str, arrays: tuple = (), classes: dict = None, params: dict = None
+    ) -> str:
+        """
+        Computes the key of an entry.
+
+        Parameters:
+            name: str
+                Name of the computation, e.g. the function storing the entry.
+            arrays: tuple default ()
+                The data arrays of the computation.
+            classes: dict default None
+                Mapping of model name to model class. The default values of the constructor
+                parameters of each class are part of the key.
+            params: dict default None
+                The parameters of the computation.
+
+        Return:
+            key: str
+                The hexadecimal key.
+        """
+        classes = {
+            name: {
+                "path": f"{cls.__module__}.{cls.__qualname__}",
+                "defaults": {
+                    param.name: param.default
+                    for param in inspect.signature(cls).parameters.values()
+                    if param.default is not inspect.Parameter.empty
+                },
+            }
+            for name, cls in (classes or {}).items()
+        }
+        header = json.dumps(
+            {
+                "name": name,
+                "classes": classes,
+                "params": params or {},
+                "sklearn": version("scikit-learn"),
+                "scipy": version("scipy"),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.blake2b(header.encode(), digest_size=16)
+        return hash_arrays(*arrays, digest=digest).hexdigest()
+
+    def path(self, key: str) -> Path:
+        """
+        Returns the file of an entry.
+        """
+        return Path(self.folder, f"{key}.joblib")
+
+    def get(self, key: str, default=None):
+        """
+        Reads an entry and marks it as recently used.
+
+        Parameters:
+            key: str
+                The key of the entry.
+            default: default None
+                Value returned when the entry is not stored.
+
+        Return:
+            value:
+                The stored value, or default.
+        """
+        path = self.path(key)
+        try:
+            value = joblib.load(path)
+        except (FileNotFoundError, EOFError):
+            return default
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value) -> None:
+        """
+        Writes an entry, then evicts the least recently used entries beyond max_bytes.
+
+        Parameters:
+            key: str
+                The key of the entry.
+            value:
+                The value to store.
+
+        Return:
+            None
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        tmp = path.with_suffix(".tmp")
+        joblib.dump(value, tmp)
+        tmp.replace(path)
+        self.evict()
+
+    def fetch(self, key: str, compute):
+        """
+        Returns the stored value of key, computing and storing it when it is missing.
+
+        Parameters:
+            key: str
+                The key of the entry.
+            compute: Callable
+                Function without arguments computing the value.
+
+        Return:
+            value:
+                The stored or computed value.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used entries until the store fits in max_bytes.
+        """
+        entries = [(path.stat(), path) for path in self.folder.glob("*.joblib")]
+        size = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+    def clear(self) -> None:
+        """
+        Deletes every entry.
+        """
+        for path in self.folder.glob("*.joblib"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,164 @@
+"""
+Models submodule answering what-if questions on port downtimes incrementally.
+
+A RiskState holds the country risks of a baseline downtime. Since every risk is linear in the
+downtime of the ports, editing the downtime of a few ports changes the risks by the exposure
+weights of these ports times the downtime deltas: only the countries trading through the edited
+ports are updated, and the merge chain of create_risk_dataframe is not recomputed.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from port_risk.models.exposure import DIRECTIONS, SPLITS, Exposure
+
+
+class RiskState:
+    """
+    Country risks of a downtime state, for every hazard, which can be updated with port downtime
+    edits.
+    """
+
+    def __init__(
+        self,
+        exposure: Exposure,
+        downtime: pd.DataFrame,
+        risks: dict[str, dict[str, np.ndarray]],
+        quantity: bool = False,
+    ) -> None:
+        self.exposure = exposure
+        self.downtime = downtime
+        self.risks = risks
+        self.quantity = quantity
+        metric = "q" if quantity else "v"
+        self._columns = {
+            (direction, split): exposure.weights[(direction, metric, split)].tocsc()
+            for direction in DIRECTIONS
+            for split in SPLITS
+        }
+        self._imports = exposure.totals[("import", metric)]
+        self._exports = exposure.totals[("export", metric)]
+
+    @classmethod
+    def from_ports_risk(
+        cls,
+        exposure: Exposure,
+        ports_risk: pd.DataFrame,
+        hazards: list[str] = None,
+        quantity: bool = False,
+    ) -> "RiskState":
+        """
+        Builds the baseline state of the downtimes of ports_risk.
+
+        Parameters:
+            exposure: Exposure
+                The exposure weights of each country to each port.
+            ports_risk: pd.DataFrame
+                The port_risk data.
+            hazards: list[str] default None
+                The hazards to track, defaults to all downtime columns of ports_risk.
+            quantity: bool default False
+                Boolean flag set to true when the analysis should be performed on quantity of trade
+                flows.
+
+        Return:
+            state: RiskState
+                The baseline state.
+        """
+        if hazards is None:
+            hazards = [col for col in ports_risk.columns if col.startswith("downtime_")]
+        downtime = pd.DataFrame(
+            {hazard: exposure.downtime(ports_risk, hazard) for hazard in hazards},
+            index=exposure.ports,
+        )
+        risks = {
+            hazard: exposure.evaluate(downtime[hazard].to_numpy(), quantity)
+            for hazard in hazards
+        }
+        return cls(exposure, downtime, risks, quantity)
+
+    def apply(self, edits: list[tuple[str, str, float]]) -> "RiskState":
+        """
+        Returns the state after editing the downtime of some ports. An edit of a single hazard
+        also changes downtime_total by the same amount, as downtime_total is the sum of the
+        hazards in merge_ports_risk.
+
+        Parameters:
+            edits: list[tuple[str, str, float]]
+                The (port id, hazard, new downtime) edits, applied in order.
+
+        Return:
+            state: RiskState
+                The edited state, the current state is left unchanged.
+        """
+        downtime = self.downtime.copy()
+        deltas = {}
+        for port, hazard, value in edits:
+            if port not in downtime.index:
+                raise KeyError(f"Port {port} has no downtime data.")
+            row = downtime.index.get_loc(port)
+            column = downtime.columns.get_loc(hazard)
+            changed = [hazard]
+            if hazard != "downtime_total" and "downtime_total" in downtime.columns:
+                changed.append("downtime_total")
+            delta = value - downtime.iat[row, column]
+            for name in changed:
+                downtime.iat[row, downtime.columns.get_loc(name)] += delta
+                deltas.setdefault(name, {}).setdefault(row, 0.0)
+                deltas[name][row] += delta
+
+        risks = dict(self.risks)
+        for hazard, changes in deltas.items():
+            risks[hazard] = self._update(
+                self.risks[hazard],
+                np.fromiter(changes.keys(), dtype=np.int64),
+                np.fromiter(changes.values(), dtype=float),
+            )
+        state = copy.copy(self)
+        state.downtime = downtime
+        state.risks = risks
+        return state
+
+    def _update(
+        self, risks: dict[str, np.ndarray], ports: np.ndarray, delta: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        """
+        Adds the risk deltas of downtime changes at some ports to the countries trading through
+        them.
+        """
+        risks = {column: values.copy() for column, values in risks.items()}
+        affected = []
+        for direction in DIRECTIONS:
+            for split in SPLITS:
+                weights = self._columns[(direction, split)][:, ports]
+                rows = np.unique(weights.indices)
+                change = (weights @ delta)[rows]
+                risks[f"{split}_{direction}_risk"][rows] += change
+                risks[f"total_{direction}_risk"][rows] += change
+                affected.append(rows)
+
+        rows = np.unique(np.concatenate(affected))
+        imports, exports = self._imports[rows], self._exports[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            risks["total_risk"][rows] = (
+                risks["total_import_risk"][rows] * imports
+                + risks["total_export_risk"][rows] * exports
+            ) / (imports + exports)
+        return risks
+
+    def country_risk(self, hazard: str) -> pd.DataFrame:
+        """
+        Returns the global risk dataframe of a hazard, with the columns of merge_risk.
+
+        Parameters:
+            hazard: str
+                The hazard column to use.
+
+        Return:
+            global_risk: pd.DataFrame
+                A DataFrame object containing the compounded annual domestic, foreign and global
+                import/export risk for each country.
+        """
+        return self.exposure.risk_frame(self.risks[hazard], self.quantity)
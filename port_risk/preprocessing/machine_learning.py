@@ -3,10 +3,13 @@ Pre-processing module for the machine learning model.
 """
 
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ShuffleSplit, train_test_split
 import numpy as np
 from port_risk.io.stats_plots import plot_correlation_matrix
 
+DROPPED_COLUMNS = ["geometry", "iso3", "port_name", "port_iso3"]
+MAX_TARGET = np.power(10, float(-4))
+
 
 def ml_preprocessing(data: pd.DataFrame, name: str) -> pd.DataFrame:
     """
@@ -23,12 +26,12 @@ def ml_preprocessing(data: pd.DataFrame, name: str) -> pd.DataFrame:
         data: pd.DataFrame
             The ppreprocessed modified dataframe.
     """
-    data = data.drop(["geometry", "iso3", "port_name", "port_iso3"], axis=1)
-    data["id"] = data["id"].apply(lambda x: x[4:])
+    data = data.drop(DROPPED_COLUMNS, axis=1, errors="ignore")
+    data["id"] = parse_port_ids(data["id"])
 
     data = data[(data["downtime_q_weighted"] != 0) & (data["downtime_v_weighted"] != 0)]
     # print(data.describe())
-    data = data.loc[data["downtime_q_weighted"] < np.power(10, float(-4))]
+    data = data.loc[data["downtime_q_weighted"] < MAX_TARGET]
     corr_matrix = data.corr()
     plot_correlation_matrix(corr_matrix, name, save=True)
     return data
@@ -63,3 +66,164 @@ def make_validation_data(x_train, y_train) -> tuple:
         x_train, y_train, test_size=0.2, random_state=42
     )
     return x_train, x_val, y_train, y_val
+
+
+def parse_port_ids(ids: pd.Series) -> np.ndarray:
+    """
+    Parses port ids ("port1234") to their number, parsing each distinct id once.
+
+    Parameters:
+        ids: pd.Series
+            The port ids.
+
+    Return:
+        numbers: np.ndarray
+            The float32 port numbers.
+    """
+    codes, uniques = pd.factorize(ids)
+    numbers = pd.Index(uniques).astype(str).str[4:].astype(np.float32).to_numpy()
+    return numbers[codes]
+
+
+def correlation_matrix(
+    x: np.ndarray, y: np.ndarray, columns: list, block_size: int = 1 << 16
+) -> pd.DataFrame:
+    """
+    Computes the Pearson correlation matrix of the columns of x and y, accumulating the moments in
+    float64 over blocks of rows so that x is never copied whole.
+
+    Parameters:
+        x: np.ndarray
+            The (rows x features) data.
+        y: np.ndarray
+            The target of each row.
+        columns: list
+            The names of the features and target.
+        block_size: int default 65536
+            Number of rows per block.
+
+    Return:
+        corr_matrix: pd.DataFrame
+            The correlation matrix.
+    """
+    n_rows, n_features = x.shape
+    block = np.empty((min(block_size, n_rows), n_features + 1))
+    shift = np.append(x[0], y[0]) if n_rows else 0.0
+    sums = np.zeros(n_features + 1)
+    products = np.zeros((n_features + 1, n_features + 1))
+    for start in range(0, n_rows, block_size):
+        rows = slice(start, min(start + block_size, n_rows))
+        size = rows.stop - rows.start
+        block[:size, :n_features] = x[rows]
+        block[:size, n_features] = y[rows]
+        block[:size] -= shift
+        sums += block[:size].sum(axis=0)
+        products += block[:size].T @ block[:size]
+    means = sums / n_rows
+    covariance = products / n_rows - np.outer(means, means)
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = covariance / np.outer(std, std)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+class DesignMatrix:
+    """
+    Features and target of the learning models, stored as a single contiguous float32 feature
+    matrix and a float64 target. Rows are laid out with the training rows first, in the order of
+    get_data_model_ready, so that the train and test sets are views rather than copies.
+    """
+
+    def __init__(
+        self, x: np.ndarray, y: np.ndarray, columns: list, target: str, n_train: int
+    ) -> None:
+        self.x = x
+        self.y = y
+        self.columns = columns
+        self.target = target
+        self.n_train = n_train
+
+    def split(self) -> tuple:
+        """
+        Returns the training and testing sets as views.
+
+        Return:
+            X_train, X_test, y_train, y_test: tuple
+                The training/testing X and y arrays.
+        """
+        n = self.n_train
+        return self.x[:n], self.x[n:], self.y[:n], self.y[n:]
+
+
+def build_design_matrix(
+    frames: list,
+    name: str,
+    target: str = "downtime_q_weighted",
+    test_size: float = 0.33,
+    random_state: int = 42,
+    plot: bool = True,
+) -> DesignMatrix:
+    """
+    Builds the design matrix of ml_preprocessing and get_data_model_ready in one pass: the rows
+    of the input frames kept by the ml_preprocessing filters are written once into a float32
+    matrix, in the row order of the train/test split of get_data_model_ready.
+
+    Parameters:
+        frames: list
+            The risk dataframes to learn from, as concatenated by ml_preprocessing.
+        name: str
+            The name of the dataset.
+        target: str default "downtime_q_weighted"
+            The feature to predict.
+        test_size: float default 0.33
+            Share of the rows in the testing set.
+        random_state: int default 42
+            Seed of the split.
+        plot: bool default True
+            Boolean flag set to True to compute and save the correlation matrix.
+
+    Return:
+        design: DesignMatrix
+            The design matrix.
+    """
+    columns = [
+        col for col in frames[0].columns if col not in DROPPED_COLUMNS + [target]
+    ]
+    masks = [
+        (
+            (frame["downtime_q_weighted"] != 0)
+            & (frame["downtime_v_weighted"] != 0)
+            & (frame["downtime_q_weighted"] < MAX_TARGET)
+        ).to_numpy()
+        for frame in frames
+    ]
+    n_rows = sum(int(mask.sum()) for mask in masks)
+
+    # Position of each kept row in the matrix: training rows first, then testing rows.
+    train, test = next(
+        ShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state).split(
+            np.empty((n_rows, 0))
+        )
+    )
+    position = np.empty(n_rows, dtype=np.int64)
+    position[train] = np.arange(len(train))
+    position[test] = len(train) + np.arange(len(test))
+
+    x = np.empty((n_rows, len(columns)), dtype=np.float32)
+    y = np.empty(n_rows, dtype=np.float64)
+    offset = 0
+    for frame, mask in zip(frames, masks):
+        rows = position[offset : offset + int(mask.sum())]
+        offset += len(rows)
+        for j, col in enumerate(columns):
+            if col == "id":
+                x[rows, j] = parse_port_ids(frame["id"])[mask]
+            else:
+                x[rows, j] = frame[col].to_numpy()[mask]
+        y[rows] = frame[target].to_numpy()[mask]
+
+    if plot:
+        order = [col for col in frames[0].columns if col not in DROPPED_COLUMNS]
+        corr_matrix = correlation_matrix(x, y, columns + [target]).loc[order, order]
+        plot_correlation_matrix(corr_matrix, name, save=True)
+    return DesignMatrix(x, y, columns, target, len(train))
@@ -2,12 +2,368 @@
 Statistics data evaluation module.
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import scipy.stats as stats
 from port_risk.io.stats_plots import plot_qq_plot
+from port_risk.models.store import ModelStore
+
+
+def fit_norm(data: np.ndarray) -> tuple:
+    """
+    Maximum likelihood estimate of the normal distribution.
+    """
+    return data.mean(), data.std()
+
+
+def fit_expon(data: np.ndarray) -> tuple:
+    """
+    Maximum likelihood estimate of the exponential distribution.
+    """
+    loc = data.min()
+    return loc, data.mean() - loc
+
+
+def fit_lognorm(data: np.ndarray) -> tuple:
+    """
+    Maximum likelihood estimate of the log-normal distribution with loc fixed at 0, None when the
+    data is not strictly positive.
+    """
+    if data.min() <= 0:
+        return None
+    log_data = np.log(data)
+    return log_data.std(), 0.0, np.exp(log_data.mean())
+
+
+# Closed form estimators, used in place of the numerical optimisation of rv_continuous.fit.
+CLOSED_FORM_FITS = {"norm": fit_norm, "expon": fit_expon, "lognorm": fit_lognorm}
+
+
+def fit_and_test(data: np.ndarray, func: stats.rv_continuous) -> tuple:
+    """
+    Fits a distribution to the data and runs the Kolmogorov-Smirnov test of the fit.
+
+    Parameters:
+        data: np.ndarray
+            The data to fit.
+        func: stats.rv_continuous
+            The distribution to fit.
+
+    Return:
+        params, (statistic, pvalue): tuple
+            The fitted parameters and the result of the test.
+    """
+    params = None
+    if func.name in CLOSED_FORM_FITS:
+        params = CLOSED_FORM_FITS[func.name](data)
+    if params is None:
+        params = func.fit(data)
+    params = tuple(float(param) for param in params)
+    result = stats.ks_1samp(data, func(*params).cdf)
+    return params, (result.statistic, result.pvalue)
+
+
+def fit_distributions(
+    data: pd.Series,
+    tested_functions: dict,
+    processes: int = None,
+    store: ModelStore = None,
+) -> dict:
+    """
+    Fits the distributions to test to the data in parallel, and runs the Kolmogorov-Smirnov test
+    of each fit. Results are read from the store when the same distribution was fitted to the
+    same data.
+
+    Parameters:
+        data: pd.Series
+            The data for which we seek the best fitting distribution.
+        tested_functions: dict
+            A dictionnary containing the distributions to test and their name.
+        processes: int default None
+            Number of worker processes, defaults to the number of cores. Set to 1 to fit in the
+            current process.
+        store: ModelStore default None
+            The store of fit results, None to always fit.
+
+    Return:
+        fits: dict
+            A dictionnary mapping the name of each distribution to its fitted parameters and the
+            results of the test.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    return _cached_fits(
+        fit_and_test,
+        (data,),
+        tested_functions,
+        "fit_distribution",
+        {},
+        processes,
+        store,
+    )
+
+
+def _cached_fits(
+    worker,
+    arrays: tuple,
+    tested_functions: dict,
+    name: str,
+    params: dict,
+    processes: int,
+    store: ModelStore,
+) -> dict:
+    """
+    Runs worker(*arrays, func) for each distribution to test, on a process pool, reading and
+    writing the results in the store under keys hashing the arrays and params.
+    """
+    fits, keys = {}, {}
+    for dist_name, func in tested_functions.items():
+        if store is not None:
+            keys[dist_name] = store.key(
+                name,
+                arrays,
+                params={
+                    "distribution": func.name,
+                    "closed_form": func.name in CLOSED_FORM_FITS,
+                    **params,
+                },
+            )
+            fit = store.get(keys[dist_name])
+            if fit is not None:
+                fits[dist_name] = fit
+
+    missing = [dist_name for dist_name in tested_functions if dist_name not in fits]
+    funcs = [tested_functions[dist_name] for dist_name in missing]
+    processes = min(processes or os.cpu_count(), max(len(missing), 1))
+    if processes == 1:
+        results = [worker(*arrays, func) for func in funcs]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            columns = [[array] * len(funcs) for array in arrays]
+            results = list(pool.map(worker, *columns, funcs))
+    for dist_name, fit in zip(missing, results):
+        fits[dist_name] = fit
+        if store is not None:
+            store.put(keys[dist_name], fit)
+    return {dist_name: fits[dist_name] for dist_name in tested_functions}
+
+
+def stratified_subsample(
+    sorted_data: np.ndarray, size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draws one value at random in each of size strata of equal counts of the sorted data, so that
+    the subsample follows the quantiles of the data more closely than a uniform draw.
+
+    Parameters:
+        sorted_data: np.ndarray
+            The data, sorted in increasing order.
+        size: int
+            Size of the subsample.
+        rng: np.random.Generator
+            The random generator.
+
+    Return:
+        sample: np.ndarray
+            The subsample.
+    """
+    n = len(sorted_data)
+    if size >= n:
+        return sorted_data
+    positions = (np.arange(size) + rng.random(size)) * (n / size)
+    return sorted_data[np.minimum(positions.astype(np.int64), n - 1)]
+
+
+def quantile_sketch(sorted_data: np.ndarray, size: int) -> tuple:
+    """
+    Summarises the data by size + 1 order statistics at evenly spaced ranks, from the minimum to
+    the maximum.
+
+    Parameters:
+        sorted_data: np.ndarray
+            The data, sorted in increasing order.
+        size: int
+            Number of intervals of the sketch.
+
+    Return:
+        quantiles, ranks: tuple
+            The order statistics and their 0-based ranks in the data.
+    """
+    n = len(sorted_data)
+    ranks = np.unique(
+        np.linspace(0, n - 1, min(size, n - 1) + 1).round().astype(np.int64)
+    )
+    return sorted_data[ranks], ranks
+
+
+def sketch_ks_test(quantiles: np.ndarray, ranks: np.ndarray, n: int, cdf) -> tuple:
+    """
+    Kolmogorov-Smirnov test of the data summarised by a quantile sketch.
+
+    The statistic is evaluated at the order statistics of the sketch only, as ks_1samp would
+    evaluate it on the full data, which gives a lower bound of the exact statistic. Between two
+    consecutive order statistics both the empirical and the tested cdf are monotonous, so the
+    exact statistic is at most the largest gap between the tested cdf at one end of an interval
+    and the empirical cdf at the other end. The difference of the two is the error bound, of
+    order 1 / len(quantiles).
+
+    Parameters:
+        quantiles: np.ndarray
+            The order statistics of the sketch.
+        ranks: np.ndarray
+            Their 0-based ranks.
+        n: int
+            Size of the data.
+        cdf: Callable
+            The cdf of the tested distribution.
+
+    Return:
+        (statistic, pvalue), bound: tuple
+            The result of the test and the bound on the error of the statistic.
+    """
+    cdf_values = cdf(quantiles)
+    below = ranks / n  # At least the empirical cdf just below each order statistic.
+    above = (ranks + 1) / n  # At most the empirical cdf at each order statistic.
+    statistic = max(np.max(cdf_values - below), np.max(above - cdf_values))
+    upper = max(
+        statistic,
+        np.max(below[1:] - cdf_values[:-1], initial=0.0),
+        np.max(cdf_values[1:] - above[:-1], initial=0.0),
+    )
+    pvalue = stats.kstwo.sf(statistic, n)
+    return (float(statistic), float(pvalue)), float(upper - statistic)
+
+
+def fit_and_test_sketch(
+    sample: np.ndarray,
+    quantiles: np.ndarray,
+    ranks: np.ndarray,
+    n: int,
+    func: stats.rv_continuous,
+) -> tuple:
+    """
+    Fits a distribution to a subsample of the data and runs the Kolmogorov-Smirnov test of the fit
+    on a quantile sketch of the data.
+
+    Parameters:
+        sample: np.ndarray
+            The subsample to fit.
+        quantiles: np.ndarray
+            The order statistics of the sketch.
+        ranks: np.ndarray
+            Their 0-based ranks.
+        n: int
+            Size of the data.
+        func: stats.rv_continuous
+            The distribution to fit.
+
+    Return:
+        params, (statistic, pvalue), bound: tuple
+            The fitted parameters, the result of the test and the bound on the error of the
+            statistic.
+    """
+    params = None
+    if func.name in CLOSED_FORM_FITS:
+        params = CLOSED_FORM_FITS[func.name](sample)
+    if params is None:
+        params = func.fit(sample)
+    params = tuple(float(param) for param in params)
+    result, bound = sketch_ks_test(quantiles, ranks, int(n), func(*params).cdf)
+    return params, result, bound
+
+
+def approximate_fit_distributions(
+    data: pd.Series,
+    tested_functions: dict,
+    sample_size: int = 100_000,
+    sketch_size: int = 10_000,
+    seed: int = 0,
+    processes: int = None,
+    store: ModelStore = None,
+) -> tuple:
+    """
+    Approximate fit_distributions for very large data: the distributions are fitted to a
+    stratified subsample, and tested on a quantile sketch of the full data, so that the cost of
+    the fits and tests no longer grows with the size of the data.
+
+    Parameters:
+        data: pd.Series
+            The data for which we seek the best fitting distribution.
+        tested_functions: dict
+            A dictionnary containing the distributions to test and their name.
+        sample_size: int default 100_000
+            Size of the subsample the distributions are fitted to.
+        sketch_size: int default 10_000
+            Number of intervals of the quantile sketch, the error on the statistic is at most of
+            the order of 1 / sketch_size.
+        seed: int default 0
+            Seed of the subsample.
+        processes: int default None
+            Number of worker processes, defaults to the number of cores. Set to 1 to fit in the
+            current process.
+        store: ModelStore default None
+            The store of fit results, None to always fit.
+
+    Return:
+        fits, bounds: tuple
+            A dictionnary mapping the name of each distribution to its fitted parameters and the
+            results of the test, as returned by fit_distributions, and a dictionnary mapping the
+            name of each distribution to the bound on the error of the test statistic.
+    """
+    sorted_data = np.sort(np.asarray(data, dtype=np.float64))
+    sample = stratified_subsample(sorted_data, sample_size, np.random.default_rng(seed))
+    quantiles, ranks = quantile_sketch(sorted_data, sketch_size)
+    n = np.int64(len(sorted_data))
+    del sorted_data
+
+    results = _cached_fits(
+        fit_and_test_sketch,
+        (sample, quantiles, ranks, n),
+        tested_functions,
+        "approximate_fit_distribution",
+        {},
+        processes,
+        store,
+    )
+    fits = {name: (params, result) for name, (params, result, _) in results.items()}
+    bounds = {name: bound for name, (_, _, bound) in results.items()}
+    return fits, bounds
+
+
+def plot_qq_plots(
+    data: pd.Series, tested_functions: dict, fits: dict, f_name: str
+) -> None:
+    """
+    Plots and saves the Q-Q plot of the data against each fitted distribution.
+
+    Parameters:
+        data: pd.Series
+            The fitted data.
+        tested_functions: dict
+            A dictionnary containing the distributions tested and their name.
+        fits: dict
+            The fits returned by fit_distributions.
+        f_name: str
+            Name prefix of the plots.
+
+    Return:
+        None
+    """
+    for name, func in tested_functions.items():
+        params, _ = fits[name]
+        plot_qq_plot(data, f"{f_name}_{name}", func(*params), save=True)
 
 
-def compute_statistics(data: pd.Series, tested_functions: dict, f_name: str) -> dict:
+def compute_statistics(
+    data: pd.Series,
+    tested_functions: dict,
+    f_name: str,
+    plot: bool = True,
+    processes: int = None,
+    store: ModelStore = None,
+) -> dict:
     """
     Computes the statistical hypothesis Kolmogorov-Smirnow test for the given data and distributions
     to test and plots the corresponding Q-Q plot.
@@ -17,26 +373,74 @@ def compute_statistics(data: pd.Series, tested_functions: dict, f_name: str) ->
             The data for which we seek the best fitting distribution.
         tested_functions: dict
             A dictionnary containing the distributions to test and their name.
+        f_name: str
+            Name prefix of the Q-Q plots.
+        plot: bool default True
+            Boolean flag set to False to skip the Q-Q plots.
+        processes: int default None
+            Number of worker processes of the fits.
+        store: ModelStore default None
+            The store of fit results, None to always fit.
 
     Return:
         statistics: dict
             A dictionnary mapping the name of each distribution to the results of the test.
     """
-    statistics = {}
-    for name, func in tested_functions.items():
-        params = func.fit(data)
-        if len(params) == 2:
-            loc, scale = params
-            dist = func(loc=loc, scale=scale)
-            cdf = dist.cdf
-        elif len(params) == 3:
-            a, loc, scale = params
-            dist = func(a, loc=loc, scale=scale)
-            cdf = dist.cdf
-        else:
-            a, b, loc, scale = params
-            cdf = func(a, b, loc=loc, scale=scale).cdf
-        result = stats.ks_1samp(data, cdf)
-        statistics[name] = (result.statistic, result.pvalue)
-        plot_qq_plot(data, f"{f_name}_{name}", dist, save=True)
-    return statistics
+    fits = fit_distributions(data, tested_functions, processes, store)
+    if plot:
+        plot_qq_plots(data, tested_functions, fits, f_name)
+    return {name: result for name, (_, result) in fits.items()}
+
+
+def approximate_statistics(
+    data: pd.Series,
+    tested_functions: dict,
+    f_name: str,
+    plot: bool = True,
+    sample_size: int = 100_000,
+    sketch_size: int = 10_000,
+    seed: int = 0,
+    processes: int = None,
+    store: ModelStore = None,
+) -> tuple:
+    """
+    Approximate compute_statistics for very large data, see approximate_fit_distributions. The
+    Q-Q plots are drawn from the subsample.
+
+    Parameters:
+        data: pd.Series
+            The data for which we seek the best fitting distribution.
+        tested_functions: dict
+            A dictionnary containing the distributions to test and their name.
+        f_name: str
+            Name prefix of the Q-Q plots.
+        plot: bool default True
+            Boolean flag set to False to skip the Q-Q plots.
+        sample_size: int default 100_000
+            Size of the subsample the distributions are fitted to.
+        sketch_size: int default 10_000
+            Number of intervals of the quantile sketch.
+        seed: int default 0
+            Seed of the subsample.
+        processes: int default None
+            Number of worker processes of the fits.
+        store: ModelStore default None
+            The store of fit results, None to always fit.
+
+    Return:
+        statistics, bounds: tuple
+            A dictionnary mapping the name of each distribution to the results of the test, which
+            make_stats_table accepts, and a dictionnary mapping the name of each distribution to
+            the bound on the error of the test statistic.
+    """
+    fits, bounds = approximate_fit_distributions(
+        data, tested_functions, sample_size, sketch_size, seed, processes, store
+    )
+    if plot:
+        sample = stratified_subsample(
+            np.sort(np.asarray(data, dtype=np.float64)),
+            sample_size,
+            np.random.default_rng(seed),
+        )
+        plot_qq_plots(sample, tested_functions, fits, f_name)
+    return {name: result for name, (_, result) in fits.items()}, bounds
@@ -2,9 +2,19 @@
 Preprecesssing module to create a trade dataframe.
 """
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 
+from port_risk.io.codes import CodeBook
+from port_risk.io.data import NETWORK_FLOAT_DTYPE, apply_network_schema
+
+FLOW_COLUMNS = ["q_sea_flow", "v_sea_flow"]
+NETWORK_KEYS = ["iso3_O", "iso3_D", "id", "Industries", "sector", "flow"]
+# Port columns carried by the trade dataframes. The other port attributes (name, geometry) are
+# joined with join_port_attributes when needed.
+PORT_KEYS = ["id", "iso3"]
+
 
 def preprocess_trade(
     network: pd.DataFrame, ports: gpd.GeoDataFrame, iso3: str, industries: bool = False
@@ -36,22 +46,54 @@ def preprocess_trade(
 
     country_flows = (
         network.loc[network["flow"] == "port_import"]
-        .groupby(groupby_list)[["q_sea_flow", "v_sea_flow"]]
+        .groupby(groupby_list, observed=True)[FLOW_COLUMNS]
         .sum()
     )
+    country_flows_total = network.groupby(
+        [groupby_list[0]] + ["id"] + groupby_list[1:], observed=True
+    )[FLOW_COLUMNS].sum()
+
+    return merge_country_flows(
+        country_flows, country_flows_total, ports, iso3, groupby_list
+    )
+
+
+def merge_country_flows(
+    country_flows: pd.DataFrame,
+    country_flows_total: pd.DataFrame,
+    ports: gpd.GeoDataFrame,
+    iso3: str,
+    groupby_list: list[str],
+) -> pd.DataFrame:
+    """
+    Combines the aggregated flows of each (country, port) pair with the total imports of the
+    country and with the country of the port.
+
+    Parameters:
+        country_flows: pd.DataFrame
+            Flows of the port_import rows aggregated on groupby_list.
+        country_flows_total: pd.DataFrame
+            Flows aggregated on groupby_list and the port id.
+        ports: gpd.GeoDataFrame
+            The port location and information
+        iso3: str
+            Possible values are: {"iso3_O", iso3_D}.
+        groupby_list: list[str]
+            The country (and sector) keys of the aggregation.
+
+    Return:
+        country_flows_total: pd.DataFrame
+            A DataFrame object contaning the aggregated flows of trade associated to each country.
+    """
     country_flows = country_flows.rename(
         columns={"q_sea_flow": "q_sea_flow_total", "v_sea_flow": "v_sea_flow_total"}
     )
     country_flows = country_flows.reset_index()
-
-    country_flows_total = network.groupby(
-        [groupby_list[0]] + ["id"] + groupby_list[1:]
-    )[["q_sea_flow", "v_sea_flow"]].sum()
     country_flows_total = country_flows_total.reset_index()
 
     country_flows_total = country_flows_total.merge(country_flows, on=groupby_list)
 
-    country_flows_total = country_flows_total.merge(ports, on="id")
+    country_flows_total = country_flows_total.merge(ports[PORT_KEYS], on="id")
     country_flows_total = country_flows_total.rename(
         columns={iso3: "iso3", "iso3": "port_iso3"}
     )
@@ -59,28 +101,343 @@ def preprocess_trade(
     return country_flows_total
 
 
-def create_trade_dataframe(
+def _fold(partials: list[pd.DataFrame], n_keys: int) -> pd.DataFrame:
+    """
+    Folds partial sums indexed by the same keys into a single aggregate.
+
+    Parameters:
+        partials: list[pd.DataFrame]
+            Partial sums, each indexed by the n_keys aggregation keys.
+        n_keys: int
+            Number of index levels.
+
+    Return:
+        folded: pd.DataFrame
+            The summed aggregate, sorted on its keys.
+    """
+    return pd.concat(partials).groupby(level=list(range(n_keys)), observed=True).sum()
+
+
+def stream_preprocess_trade(
+    path: str,
+    industries_df: pd.DataFrame,
+    ports: gpd.GeoDataFrame,
+    iso3: str,
+    industries: bool = False,
+    chunksize: int = 1_000_000,
+    fold_every: int = 8,
+    codes: CodeBook = None,
+) -> pd.DataFrame:
+    """
+    Streaming version of preprocess_trade: reads the maritime network csv in chunks and folds
+    the partial flow sums of each chunk into running aggregates. Memory is bounded by the number
+    of groups and the chunk size rather than by the number of rows of the network. Each chunk
+    gets the schema of load_maritime_network (and the codes of load_coded_data when codes is
+    given), and the partial sums are accumulated in float64, so the output is the same as merging
+    the loaded network with the industries and calling preprocess_trade.
+
+    Parameters:
+        path: str
+            Path to the maritime trade network csv file.
+        industries_df: pd.DataFrame
+            The industries hot-encoding to sector name mapping.
+        ports: gpd.GeoDataFrame
+            The port location and information
+        iso3: str
+            Possible values are: {"iso3_O", iso3_D}. Specifies if process is conducted on improts or
+            exports.
+        industries: bool, default False
+            Boolean flag set to true if process should be done on each sector seperatly.
+        chunksize: int default 1_000_000
+            Number of csv rows read at a time.
+        fold_every: int default 8
+            Number of partial aggregates kept before they are folded together.
+        codes: CodeBook default None
+            The code book of the loaded data, None to leave the identifiers uncoded.
+
+    Return:
+        country_flows_total: pd.DataFrame
+            A DataFrame object contaning the aggregated flows of trade associated to each country.
+    """
+    groupby_list = [iso3]
+    if industries:
+        groupby_list += ["Industries", "sector"]
+    total_keys = [groupby_list[0]] + ["id"] + groupby_list[1:]
+
+    country_flows, country_flows_total = [], []
+    reader = pd.read_csv(
+        path,
+        usecols=[iso3, "id", "Industries", "flow"] + FLOW_COLUMNS,
+        chunksize=chunksize,
+    )
+    if codes is not None:
+        industries_df = codes.encode(industries_df)
+    for chunk in reader:
+        chunk = apply_network_schema(chunk)
+        if codes is not None:
+            chunk = codes.encode(chunk)
+        chunk = chunk.merge(industries_df, on="Industries")
+        chunk[FLOW_COLUMNS] = chunk[FLOW_COLUMNS].astype("float64")
+        country_flows.append(
+            chunk.loc[chunk["flow"] == "port_import"]
+            .groupby(groupby_list, observed=True)[FLOW_COLUMNS]
+            .sum()
+        )
+        country_flows_total.append(
+            chunk.groupby(total_keys, observed=True)[FLOW_COLUMNS].sum()
+        )
+
+        if len(country_flows_total) >= fold_every:
+            country_flows = [_fold(country_flows, len(groupby_list))]
+            country_flows_total = [_fold(country_flows_total, len(total_keys))]
+
+    return merge_country_flows(
+        _fold(country_flows, len(groupby_list)).astype(NETWORK_FLOAT_DTYPE),
+        _fold(country_flows_total, len(total_keys)).astype(NETWORK_FLOAT_DTYPE),
+        ports,
+        iso3,
+        groupby_list,
+    )
+
+
+def compact_codes(group: np.ndarray, n_groups: int) -> tuple[np.ndarray, int]:
+    """
+    Renumbers group codes so that only the observed groups are kept, preserving their order.
+
+    Parameters:
+        group: np.ndarray
+            Group code of each row, in [0, n_groups).
+        n_groups: int
+            Size of the code space.
+
+    Return:
+        group, n_groups: tuple[np.ndarray, int]
+            The renumbered codes and the number of observed groups.
+    """
+    if n_groups <= min(8 * len(group) + 1024, 2**24):
+        present = np.zeros(n_groups, dtype=bool)
+        present[group] = True
+        remap = np.cumsum(present) - 1
+        return remap[group], int(remap[-1]) + 1
+    uniques, group = np.unique(group, return_inverse=True)
+    return group, len(uniques)
+
+
+def group_codes(codes: list[np.ndarray], sizes: list[int]) -> tuple[np.ndarray, int]:
+    """
+    Combines the integer codes of several keys into a single group code. Groups are numbered in
+    the lexicographic order of the keys, as in a sorted groupby.
+
+    Parameters:
+        codes: list[np.ndarray]
+            Codes of each key, in [0, size).
+        sizes: list[int]
+            Number of distinct values of each key.
+
+    Return:
+        group, n_groups: tuple[np.ndarray, int]
+            The group of each row and the number of groups.
+    """
+    group = np.zeros(len(codes[0]), dtype=np.int64)
+    n_groups = 1
+    for code, size in zip(codes, sizes):
+        group = group * size + code
+        n_groups *= size
+        if n_groups > 2**31:
+            group, n_groups = compact_codes(group, n_groups)
+    return compact_codes(group, n_groups)
+
+
+def sum_groups(
+    flows: dict[str, np.ndarray], keys: list[str], sizes: dict[str, int]
+) -> dict[str, np.ndarray]:
+    """
+    Sums the flows of a coded aggregate over a subset of its keys.
+
+    Parameters:
+        flows: dict[str, np.ndarray]
+            Coded aggregate with one integer code array per key and the flow arrays.
+        keys: list[str]
+            The keys to group on.
+        sizes: dict[str, int]
+            Number of distinct codes of each key.
+
+    Return:
+        sums: dict[str, np.ndarray]
+            The codes of the keys and the float64 q_sea_flow and v_sea_flow sums of each group,
+            sorted on the codes.
+    """
+    group, n_groups = group_codes(
+        [flows[key] for key in keys], [sizes[key] for key in keys]
+    )
+
+    first = np.empty(n_groups, dtype=np.int64)
+    first[group[::-1]] = np.arange(len(group) - 1, -1, -1)
+    sums = {key: flows[key][first] for key in keys}
+    for col in FLOW_COLUMNS:
+        sums[col] = np.bincount(group, weights=flows[col], minlength=n_groups)
+    return sums
+
+
+def aggregate_network(
+    network: pd.DataFrame,
+) -> tuple[dict[str, np.ndarray], dict[str, pd.Index]]:
+    """
+    Aggregates the trade flows of the maritime network once at the finest grain used by the trade
+    dataframes: (origin, destination, port, industry, sector, flow type). Keys are integer coded so
+    that the aggregate can be cheaply rolled up on any subset of them with sum_groups.
+
+    Parameters:
+        network: pd.DataFrame
+            The maritime trade network merged with the industries.
+
+    Return:
+        flows, labels: tuple[dict[str, np.ndarray], dict[str, pd.Index]]
+            The coded aggregate with one code array per key and the flow sums, and the mapping of
+            each key to the values of its codes.
+    """
+    codes, labels = {}, {}
+    for key in NETWORK_KEYS:
+        codes[key], labels[key] = pd.factorize(network[key], sort=True)
+    valid = np.logical_and.reduce([code >= 0 for code in codes.values()])
+
+    flows = {key: code[valid] for key, code in codes.items()}
+    for col in FLOW_COLUMNS:
+        flows[col] = network[col].to_numpy()[valid]
+
+    sizes = {key: len(values) for key, values in labels.items()}
+    return sum_groups(flows, NETWORK_KEYS, sizes), labels
+
+
+def build_trade_frames(
     network: pd.DataFrame, ports: gpd.GeoDataFrame
 ) -> dict[str, pd.DataFrame]:
     """
-    Creates the trade dataframe by combining data from the maritime network and the ports risks.
+    Builds the four trade dataframes from a single aggregation of the network. The import/export
+    and sector/no sector variants are roll-ups of the finest grain aggregate computed on integer
+    codes, and the country totals and port countries are gathered by position instead of being
+    merged. Same output as calling preprocess_trade four times.
 
     Parameters:
         network: pd.DataFrame
-            The maritime trade network.
+            The maritime trade network merged with the industries.
         ports: gpd.GeoDataFrame
-            The ports and their associated downtime risk.
+            The port location and information, with unique ids.
 
-    Return:;
+    Return:
         trade: dict[str, pd.DataFrame]
             Dictionnary mapping trade type (import/export) to the associated trade dataframe.
     """
+    flows, labels = aggregate_network(network)
+    sizes = {key: len(values) for key, values in labels.items()}
+    import_code = labels["flow"].get_indexer(["port_import"])[0]
+    is_import = flows["flow"] == import_code
+    import_flows = {key: values[is_import] for key, values in flows.items()}
+
+    port_position = pd.Index(ports["id"]).get_indexer(labels["id"])
+    port_columns = pd.DataFrame(ports[PORT_KEYS].drop(columns="id")).rename(
+        columns={"iso3": "port_iso3"}
+    )
+
     trade = {}
+    for industries in (False, True):
+        for name, iso3 in (("export", "iso3_O"), ("import", "iso3_D")):
+            groupby_list = [iso3]
+            if industries:
+                groupby_list += ["Industries", "sector"]
+            total_keys = [groupby_list[0]] + ["id"] + groupby_list[1:]
+
+            country_flows = sum_groups(import_flows, groupby_list, sizes)
+            country_flows_total = sum_groups(flows, total_keys, sizes)
+            n_countries = len(country_flows[FLOW_COLUMNS[0]])
+
+            # Country groups of both aggregates in a shared code space, country_flows holds the
+            # first (sorted, unique) codes.
+            country_group, n_groups = group_codes(
+                [
+                    np.concatenate([country_flows[key], country_flows_total[key]])
+                    for key in groupby_list
+                ],
+                [sizes[key] for key in groupby_list],
+            )
+            country_position = np.full(n_groups, -1)
+            country_position[country_group[:n_countries]] = np.arange(n_countries)
+            country_position = country_position[country_group[n_countries:]]
+            row_port = port_position[country_flows_total["id"]]
+            keep = (country_position >= 0) & (row_port >= 0)
 
-    trade["export_trade"] = preprocess_trade(network, ports, "iso3_O", False)
-    trade["import_trade"] = preprocess_trade(network, ports, "iso3_D", False)
+            frame = pd.DataFrame(
+                {
+                    key: labels[key].take(country_flows_total[key][keep])
+                    for key in total_keys
+                }
+            )
+            for col in FLOW_COLUMNS:
+                values = country_flows_total[col][keep]
+                frame[col] = values.astype(network[col].dtype)
+            for col in FLOW_COLUMNS:
+                values = country_flows[col][country_position[keep]]
+                frame[f"{col}_total"] = values.astype(network[col].dtype)
+            frame = pd.concat(
+                [frame, port_columns.take(row_port[keep]).reset_index(drop=True)],
+                axis=1,
+            )
 
-    trade["export_trade_sector"] = preprocess_trade(network, ports, "iso3_O", True)
-    trade["import_trade_sector"] = preprocess_trade(network, ports, "iso3_D", True)
+            trade[f"{name}_trade{'_sector' if industries else ''}"] = frame.rename(
+                columns={iso3: "iso3"}
+            )
 
     return trade
+
+
+def join_port_attributes(
+    frame: pd.DataFrame,
+    ports: gpd.GeoDataFrame,
+    columns: tuple = ("port_name", "geometry"),
+) -> pd.DataFrame:
+    """
+    Joins port attributes to a trade or trade risk dataframe, which only carry the port id and
+    country. Meant for plotting or exporting, so that the attributes (and the geometry objects in
+    particular) are not carried through the risk computation.
+
+    Parameters:
+        frame: pd.DataFrame
+            A dataframe with an id column.
+        ports: gpd.GeoDataFrame
+            The port location and information.
+        columns: tuple default ("port_name", "geometry")
+            The port attributes to join.
+
+    Return:
+        frame: pd.DataFrame
+            A copy of frame with the port attributes, a GeoDataFrame when the geometry is joined.
+    """
+    attributes = ports.drop_duplicates("id").set_index("id")
+    position = attributes.index.get_indexer(frame["id"])
+    if (position < 0).any():
+        raise KeyError("Some port ids of the frame are not in the ports.")
+    frame = frame.copy()
+    for col in columns:
+        frame[col] = attributes[col].to_numpy()[position]
+    if "geometry" in columns:
+        return gpd.GeoDataFrame(frame, geometry="geometry", crs=ports.crs)
+    return frame
+
+
+def create_trade_dataframe(
+    network: pd.DataFrame, ports: gpd.GeoDataFrame
+) -> dict[str, pd.DataFrame]:
+    """
+    Creates the trade dataframe by combining data from the maritime network and the ports risks.
+
+    Parameters:
+        network: pd.DataFrame
+            The maritime trade network.
+        ports: gpd.GeoDataFrame
+            The ports and their associated downtime risk.
+
+    Return:;
+        trade: dict[str, pd.DataFrame]
+            Dictionnary mapping trade type (import/export) to the associated trade dataframe.
+    """
+    return build_trade_frames(network, ports)
@@ -0,0 +1,436 @@
+"""
+Server answering risk queries from memory: the data is loaded and the risks are computed once,
+then every query is a lookup in indexes built at startup.
+
+The server speaks a minimal HTTP/1.1 (GET only, keep-alive) over TCP or a Unix socket, and
+answers with JSON:
+
+    /hazards                                   available hazards, metrics and countries
+    /risk?iso3=FRA&hazard=TC&metric=value      country risk (every country when iso3 is omitted)
+    /sectors?iso3=FRA&hazard=TC&metric=value   sector breakdown of a country
+    /top_ports?iso3=FRA&hazard=TC&k=10         ports contributing most to the total risk
+    /stats                                     number of requests and latency percentiles
+
+hazard defaults to downtime_total (the downtime_ prefix is optional) and metric to value.
+"""
+
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from port_risk.io.codes import decode
+from port_risk.models.cube import RiskCube
+from port_risk.models.exposure import Exposure
+from port_risk.preprocessing.trade import join_port_attributes
+
+METRICS = {"value": "v", "quantity": "q"}
+PORT_COUNTS = ("n_ports_import", "n_ports_export")
+LATENCY_WINDOW = 10_000
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+def frame_records(frame: pd.DataFrame) -> list[dict]:
+    """
+    Converts a frame to JSON ready records, missing values becoming None.
+    """
+    frame = decode(frame)
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def sector_records(cube: RiskCube) -> dict[str, list[dict]]:
+    """
+    Converts a (country x sector x field) RiskCube to the sector records of each country, in the
+    order of the sectors.
+    """
+    frame = cube.to_frame()
+    frame = frame.astype({col: "int64" for col in PORT_COUNTS})
+    records = {}
+    for iso3, record in zip(
+        frame.index.get_level_values("country"),
+        frame_records(frame.reset_index(level="sector").reset_index(drop=True)),
+    ):
+        records.setdefault(iso3, []).append(record)
+    return records
+
+
+class RiskIndex:
+    """
+    In-memory indexes of the risks of create_risk_dataframe: the country risk record of each
+    (hazard, metric, country), the sector records of each (hazard, metric, country) read from the
+    RiskCube of the sector risks and the (countries x ports) contributions of each port to the
+    total risk of each country.
+    """
+
+    def __init__(
+        self,
+        risk: dict,
+        exposure: Exposure,
+        ports_risk: pd.DataFrame,
+        cube: RiskCube = None,
+    ) -> None:
+        self.hazards = list(risk)
+        self.countries = list(exposure.countries)
+        self.cube = cube if cube is not None else RiskCube.from_risk(risk)
+        self._rows = {iso3: i for i, iso3 in enumerate(exposure.countries)}
+        self._country_risks = {}
+        self._sector_risks = {}
+        self._contributions = {}
+        self._weights = {}
+
+        for hazard, risk_dict in risk.items():
+            for metric in METRICS:
+                frame = risk_dict[metric]
+                self._country_risks[(hazard, metric)] = dict(
+                    zip(frame["iso3"], frame_records(frame))
+                )
+                if hazard in self.cube.coords["hazard"]:
+                    self._sector_risks[(hazard, metric)] = sector_records(
+                        self.cube.sel(hazard=hazard, metric=metric)
+                    )
+
+        for metric, short in METRICS.items():
+            self._weights[metric] = exposure.total_weights(short)
+        for hazard in self.hazards:
+            downtime = exposure.downtime(ports_risk, hazard)
+            for metric in METRICS:
+                self._contributions[(hazard, metric)] = (
+                    self._weights[metric] @ sparse.diags(downtime)
+                ).tocsr()
+
+        ports = join_port_attributes(
+            pd.DataFrame({"id": exposure.ports}), ports_risk, ("port_name", "iso3")
+        )
+        self._port_ids = np.asarray(exposure.ports, dtype=object)
+        self._port_names = ports["port_name"].astype(object).to_numpy()
+        self._port_iso3 = ports["iso3"].astype(object).to_numpy()
+
+    def key(self, hazard: str = None, metric: str = None) -> tuple[str, str]:
+        """
+        Validates the hazard and metric of a query.
+
+        Raises:
+            ValueError: unknown hazard or metric.
+        """
+        hazard = hazard or "downtime_total"
+        if not hazard.startswith("downtime_"):
+            hazard = f"downtime_{hazard}"
+        metric = metric or "value"
+        if hazard not in self.hazards:
+            raise ValueError(
+                f"Unknown hazard {hazard}, expected one of {self.hazards}."
+            )
+        if metric not in METRICS:
+            raise ValueError(
+                f"Unknown metric {metric}, expected one of {list(METRICS)}."
+            )
+        return hazard, metric
+
+    def row(self, iso3: str) -> int:
+        """
+        Returns the row of a country in the exposure.
+
+        Raises:
+            KeyError: unknown country.
+        """
+        if iso3 not in self._rows:
+            raise KeyError(f"Unknown country {iso3}.")
+        return self._rows[iso3]
+
+    def risk(self, iso3: str = None, hazard: str = None, metric: str = None):
+        """
+        Returns the risk record of a country, or the records of every country when iso3 is None.
+        """
+        key = self.key(hazard, metric)
+        if iso3 is None:
+            return list(self._country_risks[key].values())
+        if iso3 not in self._country_risks[key]:
+            raise KeyError(f"Unknown country {iso3}.")
+        return self._country_risks[key][iso3]
+
+    def sectors(self, iso3: str, hazard: str = None, metric: str = None) -> list[dict]:
+        """
+        Returns the risk records of each sector of a country.
+        """
+        key = self.key(hazard, metric)
+        self.row(iso3)
+        return self._sector_risks.get(key, {}).get(iso3, [])
+
+    def top_ports(
+        self, iso3: str, hazard: str = None, metric: str = None, k: int = 10
+    ) -> list[dict]:
+        """
+        Returns the k ports contributing most to the total risk of a country: the exposure weight
+        of the country to the port times the downtime of the port. The contributions of all ports
+        sum to the total_risk of the country.
+
+        Raises:
+            ValueError: k is smaller than 1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}.")
+        key = self.key(hazard, metric)
+        i = self.row(iso3)
+        contributions = self._contributions[key]
+        start, end = contributions.indptr[i], contributions.indptr[i + 1]
+        values = contributions.data[start:end]
+        ports = contributions.indices[start:end]
+        top = np.argsort(-values, kind="stable")[:k]
+        weights = self._weights[key[1]]
+        weight_row = dict(
+            zip(
+                weights.indices[weights.indptr[i] : weights.indptr[i + 1]],
+                weights.data[weights.indptr[i] : weights.indptr[i + 1]],
+            )
+        )
+        total = values.sum()
+        return [
+            {
+                "id": self._port_ids[ports[j]],
+                "port_name": self._port_names[ports[j]],
+                "port_iso3": self._port_iso3[ports[j]],
+                "weight": float(weight_row[ports[j]]),
+                "contribution": float(values[j]),
+                "share": float(values[j] / total) if total else None,
+            }
+            for j in top
+        ]
+
+
+class RiskServer:
+    """
+    Asyncio HTTP server answering the queries of a RiskIndex, recording the latency of the last
+    LATENCY_WINDOW requests.
+    """
+
+    def __init__(self, index: RiskIndex) -> None:
+        self.index = index
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.n_requests = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the number of requests and the latency percentiles (ms) of the recent requests.
+        """
+        latencies = np.array(self.latencies) * 1e3
+        stats = {"requests": self.n_requests, "window": len(latencies)}
+        for name, q in (("p50_ms", 50), ("p99_ms", 99), ("max_ms", 100)):
+            stats[name] = float(np.percentile(latencies, q)) if len(latencies) else None
+        return stats
+
+    def dispatch(self, target: str) -> tuple[int, object]:
+        """
+        Answers the query of a request target, returning the status and the body.
+        """
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if url.path in ("/sectors", "/top_ports") and "iso3" not in params:
+                raise ValueError("Missing parameter iso3.")
+            if url.path == "/hazards":
+                body = {
+                    "hazards": self.index.hazards,
+                    "metrics": list(METRICS),
+                    "countries": self.index.countries,
+                }
+            elif url.path == "/risk":
+                body = self.index.risk(
+                    params.get("iso3"), params.get("hazard"), params.get("metric")
+                )
+            elif url.path == "/sectors":
+                body = self.index.sectors(
+                    params["iso3"], params.get("hazard"), params.get("metric")
+                )
+            elif url.path == "/top_ports":
+                body = self.index.top_ports(
+                    params["iso3"],
+                    params.get("hazard"),
+                    params.get("metric"),
+                    int(params.get("k", 10)),
+                )
+            elif url.path == "/stats":
+                body = self.stats()
+            else:
+                raise KeyError(f"Unknown endpoint {url.path}.")
+        except KeyError as e:
+            return 404, {"error": e.args[0]}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            # Answer instead of dropping the connection, and keep the trace in the server log.
+            traceback.print_exc()
+            return 500, {"error": f"Internal error: {type(e).__name__}."}
+        return 200, body
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serves the requests of a connection until the client closes it.
+        """
+        try:
+            while line := await reader.readline():
+                start = time.perf_counter()
+                close = False
+                while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection":
+                        close = value.strip().lower() == "close"
+                parts = line.decode("latin-1").split()
+                if len(parts) != 3:
+                    status, body, close = 400, {"error": "Malformed request."}, True
+                elif parts[0] != "GET":
+                    status, body = 405, {"error": "Only GET is supported."}
+                else:
+                    status, body = self.dispatch(parts[1])
+                payload = json.dumps(body).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {http.client.responses[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+                    ).encode()
+                    + payload
+                )
+                await writer.drain()
+                self.n_requests += 1
+                self.latencies.append(time.perf_counter() - start)
+                if close:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # The client closed the connection, or the server is stopping.
+            pass
+        finally:
+            writer.close()
+
+    async def start(
+        self, host: str = HOST, port: int = PORT, path: str = None
+    ) -> asyncio.AbstractServer:
+        """
+        Starts listening on host:port, or on the Unix socket path when given.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def run_server(
+    index: RiskIndex, host: str = HOST, port: int = PORT, path: str = None
+) -> None:
+    """
+    Serves the queries of an index until interrupted.
+
+    Parameters:
+        index: RiskIndex
+            The risk indexes.
+        host: str default "127.0.0.1"
+            The address to listen on.
+        port: int default 8765
+            The port to listen on.
+        path: str default None
+            Path of a Unix socket to listen on instead of host:port.
+
+    Return:
+        None
+    """
+
+    async def serve() -> None:
+        server = await RiskServer(index).start(host, port, path)
+        print(f"Serving risk queries on {path or f'http://{host}:{port}'}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+@contextmanager
+def running_server(index: RiskIndex, host: str = HOST, port: int = 0, path: str = None):
+    """
+    Runs a server in a background thread for the duration of the context, e.g. to query it from
+    the same process. Yields the (host, port) it listens on, or the socket path.
+    """
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(RiskServer(index).start(host, port, path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def stop() -> None:
+        server.close()
+        handlers = [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    try:
+        yield path or server.sockets[0].getsockname()[:2]
+    finally:
+        asyncio.run_coroutine_threadsafe(stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix socket.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class RiskClient:
+    """
+    Client of a risk server, keeping its connection open between queries.
+    """
+
+    def __init__(self, host: str = HOST, port: int = PORT, path: str = None) -> None:
+        if path is not None:
+            self.connection = UnixHTTPConnection(path)
+        else:
+            self.connection = http.client.HTTPConnection(host, port)
+
+    def get(self, endpoint: str, **params):
+        """
+        Queries an endpoint, e.g. client.get("risk", iso3="FRA", hazard="TC").
+
+        Raises:
+            KeyError: unknown endpoint, country or port.
+            ValueError: invalid query.
+            RuntimeError: the server failed to answer the query.
+        """
+        query = urlencode(
+            {name: value for name, value in params.items() if value is not None}
+        )
+        self.connection.request("GET", f"/{endpoint}?{query}")
+        response = self.connection.getresponse()
+        body = json.loads(response.read())
+        if response.status == 404:
+            raise KeyError(body["error"])
+        if response.status >= 500:
+            raise RuntimeError(body["error"])
+        if response.status != 200:
+            raise ValueError(body["error"])
+        return body
+
+    def close(self) -> None:
+        self.connection.close()
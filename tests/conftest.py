@@ -0,0 +1,79 @@
+"""
+Shared fixtures: a small synthetic data set with the schema of the loaded data, raw and coded as
+load_coded_data codes the loaded data, and the trade and risk dataframes computed from it as main
+computes them.
+"""
+
+import pytest
+
+from port_risk.io.codes import CodeBook
+from port_risk.io.synthetic import make_scaled_data
+from port_risk.models.exposure import build_exposure
+from port_risk.models.risk import create_risk_dataframe
+from port_risk.preprocessing.merge import merge_network_industries, merge_ports_risk
+from port_risk.preprocessing.trade import create_trade_dataframe
+
+SCALE = 0.05
+
+
+@pytest.fixture(scope="session")
+def synthetic():
+    """
+    Synthetic network, ports, industries and climate risks, as loaded before coding.
+    """
+    return make_scaled_data(SCALE)
+
+
+@pytest.fixture(scope="session")
+def codes(synthetic):
+    return CodeBook.from_frames(*synthetic)
+
+
+@pytest.fixture(scope="session")
+def raw_data(synthetic):
+    """
+    Network merged with the industries, ports and port risks, before coding.
+    """
+    network, ports, industries, risks = synthetic
+    network = merge_network_industries(network, industries)
+    return network, ports, merge_ports_risk(risks, ports)
+
+
+@pytest.fixture(scope="session")
+def coded_data(synthetic, codes):
+    """
+    The same data with the identifiers coded by a shared CodeBook.
+    """
+    network, ports, industries, risks = (codes.encode(df) for df in synthetic)
+    network = merge_network_industries(network, industries)
+    return network, ports, merge_ports_risk(risks, ports)
+
+
+@pytest.fixture(scope="session")
+def hazards(raw_data):
+    _, _, ports_risk = raw_data
+    return [col for col in ports_risk.columns if col.startswith("downtime_")]
+
+
+@pytest.fixture(scope="session")
+def trade(raw_data):
+    network, ports, _ = raw_data
+    return create_trade_dataframe(network, ports)
+
+
+@pytest.fixture(scope="session")
+def risk(trade, raw_data, hazards):
+    _, _, ports_risk = raw_data
+    return create_risk_dataframe(trade, ports_risk, hazards)
+
+
+@pytest.fixture(scope="session")
+def exposure(trade, raw_data):
+    _, _, ports_risk = raw_data
+    return build_exposure(trade, ports_risk)
+
+
+@pytest.fixture(scope="session")
+def coded_trade(coded_data):
+    network, ports, _ = coded_data
+    return create_trade_dataframe(network, ports)
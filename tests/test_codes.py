@@ -0,0 +1,31 @@
+"""
+The shared code book of the identifiers.
+"""
+
+import pandas as pd
+import pytest
+
+from port_risk.io.codes import COLUMN_DOMAINS, decode
+
+
+def test_encode(synthetic, codes, coded_data):
+    network, ports, _ = coded_data
+    # Every column of a domain shares the categories of the domain.
+    for col in ("iso3_O", "iso3_D"):
+        assert network[col].dtype == ports["iso3"].dtype == codes.dtype("port_iso3")
+    assert network["id"].dtype == ports["id"].dtype == codes.dtype("id")
+    assert list(codes.dtype("sector").categories) == sorted(synthetic[2]["sector"])
+    with pytest.raises(KeyError):
+        codes.dtype("q_sea_flow")
+
+
+@pytest.mark.parametrize("position", range(4))
+def test_decode(synthetic, codes, position):
+    frame = synthetic[position]
+    decoded = decode(codes.encode(frame))
+    for col in frame.columns:
+        expected = frame[col]
+        # Identifiers decode to the dtype of their labels, other columns are left as they are.
+        if col in COLUMN_DOMAINS and isinstance(expected.dtype, pd.CategoricalDtype):
+            expected = pd.Series(expected.to_numpy(), name=col)
+        pd.testing.assert_series_equal(decoded[col], expected, check_index=False)
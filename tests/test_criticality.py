@@ -0,0 +1,36 @@
+"""
+The port criticality ranking against evaluating each port offline on its own.
+"""
+
+import numpy as np
+import pytest
+
+from port_risk.models.criticality import port_criticality
+
+
+@pytest.mark.parametrize("quantity", [False, True])
+def test_port_criticality(exposure, raw_data, quantity):
+    _, _, ports_risk = raw_data
+    ranking, breakdown = port_criticality(exposure, ports_risk, quantity, offline=100.0)
+    assert ranking["rank"].tolist() == list(range(1, len(exposure.ports) + 1))
+    assert ranking["impact"].is_monotonic_decreasing
+
+    baseline = exposure.downtime(ports_risk, "downtime_total")
+    before = exposure.evaluate(baseline, quantity)["total_risk"]
+    for row in ranking.iloc[[0, 1, 2, len(ranking) // 2, -1]].itertuples():
+        downtime = baseline.copy()
+        downtime[exposure.ports.get_loc(row.id)] = 100.0
+        increase = exposure.evaluate(downtime, quantity)["total_risk"] - before
+        increase = np.nan_to_num(increase)
+        affected = np.flatnonzero(~np.isclose(increase, 0.0, rtol=0, atol=1e-12))
+
+        assert row.downtime == pytest.approx(baseline[exposure.ports.get_loc(row.id)])
+        assert row.impact == pytest.approx(increase.sum())
+        assert row.n_countries == len(affected)
+        if len(affected):
+            assert row.top_country == exposure.countries[np.argmax(increase)]
+        port = breakdown.loc[breakdown["id"] == row.id]
+        assert set(port["iso3"]) == set(exposure.countries[affected])
+        np.testing.assert_allclose(
+            port["impact"], increase[exposure.countries.get_indexer(port["iso3"])]
+        )
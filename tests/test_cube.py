@@ -0,0 +1,69 @@
+"""
+The risk cube against the sector and country risks of merge_risk.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from port_risk import data_path
+from port_risk.models.cube import RiskCube, load_risk_cube
+
+
+@pytest.fixture(scope="module")
+def cube(risk):
+    return RiskCube.from_risk(risk)
+
+
+def test_cube_cells(cube, risk):
+    frame = risk["downtime_total"]["value_sector"].iloc[0]
+    assert cube.get(
+        country=frame["iso3"],
+        sector=frame["sector"],
+        hazard="downtime_total",
+        metric="value",
+        field="total_risk",
+    ) == pytest.approx(frame["total_risk"])
+
+
+@pytest.mark.parametrize("metric", ["value", "quantity"])
+def test_cube_rollup(cube, risk, hazards, metric):
+    rolled = cube.rollup("sector")
+    fields = ["imports", "exports", "total_import_risk", "total_export_risk"]
+    for hazard in hazards:
+        result = rolled.sel(hazard=hazard, metric=metric).to_frame()
+        expected = risk[hazard][metric].astype({"iso3": str}).set_index("iso3")
+        pd.testing.assert_frame_equal(
+            result[fields],
+            expected.loc[result.index, fields],
+            check_dtype=False,
+            check_names=False,
+            rtol=1e-5,
+        )
+
+
+def test_cube_save_load(tmp_path, cube):
+    cube.save(tmp_path / "cube.npz")
+    loaded = RiskCube.load(tmp_path / "cube.npz")
+    assert loaded.dims == cube.dims
+    np.testing.assert_array_equal(loaded.values, cube.values)
+
+
+def test_load_risk_cube(monkeypatch, tmp_path, risk, cube):
+    monkeypatch.setitem(data_path, "cache", f"{tmp_path}/")
+
+    load_risk_cube(risk, cache=False)
+    assert not list(tmp_path.iterdir())
+
+    built = load_risk_cube(risk)
+    (path,) = tmp_path.glob("risk_cube_*.npz")
+    loaded = load_risk_cube(risk)
+    for result in (built, loaded):
+        assert result.dims == cube.dims
+        np.testing.assert_array_equal(result.values, cube.values)
+
+    # Other risks miss the cache and replace the stale file.
+    changed = {hazard: risk[hazard] for hazard in list(risk)[1:]}
+    load_risk_cube(changed)
+    assert [file.name for file in tmp_path.iterdir()] != [path.name]
+    assert len(list(tmp_path.glob("risk_cube_*.npz"))) == 1
@@ -0,0 +1,33 @@
+"""
+The parquet cache of the maritime trade network against parsing the csv file.
+"""
+
+import pandas as pd
+
+from port_risk import data_path
+from port_risk.io.data import load_maritime_network
+
+
+def test_load_maritime_network(monkeypatch, tmp_path, synthetic):
+    network = synthetic[0]
+    path = tmp_path / "network.csv"
+    network.to_csv(path, index=False)
+    cache = tmp_path / "cache"
+    monkeypatch.setitem(data_path, "network", str(path))
+    monkeypatch.setitem(data_path, "cache", f"{cache}/")
+
+    parsed = load_maritime_network(cache=False)
+    assert not cache.exists()
+    pd.testing.assert_frame_equal(parsed, network, check_categorical=False)
+
+    built = load_maritime_network()
+    (cache_path,) = cache.glob("network_*.parquet")
+    loaded = load_maritime_network()
+    pd.testing.assert_frame_equal(built, parsed)
+    pd.testing.assert_frame_equal(loaded, parsed)
+
+    # A new version of the csv file misses the cache and replaces the stale file.
+    network.iloc[1:].to_csv(path, index=False)
+    assert len(load_maritime_network()) == len(network) - 1
+    assert [file.name for file in cache.iterdir()] != [cache_path.name]
+    assert len(list(cache.glob("network_*.parquet"))) == 1
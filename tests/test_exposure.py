@@ -0,0 +1,64 @@
+"""
+The country risks of the sparse exposure weights against merge_risk.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from port_risk import data_path
+from port_risk.io.codes import decode
+from port_risk.models.exposure import Exposure, load_exposure
+
+
+@pytest.mark.parametrize("metric", ["value", "quantity"])
+def test_country_risk(exposure, raw_data, risk, hazards, metric):
+    _, _, ports_risk = raw_data
+    for hazard in hazards:
+        downtime = exposure.downtime(ports_risk, hazard)
+        result = exposure.country_risk(downtime, quantity=metric == "quantity")
+        expected = decode(risk[hazard][metric]).set_index("iso3").sort_index()
+        pd.testing.assert_frame_equal(
+            result.set_index("iso3"), expected, check_dtype=False
+        )
+
+
+def test_evaluate_batch(exposure, raw_data, hazards):
+    _, _, ports_risk = raw_data
+    downtimes = np.column_stack(
+        [exposure.downtime(ports_risk, hazard) for hazard in hazards]
+    )
+    batch = exposure.evaluate(downtimes)
+    for i, column in enumerate(downtimes.T):
+        for name, values in exposure.evaluate(column).items():
+            np.testing.assert_allclose(batch[name][:, i], values)
+
+
+def test_exposure_save_load(tmp_path, exposure):
+    exposure.save(tmp_path / "exposure.npz")
+    loaded = Exposure.load(tmp_path / "exposure.npz")
+    assert loaded.countries.equals(exposure.countries)
+    assert loaded.ports.equals(exposure.ports)
+    for key, weights in exposure.weights.items():
+        assert (loaded.weights[key] != weights).nnz == 0
+
+
+def test_load_exposure(monkeypatch, tmp_path, trade, raw_data, exposure):
+    _, _, ports_risk = raw_data
+    monkeypatch.setitem(data_path, "cache", f"{tmp_path}/")
+
+    load_exposure(trade, ports_risk, cache=False)
+    assert not list(tmp_path.iterdir())
+
+    built = load_exposure(trade, ports_risk)
+    (path,) = tmp_path.glob("exposure_*.npz")
+    loaded = load_exposure(trade, ports_risk)
+    for key, weights in exposure.weights.items():
+        assert (built.weights[key] != weights).nnz == 0
+        assert (loaded.weights[key] != weights).nnz == 0
+
+    # Other trade flows miss the cache and replace the stale file.
+    changed = dict(trade, import_trade=trade["import_trade"].iloc[1:])
+    load_exposure(changed, ports_risk)
+    assert [file.name for file in tmp_path.iterdir()] != [path.name]
+    assert len(list(tmp_path.glob("exposure_*.npz"))) == 1
@@ -0,0 +1,53 @@
+"""
+The design matrix of build_design_matrix against ml_preprocessing + get_data_model_ready.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import port_risk.preprocessing.machine_learning as machine_learning
+from port_risk.models.risk import create_risk_dataframe
+from port_risk.preprocessing.machine_learning import (
+    build_design_matrix,
+    get_data_model_ready,
+    ml_preprocessing,
+)
+
+
+@pytest.fixture(scope="module")
+def frames(trade, raw_data):
+    """
+    The import and export risk frames, with the downtimes scaled down so that the weighted
+    downtimes pass the MAX_TARGET filter, as those of the loaded data do.
+    """
+    _, _, ports_risk = raw_data
+    ports_risk = ports_risk.assign(downtime_total=ports_risk["downtime_total"] * 1e-5)
+    risk = create_risk_dataframe(trade, ports_risk, ["downtime_total"])
+    return [risk["downtime_total"]["import"], risk["downtime_total"]["export"]]
+
+
+def test_build_design_matrix(frames, monkeypatch):
+    plotted = []
+    monkeypatch.setattr(
+        machine_learning,
+        "plot_correlation_matrix",
+        lambda corr_matrix, name, save: plotted.append(corr_matrix),
+    )
+    data = ml_preprocessing(pd.concat(frames, axis=0), "trade")
+    expected = get_data_model_ready(data, "downtime_q_weighted")
+    design = build_design_matrix(frames, "trade")
+    result = design.split()
+
+    assert 0 < len(result[0]) < len(data)
+    assert design.x.dtype == np.float32 and design.x.flags["C_CONTIGUOUS"]
+    for expected_set, result_set in zip(expected, result):
+        np.testing.assert_array_equal(
+            np.asarray(expected_set, dtype=result_set.dtype), result_set
+        )
+    # Training and testing sets are views of the single matrix.
+    assert all(np.shares_memory(design.x, x) for x in result[:2])
+
+    legacy_corr, corr = plotted
+    pd.testing.assert_index_equal(corr.columns, legacy_corr.columns)
+    np.testing.assert_allclose(corr, legacy_corr, rtol=1e-4, atol=1e-6)
@@ -0,0 +1,75 @@
+"""
+The stages of the main pipeline run on synthetic data.
+"""
+
+import types
+
+import pytest
+
+import port_risk.io.plots as plots
+import port_risk.io.validation_plots as validation_plots
+import port_risk.main as main
+from port_risk import data_path
+from port_risk.io.codes import CodeBook
+from port_risk.io.profiling import StageProfiler
+from port_risk.io.synthetic import make_scaled_data
+
+# Smaller than the shared fixtures, the validation stage fits hundreds of models.
+SCALE = 0.02
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """
+    Makes run_stages load coded synthetic data and write its outputs to tmp_path. The downtimes
+    are scaled down so that the weighted downtimes pass the MAX_TARGET filter of the design
+    matrix, as those of the loaded data do.
+    """
+    synthetic = make_scaled_data(SCALE)
+    codes = CodeBook.from_frames(*synthetic)
+    network, ports, industries, risks = (codes.encode(df) for df in synthetic)
+    risks = risks.assign(risk=risks["risk"] * 1e-5)
+    monkeypatch.setattr(
+        main,
+        "load_coded_data",
+        lambda cache=True: (risks, ports, industries, network, codes),
+    )
+    monkeypatch.setattr(main, "load_world", lambda: None)
+    monkeypatch.setattr(main, "load_countries", lambda: None)
+    monkeypatch.setattr(plots, "plot_downtime_risks", lambda *args, **kwargs: [])
+    for name in ("cache", "plots", "latex"):
+        folder = tmp_path / name
+        folder.mkdir()
+        monkeypatch.setitem(data_path, name, f"{folder}/")
+    return tmp_path
+
+
+def run_args(**flags) -> types.SimpleNamespace:
+    """
+    Returns the parsed arguments of a run, all flags off unless given.
+    """
+    args = {"validation": False, "stats": False, "models": False, "no_cache": True}
+    args.update(flags)
+    return types.SimpleNamespace(**args)
+
+
+def test_validation_stage(pipeline, monkeypatch):
+    results = {}
+    monkeypatch.setattr(
+        validation_plots,
+        "make_depth_plots",
+        lambda depths, save: results.update(depths=depths),
+    )
+    monkeypatch.setattr(
+        validation_plots,
+        "make_oob_error_plots",
+        lambda errors, save: results.update(errors=errors),
+    )
+    main.run_stages(run_args(validation=True), StageProfiler(enabled=False))
+
+    models = {"extra_trees", "random_forest", "gradient_boost", "hist_gradient_boost"}
+    assert set(results["depths"]) == models
+    assert set(results["errors"]) == models
+    for name in models:
+        (depth, _), _ = results["depths"][name]["mse"]
+        assert 1 <= depth < 26
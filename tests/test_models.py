@@ -0,0 +1,110 @@
+"""
+The validation sweeps of the tree models against refitting each configuration.
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from port_risk.models.models import (
+    GradientBoost,
+    HistGradientBoost,
+    Model,
+    forest_oob_errors,
+    models,
+    optimal_depth_trees,
+    staged_boosting_curves,
+)
+
+
+class SeededTree(Model):
+    """
+    Decision tree with a fixed seed, so that refitting it gives the same metrics.
+    """
+
+    def __init__(self, x_train, y_train, x_test, y_test, name, depth=None) -> None:
+        super().__init__(x_train, y_train, x_test, y_test, name)
+        self.model = DecisionTreeRegressor(max_depth=depth, random_state=0)
+
+
+@pytest.fixture(scope="module")
+def regression():
+    """
+    A small noisy regression problem.
+    """
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(300, 5)).astype(np.float32)
+    y = x[:, 0] ** 2 + np.sin(3 * x[:, 1]) + rng.normal(scale=0.1, size=300)
+    return x, y
+
+
+def test_forest_oob_errors(regression):
+    x, y = regression
+    sizes = [18, 25, 40]
+    forest = RandomForestRegressor(n_estimators=40, bootstrap=True, random_state=0)
+    errors = forest_oob_errors(forest.fit(x, y), x, y, sizes)
+    for n_trees, error in zip(sizes, errors):
+        refit = RandomForestRegressor(
+            n_estimators=n_trees, bootstrap=True, oob_score=True, random_state=0
+        ).fit(x, y)
+        assert error == pytest.approx(1 - refit.oob_score_)
+
+
+def test_optimal_depth_trees(regression):
+    x, y = regression
+    x_train, x_test, y_train, y_test = x[:200], x[200:], y[:200], y[200:]
+    optimal_depths = optimal_depth_trees(
+        x_train, x_test, y_train, y_test, {"tree": SeededTree}, 8, n_jobs=2
+    )
+
+    serial = {}
+    for depth in range(1, 8):
+        tree = SeededTree(x_train, y_train, x_test, y_test, "tree", depth)
+        tree.run_model()
+        serial[depth] = tree.metrics
+    for metric, ((depth, value), (depths, values)) in optimal_depths["tree"].items():
+        assert depths == list(serial)
+        assert values == [serial[depth][metric] for depth in depths]
+        assert value == serial[depth][metric]
+
+
+@pytest.mark.parametrize(
+    "name, model",
+    [("gradient_boost", GradientBoost), ("hist_gradient_boost", HistGradientBoost)],
+)
+def test_staged_boosting_curves(regression, name, model):
+    x, y = regression
+    x_train, x_test, y_train, y_test = x[:200], x[200:], y[:200], y[200:]
+    optimal_depths, ((sizes, errors), _) = staged_boosting_curves(
+        x_train, x_test, y_train, y_test, model, name, 4, 21
+    )
+
+    # The curve is the one of the optimal depth, its last point is the fully fitted model.
+    (depth, _), _ = optimal_depths["mse"]
+    boost_model = model(x_train, y_train, x_test, y_test, name, depth, n_estimators=20)
+    boost_model.fit()
+    y_pred = boost_model.model.predict(x_test)
+    staged = list(boost_model.model.staged_predict(x_test))
+    np.testing.assert_allclose(staged[-1], y_pred)
+    assert len(errors) == len(staged) == len(sizes)
+    assert errors[-1] == pytest.approx(1 - r2_score(y_test, y_pred))
+
+
+def test_hist_gradient_boost(regression):
+    x, y = regression
+    x_train, x_test, y_train, y_test = x[:200], x[200:], y[:200], y[200:]
+    assert models["hist_gradient_boost"] is HistGradientBoost
+
+    # Early stopping draws its validation split from the fixed seed, so refits are identical.
+    fits = []
+    for _ in range(2):
+        model = HistGradientBoost(x_train, y_train, x_test, y_test, "hist", depth=3)
+        model.run_model()
+        fits.append(model)
+    assert fits[0].model.max_depth == 3
+    assert fits[0].model.n_iter_ < 500
+    assert fits[0].model.n_iter_ == fits[1].model.n_iter_
+    np.testing.assert_array_equal(fits[0].y_pred, fits[1].y_pred)
+    assert fits[0].metrics == fits[1].metrics
@@ -0,0 +1,97 @@
+"""
+The risk maps drawn on a reused base map against the values of the risk frames.
+"""
+
+import geopandas as gpd
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+import port_risk.io.plots as plots
+from port_risk import data_path
+from port_risk.io.plots import RISK_COLUMNS, RiskMap, plot_downtime_risks
+
+
+@pytest.fixture
+def folders(monkeypatch, tmp_path):
+    for name in ("cache", "plots"):
+        folder = tmp_path / name
+        folder.mkdir()
+        monkeypatch.setitem(data_path, name, f"{folder}/")
+    monkeypatch.setattr(plots, "_simplified", {})
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def countries():
+    """
+    Three countries, the second one made of two islands.
+    """
+    islands = shapely.MultiPolygon(
+        [shapely.box(20, 0, 30, 10), shapely.box(40, 0, 50, 10)]
+    )
+    circle = shapely.Point(-60, 30).buffer(10, quad_segs=64)
+    geometry = [shapely.box(-20, -20, 0, 0), islands, circle]
+    return gpd.GeoDataFrame({"iso3": ["AAA", "AAB", "AAC"]}, geometry=geometry)
+
+
+@pytest.fixture(scope="module")
+def world(countries):
+    return gpd.GeoDataFrame(geometry=[countries.union_all().envelope])
+
+
+def risk_frame(seed: int) -> pd.DataFrame:
+    values = np.random.default_rng(seed).uniform(0, 6, size=(2, len(RISK_COLUMNS)))
+    return pd.DataFrame(values, columns=RISK_COLUMNS).assign(iso3=["AAC", "AAA"])
+
+
+def test_simplify_geometries(folders, countries, monkeypatch):
+    simplified = plots.simplify_geometries(countries)
+    assert simplified["iso3"].equals(countries["iso3"])
+    assert simplified.geometry.equals(countries.geometry.simplify(0.05))
+    (path,) = (folders / "cache").glob("geometry_*.parquet")
+
+    # The geometries are read from memory, then from the parquet cache.
+    monkeypatch.setattr(gpd.GeoSeries, "simplify", None)
+    assert plots.simplify_geometries(countries).geometry.equals(simplified.geometry)
+    monkeypatch.setattr(plots, "_simplified", {})
+    assert plots.simplify_geometries(countries).geometry.equals(simplified.geometry)
+
+
+def test_draw(folders, world, countries):
+    risk_map = RiskMap(world, countries)
+    _, index = plots.polygon_collection(countries)
+    assert index.tolist() == [0, 1, 1, 2]
+
+    for seed in range(2):
+        risk_df = risk_frame(seed)
+        path = risk_map.draw(risk_df, f"map{seed}", "downtime_TC", save=True)
+        assert path == folders / "plots" / f"risk_map{seed}_downtime_TC"
+        assert path.with_suffix(".png").exists()
+        # AAB is missing from the frame and left blank.
+        expected = risk_df.set_index("iso3").reindex(["AAA", "AAB", "AAB", "AAC"])
+        for layer, column in zip(risk_map.layers, RISK_COLUMNS):
+            values = layer.get_array()
+            assert values.mask.tolist() == [False, True, True, False]
+            np.testing.assert_allclose(values.compressed(), expected[column].dropna())
+    risk_map.close()
+
+
+def test_plot_downtime_risks(folders, world, countries):
+    jobs = [(risk_frame(seed), f"map{seed}", "downtime_TC") for seed in range(3)]
+    serial = plot_downtime_risks(world, countries, jobs, processes=1)
+    images = [plt.imread(path.with_suffix(".png")) for path in serial]
+    parallel = plot_downtime_risks(world, countries, jobs, processes=2)
+    assert parallel == serial
+    for path, image in zip(parallel, images):
+        np.testing.assert_array_equal(plt.imread(path.with_suffix(".png")), image)
+
+    # Every figure is drawn on the same base map as a single plot_downtime_risk.
+    plots.plot_downtime_risk(world, countries, *jobs[0], save=True)
+    np.testing.assert_array_equal(plt.imread(serial[0].with_suffix(".png")), images[0])
@@ -0,0 +1,47 @@
+"""
+The stage records and run report of the profiler.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from port_risk.io.profiling import StageProfiler
+
+
+def test_stage_profiler(tmp_path):
+    profiler = StageProfiler(cprofile=True, folder=tmp_path)
+    with profiler.stage("load"):
+        frame = pd.DataFrame({"a": np.arange(10)})
+    profiler.outputs(frame=frame, nested={"array": np.zeros((3, 2))})
+    with pytest.raises(ValueError):
+        with profiler.stage("fail"):
+            raise ValueError("bad input")
+
+    load, fail = profiler.stages
+    assert [output["name"] for output in load["outputs"]] == ["frame", "nested/array"]
+    assert (load["outputs"][1]["rows"], load["outputs"][1]["columns"]) == (3, 2)
+    assert load["wall_s"] >= 0 and "error" not in load
+    assert fail["error"] == "ValueError: bad input"
+
+    folder = profiler.save()
+    with open(folder / "report.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert [stage["stage"] for stage in report["stages"]] == ["load", "fail"]
+    assert len(pd.read_csv(folder / "report.csv")) == 3
+    assert sorted(path.name for path in folder.glob("*.prof")) == [
+        "00_load.prof",
+        "01_fail.prof",
+    ]
+
+
+def test_disabled_profiler(tmp_path):
+    profiler = StageProfiler(enabled=False, folder=tmp_path / "run")
+    with profiler.stage("load"):
+        pass
+    profiler.outputs(frame=pd.DataFrame())
+    assert profiler.stages == []
+    profiler.save()
+    assert not (tmp_path / "run").exists()
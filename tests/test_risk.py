@@ -0,0 +1,198 @@
+"""
+The trade and global risks of compute_hazards_trade_risk and merge_hazards_risk against the per
+hazard computations they replace.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from port_risk.io.codes import decode
+from port_risk.models.risk import create_risk_dataframe, merge_risk
+
+DIRECTIONS = ("import", "export")
+
+
+def legacy_compute_trade_risk(
+    trade: pd.DataFrame, risk: pd.DataFrame, hazard: str, industries: bool = False
+) -> pd.DataFrame:
+    """
+    compute_trade_risk of a single hazard, with one merge and one groupby per hazard.
+    """
+    trade_risk = trade.merge(risk[["id", hazard]], on="id")
+    trade_risk["q_flow_at_risk"] = (trade_risk["q_sea_flow"] / 365) * trade_risk[hazard]
+    trade_risk["v_flow_at_risk"] = (trade_risk["v_sea_flow"] / 365) * trade_risk[hazard]
+    trade_risk["downtime_q_weighted"] = (
+        trade_risk["q_sea_flow"] / trade_risk["q_sea_flow_total"]
+    ) * trade_risk[hazard]
+    trade_risk["downtime_v_weighted"] = (
+        trade_risk["v_sea_flow"] / trade_risk["v_sea_flow_total"]
+    ) * trade_risk[hazard]
+
+    groupby_list = ["iso3"]
+    if industries:
+        groupby_list += ["sector", "Industries"]
+    network_trade_risk = (
+        trade_risk.groupby(groupby_list, observed=True)[
+            ["downtime_q_weighted", "downtime_v_weighted"]
+        ]
+        .sum()
+        .reset_index()
+        .rename(
+            columns={
+                "downtime_q_weighted": "downtime_q_network",
+                "downtime_v_weighted": "downtime_v_network",
+            }
+        )
+    )
+    return trade_risk.merge(network_trade_risk, on=groupby_list)
+
+
+def legacy_merge_risk(
+    import_risk: pd.DataFrame,
+    export_risk: pd.DataFrame,
+    quantity: bool = False,
+    industries: bool = False,
+) -> pd.DataFrame:
+    """
+    merge_risk of a single hazard, with one groupby per risk column and the iso3_sector key. The
+    export port counts are named n_ports_export.
+    """
+    col_name = f"downtime_{'q' if quantity else 'v'}_weighted"
+    sea_flow_total = f"{'q' if quantity else 'v'}_sea_flow_total"
+
+    iso3 = "iso3"
+    if industries:
+        import_risk = import_risk.assign(
+            iso3_sector=import_risk["iso3"] + "_" + import_risk["sector"]
+        )
+        export_risk = export_risk.assign(
+            iso3_sector=export_risk["iso3"] + "_" + export_risk["sector"]
+        )
+        iso3 = "iso3_sector"
+
+    def split_risk(frame: pd.DataFrame, domestic: bool, name: str) -> pd.Series:
+        mask = (frame["iso3"] == frame["port_iso3"]) == domestic
+        return frame.loc[mask].groupby(iso3)[col_name].sum().rename(name)
+
+    def total(frame: pd.DataFrame, name: str) -> pd.DataFrame:
+        return (
+            frame[[iso3, sea_flow_total]]
+            .drop_duplicates()
+            .rename(columns={sea_flow_total: name})
+            .set_index(iso3)
+        )
+
+    global_risk = pd.concat(
+        [
+            split_risk(import_risk, True, "domestic_import_risk"),
+            split_risk(export_risk, False, "foreign_export_risk"),
+            split_risk(export_risk, True, "domestic_export_risk"),
+            split_risk(import_risk, False, "foreign_import_risk"),
+        ],
+        axis=1,
+    )
+    global_risk = pd.concat(
+        [global_risk, total(import_risk, "imports"), total(export_risk, "exports")],
+        axis=1,
+    )
+    ports_import = import_risk.groupby(iso3)["id"].nunique().rename("n_ports_import")
+    ports_export = export_risk.groupby(iso3)["id"].nunique().rename("n_ports_export")
+    global_risk = pd.concat([global_risk, ports_import, ports_export], axis=1)
+    global_risk = global_risk.replace(np.nan, 0.0).reset_index()
+
+    global_risk["total_import_risk"] = (
+        global_risk["domestic_import_risk"] + global_risk["foreign_import_risk"]
+    )
+    global_risk["total_export_risk"] = (
+        global_risk["domestic_export_risk"] + global_risk["foreign_export_risk"]
+    )
+    flows = global_risk[["imports", "exports"]].sum(axis=1)
+    global_risk["total_risk"] = (
+        global_risk["total_import_risk"] * global_risk["imports"]
+    ) / flows
+    global_risk["total_risk"] += (
+        global_risk["total_export_risk"] * global_risk["exports"]
+    ) / flows
+
+    if industries:
+        global_risk["iso3"] = global_risk["iso3_sector"].str.split("_").str[0]
+        global_risk["sector"] = global_risk["iso3_sector"].str.split("_").str[1]
+    return global_risk
+
+
+def sorted_frame(frame: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """
+    Sorts a frame on keys, so that frames with the same rows in a different order compare equal.
+    """
+    return frame.sort_values(keys).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("industries", [False, True])
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_compute_hazards_trade_risk(
+    raw_data, trade, risk, hazards, direction, industries
+):
+    _, _, ports_risk = raw_data
+    suffix = "_sector" if industries else ""
+    trade_frame = trade[f"{direction}_trade{suffix}"]
+    keys = ["iso3", "id"] + (["Industries", "sector"] if industries else [])
+
+    for hazard in hazards:
+        expected = legacy_compute_trade_risk(
+            trade_frame, ports_risk, hazard, industries
+        )
+        result = risk[hazard][f"{direction}{suffix}"]
+        pd.testing.assert_frame_equal(
+            sorted_frame(decode(result), keys),
+            sorted_frame(decode(expected), keys),
+            check_like=True,
+        )
+
+
+@pytest.mark.parametrize("industries", [False, True])
+@pytest.mark.parametrize("metric", ["value", "quantity"])
+@pytest.mark.parametrize("gaps", [False, True])
+def test_merge_hazards_risk(risk, hazards, metric, industries, gaps):
+    suffix = "_sector" if industries else ""
+    quantity = metric == "quantity"
+    key = "iso3_sector" if industries else "iso3"
+
+    for hazard in hazards:
+        import_risk = decode(risk[hazard][f"import{suffix}"])
+        export_risk = decode(risk[hazard][f"export{suffix}"])
+        if gaps:
+            # A country missing from one direction has float zero totals and port counts.
+            countries = import_risk["iso3"].unique()
+            import_risk = import_risk.loc[import_risk["iso3"] != countries[0]]
+            export_risk = export_risk.loc[export_risk["iso3"] != countries[1]]
+            result = merge_risk(import_risk, export_risk, quantity, industries)
+        else:
+            result = risk[hazard][f"{metric}{suffix}"]
+        expected = legacy_merge_risk(import_risk, export_risk, quantity, industries)
+        pd.testing.assert_frame_equal(
+            sorted_frame(decode(result), [key]), sorted_frame(expected, [key])
+        )
+
+
+def test_merge_risk_ports(risk):
+    import_risk = risk["downtime_total"]["import_sector"]
+    export_risk = risk["downtime_total"]["export_sector"]
+    result = merge_risk(import_risk, export_risk, quantity=True, industries=True)
+    # The port counts of each direction have their own column.
+    assert not result.columns.duplicated().any()
+    counts = export_risk.groupby(["iso3", "sector"], observed=True)["id"].nunique()
+    index = pd.MultiIndex.from_frame(result[["iso3", "sector"]])
+    assert np.array_equal(result["n_ports_export"], counts.reindex(index, fill_value=0))
+
+
+def test_create_risk_dataframe_coded(coded_trade, coded_data, risk, hazards):
+    _, _, ports_risk = coded_data
+    coded_risk = create_risk_dataframe(coded_trade, ports_risk, hazards)
+    for hazard in hazards:
+        for name, frame in risk[hazard].items():
+            keys = [col for col in ("iso3", "sector", "id") if col in frame.columns]
+            pd.testing.assert_frame_equal(
+                sorted_frame(decode(coded_risk[hazard][name]), keys),
+                sorted_frame(decode(frame), keys),
+            )
@@ -0,0 +1,76 @@
+"""
+The Monte Carlo scenarios against the country risks of merge_risk.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from port_risk.models.scenarios import risk_summary, run_scenarios
+
+
+def expected_downtime(rng: np.random.Generator, mean: np.ndarray, n: int) -> np.ndarray:
+    """
+    Sampler drawing the expected downtime of each port in every scenario.
+    """
+    return np.repeat(mean[:, None], n, axis=1)
+
+
+def test_run_scenarios_expected_downtime(exposure, raw_data, risk, hazards):
+    _, _, ports_risk = raw_data
+    sampled = [hazard for hazard in hazards if hazard != "downtime_total"]
+    results = run_scenarios(
+        exposure,
+        ports_risk,
+        n_scenarios=25,
+        distributions={hazard: expected_downtime for hazard in sampled},
+        batch_size=10,
+        processes=1,
+        return_samples=True,
+    )
+
+    # Every scenario is the expected downtime, so every sample is the total_risk of merge_risk.
+    assert set(results) == set(hazards)
+    for hazard, (summary, samples) in results.items():
+        expected = (
+            risk[hazard]["value"]
+            .astype({"iso3": str})
+            .set_index("iso3")["total_risk"]
+            .reindex(exposure.countries)
+            .to_numpy()
+        )
+        assert samples.shape == (len(exposure.countries), 25)
+        np.testing.assert_allclose(
+            samples, np.broadcast_to(expected[:, None], samples.shape), rtol=1e-5
+        )
+        np.testing.assert_allclose(summary["mean"], expected, rtol=1e-5)
+
+
+def test_run_scenarios_processes(exposure, raw_data):
+    _, _, ports_risk = raw_data
+    serial, parallel = (
+        run_scenarios(
+            exposure,
+            ports_risk,
+            n_scenarios=250,
+            batch_size=100,
+            processes=processes,
+            seed=3,
+            return_samples=True,
+        )
+        for processes in (1, 2)
+    )
+    for hazard, (summary, samples) in serial.items():
+        np.testing.assert_array_equal(parallel[hazard][1], samples)
+        pd.testing.assert_frame_equal(parallel[hazard][0], summary)
+
+
+def test_risk_summary():
+    samples = np.vstack([np.arange(1, 101), np.full(100, 2.0)])
+    summary = risk_summary(samples, pd.Index(["AAA", "AAB"]), quantiles=(0.5,))
+    assert list(summary.columns) == ["mean", "std", "q0.5", "var_0.95", "cvar_0.95"]
+    assert summary.loc["AAA", "mean"] == pytest.approx(50.5)
+    assert summary.loc["AAA", "var_0.95"] == pytest.approx(95.05)
+    # The tail is the 5 largest samples.
+    assert summary.loc["AAA", "cvar_0.95"] == pytest.approx(98.0)
+    assert summary.loc["AAB"].drop("std").tolist() == [2.0] * 4
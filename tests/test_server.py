@@ -0,0 +1,79 @@
+"""
+The risk server queried with a local client.
+"""
+
+import pytest
+
+from port_risk.server import RiskClient, RiskIndex, running_server
+
+
+@pytest.fixture(scope="module")
+def index(risk, exposure, raw_data):
+    _, _, ports_risk = raw_data
+    return RiskIndex(risk, exposure, ports_risk)
+
+
+@pytest.fixture(scope="module")
+def client(index):
+    with running_server(index) as (host, port):
+        client = RiskClient(host, port)
+        yield client
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def country(risk):
+    return str(risk["downtime_total"]["value"]["iso3"].iloc[0])
+
+
+def test_risk(client, risk, country):
+    expected = risk["downtime_TC"]["quantity"].set_index("iso3").loc[country]
+    record = client.get("risk", iso3=country, hazard="TC", metric="quantity")
+    assert record["iso3"] == country
+    for field in ("foreign_import_risk", "imports", "total_risk"):
+        assert record[field] == pytest.approx(expected[field])
+    assert len(client.get("risk")) == len(risk["downtime_total"]["value"])
+
+
+def test_sectors(client, risk, country):
+    frame = risk["downtime_total"]["value_sector"]
+    expected = frame.loc[frame["iso3"] == country].set_index("sector")
+    records = client.get("sectors", iso3=country)
+    assert sorted(record["sector"] for record in records) == sorted(expected.index)
+    for record in records:
+        assert record["total_risk"] == pytest.approx(
+            expected.loc[record["sector"], "total_risk"]
+        )
+        assert (
+            record["n_ports_export"] == expected.loc[record["sector"], "n_ports_export"]
+        )
+
+
+def test_top_ports(client, country):
+    total = client.get("risk", iso3=country)["total_risk"]
+    ports = client.get("top_ports", iso3=country, k=100_000)
+    assert sum(port["contribution"] for port in ports) == pytest.approx(total)
+    assert all(port["port_name"] for port in ports)
+    top = client.get("top_ports", iso3=country, k=3)
+    assert top == ports[:3]
+
+
+def test_errors(client, index, country, monkeypatch):
+    with pytest.raises(KeyError):
+        client.get("risk", iso3="???")
+    with pytest.raises(KeyError):
+        client.get("unknown")
+    with pytest.raises(ValueError):
+        client.get("top_ports", iso3=country, k=0)
+    with pytest.raises(ValueError):
+        client.get("sectors")
+
+    def fail(*args):
+        raise IndexError("unexpected")
+
+    monkeypatch.setattr(index, "risk", fail)
+    with pytest.raises(RuntimeError):
+        client.get("risk", iso3=country)
+    # The connection is still served after the error.
+    monkeypatch.undo()
+    assert client.get("risk", iso3=country)["iso3"] == country
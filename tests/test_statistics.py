@@ -0,0 +1,103 @@
+"""
+The distribution fits and Kolmogorov-Smirnov tests against scipy, exact and approximate.
+"""
+
+import numpy as np
+import pytest
+import scipy.stats as stats
+
+import port_risk.preprocessing.statistics as statistics
+from port_risk.models.store import ModelStore
+from port_risk.preprocessing.statistics import (
+    approximate_fit_distributions,
+    fit_distributions,
+    quantile_sketch,
+    sketch_ks_test,
+)
+
+TESTED_FUNCTIONS = {
+    "normal": stats.norm,
+    "exponential": stats.expon,
+    "lognormal": stats.lognorm,
+    "gamma": stats.gamma,
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return np.random.default_rng(0).lognormal(-1.0, 0.8, size=2_000)
+
+
+def test_closed_form_fits(data):
+    np.testing.assert_allclose(statistics.fit_norm(data), stats.norm.fit(data))
+    np.testing.assert_allclose(statistics.fit_expon(data), stats.expon.fit(data))
+    np.testing.assert_allclose(
+        statistics.fit_lognorm(data), stats.lognorm.fit(data, floc=0), rtol=1e-4
+    )
+    assert statistics.fit_lognorm(data - data.mean()) is None
+
+
+def test_fit_distributions(data):
+    fits = fit_distributions(data, TESTED_FUNCTIONS, processes=1)
+    assert fits == fit_distributions(data, TESTED_FUNCTIONS, processes=2)
+
+    for name, func in TESTED_FUNCTIONS.items():
+        params, (statistic, pvalue) = fits[name]
+        if func.name == "gamma":
+            np.testing.assert_allclose(params, func.fit(data))
+        expected = stats.ks_1samp(data, func(*params).cdf)
+        assert (statistic, pvalue) == pytest.approx(
+            (expected.statistic, expected.pvalue)
+        )
+
+
+def test_fit_distributions_store(data, tmp_path, monkeypatch):
+    store = ModelStore(tmp_path)
+    fits = fit_distributions(data, TESTED_FUNCTIONS, processes=1, store=store)
+
+    calls = []
+    fit_and_test = statistics.fit_and_test
+    monkeypatch.setattr(
+        statistics,
+        "fit_and_test",
+        lambda *args: calls.append(args) or fit_and_test(*args),
+    )
+    assert fit_distributions(data, TESTED_FUNCTIONS, processes=1, store=store) == fits
+    assert not calls
+    fit_distributions(data[1:], TESTED_FUNCTIONS, processes=1, store=store)
+    assert len(calls) == len(TESTED_FUNCTIONS)
+
+
+def test_sketch_ks_test(data):
+    sorted_data = np.sort(data)
+    cdf = stats.norm(*statistics.fit_norm(data)).cdf
+    exact = stats.ks_1samp(data, cdf).statistic
+    for size in (10, 100, len(data)):
+        quantiles, ranks = quantile_sketch(sorted_data, size)
+        (statistic, _), bound = sketch_ks_test(quantiles, ranks, len(data), cdf)
+        assert statistic <= exact + 1e-12
+        assert exact <= statistic + bound + 1e-12
+    # With every order statistic in the sketch, the statistic is exact.
+    assert statistic == pytest.approx(exact) and bound == pytest.approx(0.0)
+
+
+def test_approximate_fit_distributions(data):
+    exact = fit_distributions(data, TESTED_FUNCTIONS, processes=1)
+
+    # Without subsampling nor sketching, the approximate mode is exact.
+    fits, bounds = approximate_fit_distributions(
+        data, TESTED_FUNCTIONS, len(data), len(data), processes=1
+    )
+    for name, (params, result) in fits.items():
+        np.testing.assert_allclose(params, exact[name][0], rtol=1e-6)
+        assert result == pytest.approx(exact[name][1])
+        assert bounds[name] == pytest.approx(0.0)
+
+    fits, bounds = approximate_fit_distributions(
+        data, TESTED_FUNCTIONS, 500, 100, processes=1
+    )
+    for name, (params, (statistic, _)) in fits.items():
+        statistic_exact = stats.ks_1samp(data, TESTED_FUNCTIONS[name](*params).cdf)
+        assert statistic <= statistic_exact.statistic + 1e-12
+        assert statistic_exact.statistic <= statistic + bounds[name] + 1e-12
+        assert bounds[name] < 0.05
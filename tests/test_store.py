@@ -0,0 +1,97 @@
+"""
+The keys, reads and eviction of the model store.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+import port_risk.models.models as models
+from port_risk.models.models import ExtraTrees, RandomForest, optimal_depth_trees
+from port_risk.models.store import ModelStore
+
+
+class Tree(DecisionTreeRegressor):
+    pass
+
+
+class ShallowTree(DecisionTreeRegressor):
+    def __init__(self, max_depth=2):
+        super().__init__(max_depth=max_depth)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(tmp_path / "models")
+
+
+def test_key(store):
+    x = np.arange(12, dtype=np.float32).reshape(4, 3)
+    key = store.key("sweep", (x,), {"tree": Tree}, {"depth": 3})
+    assert key == store.key("sweep", (x.copy(),), {"tree": Tree}, {"depth": 3})
+
+    changed = x.copy()
+    changed[0, 0] = -1
+    assert key != store.key("other", (x,), {"tree": Tree}, {"depth": 3})
+    assert key != store.key("sweep", (changed,), {"tree": Tree}, {"depth": 3})
+    assert key != store.key(
+        "sweep", (x.astype(np.float64),), {"tree": Tree}, {"depth": 3}
+    )
+    assert key != store.key("sweep", (x.reshape(3, 4),), {"tree": Tree}, {"depth": 3})
+    assert key != store.key("sweep", (x,), {"tree": Tree}, {"depth": 4})
+    # The default parameters of the classes are part of the key.
+    assert key != store.key("sweep", (x,), {"tree": ShallowTree}, {"depth": 3})
+
+
+def test_fetch(store):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": np.arange(3)}
+
+    first = store.fetch("key", compute)
+    second = store.fetch("key", compute)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(second["value"], first["value"])
+    assert store.get("missing", "default") == "default"
+
+    store.clear()
+    store.fetch("key", compute)
+    assert len(calls) == 2
+
+
+def test_evict(store):
+    values = {key: np.zeros(1_000) for key in "abc"}
+    for i, (key, value) in enumerate(values.items()):
+        store.put(key, value)
+        os.utime(store.path(key), (i, i))
+    size = store.path("a").stat().st_size
+    # Reading an entry makes it the most recently used.
+    store.get("a")
+    store.max_bytes = 2 * size
+    store.evict()
+    assert [key for key in values if store.path(key).exists()] == ["a", "c"]
+
+
+def test_optimal_depth_trees_store(store, monkeypatch):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(80, 3)).astype(np.float32)
+    y = x[:, 0] + rng.normal(scale=0.1, size=80)
+    arrays = (x[:60], x[60:], y[:60], y[60:])
+    fits = []
+    run_depth = models.run_depth
+    monkeypatch.setattr(
+        models, "run_depth", lambda *args: fits.append(args) or run_depth(*args)
+    )
+
+    stored = optimal_depth_trees(*arrays, {"tree": ExtraTrees}, 4, 1, store)
+    assert len(fits) == 3
+    # The same sweep reads the store, another model or depth range misses it.
+    assert optimal_depth_trees(*arrays, {"tree": ExtraTrees}, 4, 1, store) == stored
+    assert len(fits) == 3
+    optimal_depth_trees(*arrays, {"tree": RandomForest}, 4, 1, store)
+    optimal_depth_trees(*arrays, {"tree": ExtraTrees}, 3, 1, store)
+    assert len(fits) == 3 + 3 + 2
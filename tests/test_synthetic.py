@@ -0,0 +1,42 @@
+"""
+The sizes and consistency of the synthetic data.
+"""
+
+import pandas as pd
+
+from port_risk.io.synthetic import (
+    BASE_SIZES,
+    make_scaled_data,
+    make_synthetic_data,
+    scaled_sizes,
+)
+
+
+def test_scaled_sizes():
+    assert scaled_sizes() == BASE_SIZES
+    sizes = scaled_sizes(4, n_industries=7)
+    assert sizes == {
+        "n_rows": 400_000,
+        "n_countries": 300,
+        "n_ports": 5_600,
+        "n_industries": 7,
+    }
+
+
+def test_make_scaled_data(synthetic):
+    network, ports, industries, risks = synthetic
+    sizes = scaled_sizes(0.05)
+    assert len(network) == sizes["n_rows"]
+    assert len(ports) == sizes["n_ports"]
+    assert len(industries) == sizes["n_industries"]
+    assert set(network["id"].cat.categories) == set(ports["id"])
+    assert set(network["Industries"].cat.categories) == set(industries["Industries"])
+    assert set(network["iso3_O"].cat.categories) >= set(ports["iso3"])
+    assert set(risks["port_name"]) <= set(ports["port_name"])
+
+
+def test_make_synthetic_data():
+    sizes = {"n_rows": 2_000, "n_countries": 20, "n_ports": 50, "n_industries": 4}
+    frames = make_synthetic_data(**sizes, seed=3)
+    for frame, expected in zip(frames, make_scaled_data(seed=3, **sizes)):
+        pd.testing.assert_frame_equal(frame, expected)
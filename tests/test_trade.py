@@ -0,0 +1,76 @@
+"""
+The trade dataframes of build_trade_frames and stream_preprocess_trade against preprocess_trade.
+"""
+
+import pandas as pd
+import pytest
+
+from port_risk.io.codes import decode
+from port_risk.preprocessing.trade import (
+    build_trade_frames,
+    preprocess_trade,
+    stream_preprocess_trade,
+)
+
+VARIANTS = {
+    "export_trade": ("iso3_O", False),
+    "import_trade": ("iso3_D", False),
+    "export_trade_sector": ("iso3_O", True),
+    "import_trade_sector": ("iso3_D", True),
+}
+
+
+@pytest.mark.parametrize("name", VARIANTS)
+def test_build_trade_frames(raw_data, name):
+    network, ports, _ = raw_data
+    iso3, industries = VARIANTS[name]
+    expected = preprocess_trade(network, ports, iso3, industries)
+    pd.testing.assert_frame_equal(
+        decode(build_trade_frames(network, ports)[name]), decode(expected)
+    )
+
+
+@pytest.mark.parametrize("name", VARIANTS)
+def test_build_trade_frames_coded(raw_data, coded_trade, name):
+    network, ports, _ = raw_data
+    iso3, industries = VARIANTS[name]
+    expected = preprocess_trade(network, ports, iso3, industries)
+    pd.testing.assert_frame_equal(decode(coded_trade[name]), decode(expected))
+
+
+@pytest.mark.parametrize("iso3", ["iso3_O", "iso3_D"])
+@pytest.mark.parametrize("industries", [False, True])
+def test_stream_preprocess_trade(tmp_path, synthetic, raw_data, iso3, industries):
+    network, _, industries_df, _ = synthetic
+    path = tmp_path / "network.csv"
+    network.to_csv(path, index=False)
+    merged_network, ports, _ = raw_data
+
+    streamed = stream_preprocess_trade(
+        path, industries_df, ports, iso3, industries, chunksize=1_000, fold_every=2
+    )
+    expected = preprocess_trade(merged_network, ports, iso3, industries)
+    pd.testing.assert_frame_equal(streamed, expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("industries", [False, True])
+def test_stream_preprocess_trade_coded(
+    tmp_path, synthetic, codes, coded_data, industries
+):
+    network, _, industries_df, _ = synthetic
+    path = tmp_path / "network.csv"
+    network.to_csv(path, index=False)
+    coded_network, coded_ports, _ = coded_data
+
+    streamed = stream_preprocess_trade(
+        path,
+        industries_df,
+        coded_ports,
+        "iso3_D",
+        industries,
+        chunksize=1_000,
+        fold_every=2,
+        codes=codes,
+    )
+    expected = preprocess_trade(coded_network, coded_ports, "iso3_D", industries)
+    pd.testing.assert_frame_equal(streamed, expected, rtol=1e-6)
@@ -0,0 +1,48 @@
+"""
+The incremental what-if updates against recomputing the risks of the edited downtimes.
+"""
+
+import pandas as pd
+import pytest
+
+from port_risk.models.risk import create_risk_dataframe
+from port_risk.models.whatif import RiskState
+
+
+@pytest.mark.parametrize("metric", ["value", "quantity"])
+def test_apply(exposure, trade, raw_data, risk, hazards, metric):
+    _, _, ports_risk = raw_data
+    quantity = metric == "quantity"
+    state = RiskState.from_ports_risk(exposure, ports_risk, hazards, quantity)
+    hazard = next(hazard for hazard in hazards if hazard != "downtime_total")
+    ids = trade["import_trade"]["id"]
+    ports = ids.loc[ids.isin(exposure.ports)].drop_duplicates().iloc[:3].tolist()
+    edits = [(ports[0], hazard, 0.0), (ports[1], hazard, 12.5), (ports[2], hazard, 3.0)]
+    edits.append((ports[0], hazard, 7.0))
+    edited = state.apply(edits)
+    assert not edited.country_risk(hazard).equals(state.country_risk(hazard))
+
+    # The merge chain recomputed on the edited downtimes, downtime_total moving with the hazard.
+    edited_risk = ports_risk.set_index("id")
+    for port, _, value in edits:
+        delta = value - edited_risk.loc[port, hazard]
+        edited_risk.loc[port, [hazard, "downtime_total"]] += delta
+    expected = create_risk_dataframe(trade, edited_risk.reset_index(), hazards)
+
+    for name in hazards:
+        for current, risks in ((state, risk), (edited, expected)):
+            pd.testing.assert_frame_equal(
+                current.country_risk(name).set_index("iso3"),
+                risks[name][metric]
+                .astype({"iso3": str})
+                .set_index("iso3")
+                .sort_index(),
+                check_dtype=False,
+            )
+
+
+def test_apply_unknown_port(exposure, raw_data, hazards):
+    _, _, ports_risk = raw_data
+    state = RiskState.from_ports_risk(exposure, ports_risk, hazards)
+    with pytest.raises(KeyError):
+        state.apply([("unknown", hazards[0], 1.0)])